@@ -0,0 +1,302 @@
+# 二進位棋局庫：每步壓成 16 位元（起點 6 bits、終點 6 bits、升變 3 bits），
+# 一盤棋的走法是一段連續的 uint16（little-endian），以 array('H') 寫入，
+# 讀取時用 mmap + memoryview.cast('H') 直接看檔案內容，不需要複製也不需要解析 SAN。
+#
+# 檔案格式：
+#   檔頭   magic 'CHGA'、版本、棋局數、索引位置                 (<4sHHQQ，24 bytes)
+#   棋局   ply 數、結果、旗標、FEN 長度、標頭長度               (<HBBHH，8 bytes)
+#          [FEN][標頭 "名稱\t值\n"...][補齊到偶數位置][走法 uint16 * ply 數]
+#   索引   每盤棋的起始位置                                      (<Q * 棋局數)
+# 用法：
+#   python archive.py pack games.pgn [more.pgn ...] -o games.cga
+#   python archive.py info games.cga
+#   python archive.py replay games.cga     # 重播所有棋局並量測速度
+import argparse
+import mmap
+import struct
+import sys
+import time
+from array import array
+
+from pgn import Game, read_pgn
+from position import BACKENDS, STARTING_FEN, create_position
+
+MAGIC = b'CHGA'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQ')
+RECORD = struct.Struct('<HBBHH')
+OFFSET = struct.Struct('<Q')
+
+RESULTS = ('*', '1-0', '0-1', '1/2-1/2')
+HAS_FEN = 1
+HAS_TAGS = 2
+
+PROMOTION_CODES = {'': 0, 'N': 1, 'B': 2, 'R': 3, 'Q': 4}
+PROMOTIONS = ('', 'N', 'B', 'R', 'Q')
+# 檔案裡一律是 little-endian；在 big-endian 機器上讀寫時要交換位元組
+NATIVE_LITTLE = sys.byteorder == 'little'
+
+
+def encode_move(move):
+    """
+    走法 tuple 轉成 16 位元整數：from | to << 6 | promotion << 12（格子以 row * 8 + col 編號）。
+    """
+    fr, fc, tr, tc, promo = move
+    return (fr * 8 + fc) | ((tr * 8 + tc) << 6) | (PROMOTION_CODES[promo] << 12)
+
+
+def decode_move(code):
+    frm = code & 63
+    to = (code >> 6) & 63
+    return frm >> 3, frm & 7, to >> 3, to & 7, PROMOTIONS[code >> 12]
+
+
+# 實際出現的編碼只有幾千種，解碼結果快取起來，同樣的走法只解一次
+_DECODE_CACHE = {}
+
+
+def decode_moves(codes):
+    """
+    一串 16 位元整數（例如 memoryview）轉成走法 tuple 列表。
+    """
+    cache = _DECODE_CACHE
+    moves = []
+    for code in codes:
+        move = cache.get(code)
+        if move is None:
+            move = cache[code] = decode_move(code)
+        moves.append(move)
+    return moves
+
+
+class ArchiveWriter:
+    """
+    逐盤寫入棋局庫；close() 時寫出索引並回填檔頭。
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        self._offsets = array('Q')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def add(self, moves, result='*', fen=STARTING_FEN, headers=None):
+        """
+        加入一盤棋，回傳它的編號。
+        """
+        f = self._file
+        self._offsets.append(f.tell())
+        fen_bytes = b'' if fen == STARTING_FEN else fen.encode('ascii')
+        tags = b''
+        if headers:
+            # FEN 與結果另外存；未知的標頭（"?"）輸出 PGN 時會自動補上，不必佔空間
+            tags = ''.join(f"{name}\t{value}\n" for name, value in headers.items()
+                           if name not in ('FEN', 'SetUp', 'Result')
+                           and value not in ('?', '????.??.??')).encode('utf-8')
+        flags = (HAS_FEN if fen_bytes else 0) | (HAS_TAGS if tags else 0)
+        codes = array('H', [encode_move(move) for move in moves])
+        if not NATIVE_LITTLE:
+            codes.byteswap()
+        f.write(RECORD.pack(len(codes), RESULTS.index(result) if result in RESULTS else 0, flags,
+                            len(fen_bytes), len(tags)))
+        f.write(fen_bytes)
+        f.write(tags)
+        if (len(fen_bytes) + len(tags)) % 2:
+            # 走法從偶數位置開始，memoryview.cast('H') 才會對齊
+            f.write(b'\0')
+        f.write(codes.tobytes())
+        return len(self._offsets) - 1
+
+    def add_game(self, game):
+        """
+        加入 pgn.Game（需要已驗證過的走法）。
+        """
+        return self.add(game.moves, game.result, game.fen, game.headers)
+
+    def close(self):
+        if self._file.closed:
+            return
+        f = self._file
+        index_offset = f.tell()
+        offsets = self._offsets
+        if not NATIVE_LITTLE:
+            offsets = array('Q', offsets)
+            offsets.byteswap()
+        f.write(offsets.tobytes())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(self._offsets), index_offset))
+        f.close()
+
+
+class GameArchive:
+    """
+    以 mmap 讀取的棋局庫。moves_view() 回傳的 memoryview 直接指向檔案內容，
+    用完要先釋放（或離開使用範圍）才能 close()。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, index_offset = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path}: not a game archive")
+        self.count = count
+        self._index = memoryview(self._data)[index_offset:index_offset + count * 8].cast('Q')
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if hasattr(self, '_index'):
+            self._index.release()
+        self._data.close()
+        self._file.close()
+
+    def _offset(self, game_id):
+        offset = self._index[game_id]
+        return offset if NATIVE_LITTLE else OFFSET.unpack(offset.to_bytes(8, 'big'))[0]
+
+    def _record(self, game_id):
+        if not 0 <= game_id < self.count:
+            raise IndexError(game_id)
+        offset = self._offset(game_id)
+        plies, result, flags, fen_len, tags_len = RECORD.unpack_from(self._data, offset)
+        start = offset + RECORD.size
+        moves_start = start + fen_len + tags_len + (fen_len + tags_len) % 2
+        return plies, result, flags, start, fen_len, tags_len, moves_start
+
+    def plies(self, game_id):
+        return self._record(game_id)[0]
+
+    def moves_view(self, game_id):
+        """
+        回傳這盤棋走法的 memoryview（格式 'H'），不複製資料。
+        """
+        plies, _, _, _, _, _, moves_start = self._record(game_id)
+        view = memoryview(self._data)[moves_start:moves_start + plies * 2].cast('H')
+        if not NATIVE_LITTLE:
+            codes = array('H', view)
+            view.release()
+            codes.byteswap()
+            return memoryview(codes)
+        return view
+
+    def moves(self, game_id):
+        with self.moves_view(game_id) as view:
+            return decode_moves(view)
+
+    def fen(self, game_id):
+        _, _, flags, start, fen_len, _, _ = self._record(game_id)
+        if not flags & HAS_FEN:
+            return STARTING_FEN
+        return self._data[start:start + fen_len].decode('ascii')
+
+    def result(self, game_id):
+        return RESULTS[self._record(game_id)[1]]
+
+    def headers(self, game_id):
+        _, result, _, start, fen_len, tags_len, _ = self._record(game_id)
+        headers = {}
+        text = self._data[start + fen_len:start + fen_len + tags_len].decode('utf-8')
+        for line in text.splitlines():
+            name, _, value = line.partition('\t')
+            headers[name] = value
+        headers['Result'] = RESULTS[result]
+        fen = self.fen(game_id)
+        if fen != STARTING_FEN:
+            headers['FEN'] = fen
+        return headers
+
+    def game(self, game_id):
+        """
+        取出完整的 pgn.Game（可以直接交給 pgn.write_game 輸出）。
+        """
+        return Game(self.headers(game_id), self.moves(game_id))
+
+    def replay(self, game_id, backend='list'):
+        """
+        走完整盤棋，回傳最後的局面；不經過 SAN，也不做合法性檢查。
+        """
+        position = create_position(backend, fen=self.fen(game_id))
+        for move in self.moves(game_id):
+            position.make_move(move)
+        return position
+
+    def positions(self, game_id, backend='list'):
+        """
+        依序產生 (ply, 局面)，ply 0 是起始局面；產生的是同一個物件，之後會繼續被修改。
+        """
+        position = create_position(backend, fen=self.fen(game_id))
+        yield 0, position
+        for ply, move in enumerate(self.moves(game_id), 1):
+            position.make_move(move)
+            yield ply, position
+
+
+def pack_pgn(pgn_paths, out_path, backend='list'):
+    """
+    把 PGN 檔轉成棋局庫，回傳 (寫入盤數, 略過的有錯棋局數)。
+    """
+    skipped = 0
+    with ArchiveWriter(out_path) as writer:
+        for path in pgn_paths:
+            for game in read_pgn(path, backend=backend):
+                if game.error:
+                    skipped += 1
+                    continue
+                writer.add_game(game)
+        return len(writer), skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack, inspect and replay binary game archives")
+    sub = parser.add_subparsers(dest='command', required=True)
+    pack = sub.add_parser('pack', help="convert PGN files into an archive")
+    pack.add_argument('pgn', nargs='+')
+    pack.add_argument('-o', '--out', required=True)
+    pack.add_argument('-b', '--backend', choices=BACKENDS, default='list')
+    info = sub.add_parser('info', help="print archive statistics")
+    info.add_argument('archive')
+    replay = sub.add_parser('replay', help="replay every game and report the speed")
+    replay.add_argument('archive')
+    replay.add_argument('-b', '--backend', choices=BACKENDS, default='list')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == 'pack':
+        count, skipped = pack_pgn(args.pgn, args.out, args.backend)
+        print(f"{count} games written to {args.out} ({skipped} skipped) in {time.perf_counter() - start:.2f}s")
+        return 0
+
+    with GameArchive(args.archive) as archive:
+        if args.command == 'info':
+            plies = sum(archive.plies(i) for i in range(len(archive)))
+            print(f"{len(archive)} games, {plies} plies")
+            return 0
+        plies = 0
+        for game_id in range(len(archive)):
+            plies += archive.replay(game_id, args.backend).ply
+        elapsed = time.perf_counter() - start
+        rate = len(archive) / elapsed * 60 if elapsed > 0 else 0
+        print(f"{len(archive)} games, {plies} plies in {elapsed:.3f}s ({rate:,.0f} games/min)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
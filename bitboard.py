@@ -0,0 +1,587 @@
+# 以 64 位元整數（bitboard）表示棋盤的規則後端。
+# 每種棋子、每個顏色各用一個整數，第 row * 8 + col 個位元代表該格有棋子，
+# 因此 a8 = bit 0、h1 = bit 63，與 board[row][col] 的索引方式一致。
+# 對外提供與 position.Position 相同的規則 API，兩個後端可以互相對照。
+from board import starting_board
+from pieces.tables import KNIGHT_OFFSETS, KING_OFFSETS
+from pieces.pawn import PROMOTION_PIECES
+from position import (
+    ALL_CASTLING,
+    CASTLING_MASK,
+    CASTLING_SYMBOLS,
+    WHITE_KINGSIDE,
+    WHITE_QUEENSIDE,
+    BLACK_KINGSIDE,
+    BLACK_QUEENSIDE,
+    NORMAL,
+    EN_PASSANT,
+    CASTLE,
+    CAPTURES,
+    QUIET,
+    KING,
+    ALL_STAGES,
+    square_name,
+    parse_fen,
+    format_fen,
+)
+from zobrist import PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, compute_key, en_passant_key
+from engine.psqt import PSQT_MG, PSQT_EG, PHASE, compute_psqt
+
+FULL = (1 << 64) - 1
+BITS = [1 << sq for sq in range(64)]
+
+# 方向以 (d_row, d_col) 表示；索引遞增（往下、往右）的方向第一個阻擋者是最低位元，
+# 索引遞減的方向則是最高位元。
+POSITIVE_DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+NEGATIVE_DIRECTIONS = ((-1, 0), (0, -1), (-1, -1), (-1, 1))
+ROOK_DIRECTIONS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+
+
+def _offset_masks(offsets):
+    masks = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        for dr, dc in offsets:
+            if 0 <= r + dr < 8 and 0 <= c + dc < 8:
+                mask |= 1 << ((r + dr) * 8 + c + dc)
+        masks.append(mask)
+    return masks
+
+
+def _ray_masks(dr, dc):
+    masks = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        r, c = r + dr, c + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            mask |= 1 << (r * 8 + c)
+            r, c = r + dr, c + dc
+        masks.append(mask)
+    return masks
+
+
+KNIGHT_ATTACKS = _offset_masks(KNIGHT_OFFSETS)
+KING_ATTACKS = _offset_masks(KING_OFFSETS)
+# PAWN_ATTACKS[is_white][sq]：該顏色的兵站在 sq 時攻擊的格子
+PAWN_ATTACKS = {
+    True: _offset_masks(((-1, -1), (-1, 1))),
+    False: _offset_masks(((1, -1), (1, 1))),
+}
+RAYS = {d: _ray_masks(*d) for d in POSITIVE_DIRECTIONS + NEGATIVE_DIRECTIONS}
+ROOK_RAY_SETS = [(RAYS[d], d in POSITIVE_DIRECTIONS) for d in ROOK_DIRECTIONS]
+BISHOP_RAY_SETS = [(RAYS[d], d in POSITIVE_DIRECTIONS)
+                   for d in ((1, 1), (1, -1), (-1, -1), (-1, 1))]
+
+RANK_MASKS = [0xFF << (8 * r) for r in range(8)]
+# castling 時國王與城堡之間必須為空的格子，以及國王經過（含起點、終點）不能被攻擊的格子
+CASTLING_PATHS = {
+    WHITE_KINGSIDE: (BITS[61] | BITS[62], (60, 61, 62), (7, 4, 7, 6)),
+    WHITE_QUEENSIDE: (BITS[57] | BITS[58] | BITS[59], (60, 59, 58), (7, 4, 7, 2)),
+    BLACK_KINGSIDE: (BITS[5] | BITS[6], (4, 5, 6), (0, 4, 0, 6)),
+    BLACK_QUEENSIDE: (BITS[1] | BITS[2] | BITS[3], (4, 3, 2), (0, 4, 0, 2)),
+}
+
+
+def _slide(sq, occupied, ray_sets):
+    attacks = 0
+    for rays, positive in ray_sets:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= rays[first]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    return _slide(sq, occupied, ROOK_RAY_SETS)
+
+
+def bishop_attacks(sq, occupied):
+    return _slide(sq, occupied, BISHOP_RAY_SETS)
+
+
+def iter_bits(bb):
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+class BitboardPosition:
+    """
+    bitboard 版本的局面，API 與 position.Position 相同：
+    make_move() / unmake_move() / legal_moves() / is_in_check() / square_attacked_by() ...
+    另外提供 attack_map() 與 mobility()，以整數位元運算一次算出整個攻擊範圍。
+    """
+
+    def __init__(self, board=None, turn='white', castling=ALL_CASTLING,
+                 en_passant_target=None, half_move_clock=0, fullmove_number=1):
+        # 每種棋子一個 bitboard，另外保留 64 格的 mailbox 方便查詢某格是什麼棋子
+        self.pieces = {p: 0 for p in 'PNBRQKpnbrqk'}
+        self.squares = [''] * 64
+        for r, row in enumerate(board or starting_board()):
+            for c, piece in enumerate(row):
+                if piece:
+                    self.pieces[piece] |= BITS[r * 8 + c]
+                    self.squares[r * 8 + c] = piece
+        self.occupied = {
+            True: sum(self.pieces[p] for p in 'PNBRQK'),
+            False: sum(self.pieces[p] for p in 'pnbrqk'),
+        }
+        self.turn = turn
+        self.castling = castling
+        self.en_passant_target = en_passant_target
+        self.half_move_clock = half_move_clock
+        self.fullmove_number = fullmove_number
+
+        self.key = compute_key(self.board, turn, castling, en_passant_target)
+        # 子力＋位置分數與局面階段，與 Position 一樣隨 _put / _remove 增量更新，engine.evaluate 可以直接使用
+        self.mg, self.eg, self.phase = compute_psqt(self.board)
+
+        self._undo = []
+        # 最近一次 legal_moves() 的結果與當時的 key；同一個局面重複查詢時直接回傳
+        self._legal_key = None
+        self._legal = None
+        self.repetitions = {self.key: 1}
+
+    def copy(self):
+        return BitboardPosition(self.board, self.turn, self.castling, self.en_passant_target,
+                                self.half_move_clock, self.fullmove_number)
+
+    @classmethod
+    def from_fen(cls, fen):
+        return cls(**parse_fen(fen))
+
+    def fen(self):
+        return format_fen(self.board, self.turn, self.castling, self.en_passant_target,
+                          self.half_move_clock, self.fullmove_number)
+
+    @property
+    def board(self):
+        """
+        轉成與 Position 相同的 8x8 字串陣列（給 GUI 或對照用）。
+        """
+        return [self.squares[r * 8:r * 8 + 8] for r in range(8)]
+
+    @property
+    def is_white_turn(self):
+        return self.turn == 'white'
+
+    @property
+    def ply(self):
+        return len(self._undo)
+
+    @property
+    def king_squares(self):
+        return {is_white: divmod(self.pieces[king].bit_length() - 1, 8) if self.pieces[king] else None
+                for is_white, king in ((True, 'K'), (False, 'k'))}
+
+    def castling_string(self):
+        rights = ''.join(sym for bit, sym in CASTLING_SYMBOLS if self.castling & bit)
+        return rights if rights else '-'
+
+    def snapshot(self):
+        board_part = '/'.join(''.join(p if p else '.' for p in self.squares[r * 8:r * 8 + 8])
+                              for r in range(8))
+        turn_part = 'w' if self.turn == 'white' else 'b'
+        if self.en_passant_target:
+            ep_part = square_name(*self.en_passant_target)
+        else:
+            ep_part = '-'
+        return f"{board_part} {turn_part} {self.castling_string()} {ep_part}"
+
+    # ------------------------------------------------------------------
+    # make / unmake
+    # ------------------------------------------------------------------
+
+    def _remove(self, sq, piece):
+        bit = BITS[sq]
+        self.pieces[piece] ^= bit
+        self.occupied[piece.isupper()] ^= bit
+        self.squares[sq] = ''
+        self.key ^= PIECE_KEYS[piece][sq]
+        self.mg -= PSQT_MG[piece][sq]
+        self.eg -= PSQT_EG[piece][sq]
+        self.phase -= PHASE[piece]
+
+    def _put(self, sq, piece):
+        bit = BITS[sq]
+        self.pieces[piece] |= bit
+        self.occupied[piece.isupper()] |= bit
+        self.squares[sq] = piece
+        self.key ^= PIECE_KEYS[piece][sq]
+        self.mg += PSQT_MG[piece][sq]
+        self.eg += PSQT_EG[piece][sq]
+        self.phase += PHASE[piece]
+
+    def make_move(self, move):
+        fr, fc, tr, tc, promo = move
+        frm = fr * 8 + fc
+        to = tr * 8 + tc
+        piece = self.squares[frm]
+        captured = self.squares[to]
+        kind = piece.upper()
+        is_white = piece.isupper()
+        flag = NORMAL
+        undo = (move, captured, self.castling, self.en_passant_target, self.half_move_clock, self.key)
+
+        if self.en_passant_target:
+            self.key ^= en_passant_key(self.board, self.en_passant_target, is_white)
+        if captured:
+            self._remove(to, captured)
+        elif kind == 'P' and fc != tc:
+            # en passant：被吃的兵在「from_row, to_col」
+            flag = EN_PASSANT
+            self._remove(fr * 8 + tc, 'p' if is_white else 'P')
+        elif kind == 'K' and abs(tc - fc) == 2:
+            # castling：連同城堡一起移動
+            flag = CASTLE
+            rook = 'R' if is_white else 'r'
+            if tc > fc:
+                self._remove(fr * 8 + 7, rook)
+                self._put(fr * 8 + 5, rook)
+            else:
+                self._remove(fr * 8, rook)
+                self._put(fr * 8 + 3, rook)
+
+        self._remove(frm, piece)
+        if promo:
+            self._put(to, promo if is_white else promo.lower())
+        else:
+            self._put(to, piece)
+
+        castling = self.castling & CASTLING_MASK[frm] & CASTLING_MASK[to]
+        self.key ^= CASTLING_KEYS[self.castling] ^ CASTLING_KEYS[castling]
+        self.castling = castling
+
+        if kind == 'P' and abs(tr - fr) == 2:
+            self.en_passant_target = ((fr + tr) // 2, fc)
+            self.key ^= en_passant_key(self.board, self.en_passant_target, not is_white)
+        else:
+            self.en_passant_target = None
+
+        if not is_white:
+            self.fullmove_number += 1
+        self.turn = 'black' if is_white else 'white'
+        self.key ^= SIDE_KEY
+
+        if kind == 'P' or captured or flag == EN_PASSANT:
+            self.half_move_clock = 0
+            self._undo.append(undo + (flag, self.repetitions))
+            self.repetitions = {self.key: 1}
+        else:
+            self.half_move_clock += 1
+            self._undo.append(undo + (flag, None))
+            self.repetitions[self.key] = self.repetitions.get(self.key, 0) + 1
+
+    def unmake_move(self):
+        move, captured, castling, ep, clock, key, flag, repetitions = self._undo.pop()
+        fr, fc, tr, tc, promo = move
+        if repetitions is None:
+            count = self.repetitions[self.key] - 1
+            if count:
+                self.repetitions[self.key] = count
+            else:
+                del self.repetitions[self.key]
+        else:
+            self.repetitions = repetitions
+        frm = fr * 8 + fc
+        to = tr * 8 + tc
+        piece = self.squares[to]
+        is_white = piece.isupper()
+
+        self._remove(to, piece)
+        self._put(frm, ('P' if is_white else 'p') if promo else piece)
+        if captured:
+            self._put(to, captured)
+        elif flag == EN_PASSANT:
+            self._put(fr * 8 + tc, 'p' if is_white else 'P')
+        elif flag == CASTLE:
+            rook = 'R' if is_white else 'r'
+            if tc > fc:
+                self._remove(fr * 8 + 5, rook)
+                self._put(fr * 8 + 7, rook)
+            else:
+                self._remove(fr * 8 + 3, rook)
+                self._put(fr * 8, rook)
+
+        self.castling = castling
+        self.en_passant_target = ep
+        self.half_move_clock = clock
+        self.key = key
+        if not is_white:
+            self.fullmove_number -= 1
+        self.turn = 'white' if is_white else 'black'
+        return move
+
+    # ------------------------------------------------------------------
+    # 攻擊判斷
+    # ------------------------------------------------------------------
+
+    def _attackers(self, sq, by_white, occupied, removed=0):
+        """
+        回傳 by_white 方攻擊 sq 的棋子 bitboard。
+        occupied 與 removed 可以用來模擬走子後的棋盤，不必真的修改 bitboard。
+        """
+        pieces = self.pieces
+        keep = ~removed
+        if by_white:
+            pawns, knights, kings = pieces['P'], pieces['N'], pieces['K']
+            straight = pieces['R'] | pieces['Q']
+            diagonal = pieces['B'] | pieces['Q']
+        else:
+            pawns, knights, kings = pieces['p'], pieces['n'], pieces['k']
+            straight = pieces['r'] | pieces['q']
+            diagonal = pieces['b'] | pieces['q']
+        return ((PAWN_ATTACKS[not by_white][sq] & pawns)
+                | (KNIGHT_ATTACKS[sq] & knights)
+                | (KING_ATTACKS[sq] & kings)
+                | (rook_attacks(sq, occupied) & straight)
+                | (bishop_attacks(sq, occupied) & diagonal)) & keep
+
+    def is_square_attacked(self, row, col, by_white):
+        occupied = self.occupied[True] | self.occupied[False]
+        return self._attackers(row * 8 + col, by_white, occupied) != 0
+
+    def square_attacked_by(self, square, color):
+        return self.is_square_attacked(square[0], square[1], color == 'white')
+
+    def is_in_check(self, is_white=None):
+        if is_white is None:
+            is_white = self.turn == 'white'
+        king = self.pieces['K' if is_white else 'k']
+        if not king:
+            return False
+        occupied = self.occupied[True] | self.occupied[False]
+        return self._attackers(king.bit_length() - 1, not is_white, occupied) != 0
+
+    def attack_map(self, color):
+        """
+        回傳 color 方所有棋子攻擊到的格子（bitboard）。
+        """
+        is_white = color == 'white'
+        pieces = self.pieces
+        occupied = self.occupied[True] | self.occupied[False]
+        p, n, b, r, q, k = 'PNBRQK' if is_white else 'pnbrqk'
+        attacks = 0
+        pawns = pieces[p]
+        if is_white:
+            attacks |= ((pawns >> 9) & ~0x8080808080808080) | ((pawns >> 7) & ~0x0101010101010101)
+        else:
+            attacks |= ((pawns << 7) & ~0x8080808080808080) | ((pawns << 9) & ~0x0101010101010101)
+        for sq in iter_bits(pieces[n]):
+            attacks |= KNIGHT_ATTACKS[sq]
+        for sq in iter_bits(pieces[b] | pieces[q]):
+            attacks |= bishop_attacks(sq, occupied)
+        for sq in iter_bits(pieces[r] | pieces[q]):
+            attacks |= rook_attacks(sq, occupied)
+        for sq in iter_bits(pieces[k]):
+            attacks |= KING_ATTACKS[sq]
+        return attacks & FULL
+
+    def mobility(self, color):
+        """
+        回傳 color 方騎士、主教、城堡、皇后可走到（非己方佔據）的格子總數。
+        """
+        is_white = color == 'white'
+        pieces = self.pieces
+        own = self.occupied[is_white]
+        occupied = own | self.occupied[not is_white]
+        n, b, r, q = 'NBRQ' if is_white else 'nbrq'
+        total = 0
+        for sq in iter_bits(pieces[n]):
+            total += (KNIGHT_ATTACKS[sq] & ~own).bit_count()
+        for sq in iter_bits(pieces[b] | pieces[q]):
+            total += (bishop_attacks(sq, occupied) & ~own).bit_count()
+        for sq in iter_bits(pieces[r] | pieces[q]):
+            total += (rook_attacks(sq, occupied) & ~own).bit_count()
+        return total
+
+    # ------------------------------------------------------------------
+    # 走法產生
+    # ------------------------------------------------------------------
+
+    def pseudo_legal_moves(self):
+        is_white = self.turn == 'white'
+        pieces = self.pieces
+        own = self.occupied[is_white]
+        enemy = self.occupied[not is_white]
+        occupied = own | enemy
+        targets = ~own & FULL
+        p, n, b, r, q, k = 'PNBRQK' if is_white else 'pnbrqk'
+        moves = []
+
+        for frm in iter_bits(pieces[n]):
+            fr, fc = frm >> 3, frm & 7
+            for to in iter_bits(KNIGHT_ATTACKS[frm] & targets):
+                moves.append((fr, fc, to >> 3, to & 7, ''))
+        for frm in iter_bits(pieces[b]):
+            fr, fc = frm >> 3, frm & 7
+            for to in iter_bits(bishop_attacks(frm, occupied) & targets):
+                moves.append((fr, fc, to >> 3, to & 7, ''))
+        for frm in iter_bits(pieces[r]):
+            fr, fc = frm >> 3, frm & 7
+            for to in iter_bits(rook_attacks(frm, occupied) & targets):
+                moves.append((fr, fc, to >> 3, to & 7, ''))
+        for frm in iter_bits(pieces[q]):
+            fr, fc = frm >> 3, frm & 7
+            for to in iter_bits((rook_attacks(frm, occupied) | bishop_attacks(frm, occupied)) & targets):
+                moves.append((fr, fc, to >> 3, to & 7, ''))
+        for frm in iter_bits(pieces[k]):
+            fr, fc = frm >> 3, frm & 7
+            for to in iter_bits(KING_ATTACKS[frm] & targets):
+                moves.append((fr, fc, to >> 3, to & 7, ''))
+
+        # 兵：一次用位移算出整排的前進格
+        empty = ~occupied & FULL
+        ep_bit = 0
+        if self.en_passant_target:
+            ep_bit = BITS[self.en_passant_target[0] * 8 + self.en_passant_target[1]]
+        if is_white:
+            single = (pieces[p] >> 8) & empty
+            double = ((single & RANK_MASKS[5]) >> 8) & empty
+            step, last_rank = 8, RANK_MASKS[0]
+        else:
+            single = (pieces[p] << 8) & empty & FULL
+            double = ((single & RANK_MASKS[2]) << 8) & empty & FULL
+            step, last_rank = -8, RANK_MASKS[7]
+        pushes = [(to + step, to) for to in iter_bits(single)]
+        pushes += [(to + 2 * step, to) for to in iter_bits(double)]
+        for frm in iter_bits(pieces[p]):
+            for to in iter_bits(PAWN_ATTACKS[is_white][frm] & (enemy | ep_bit)):
+                pushes.append((frm, to))
+        for frm, to in pushes:
+            fr, fc, tr, tc = frm >> 3, frm & 7, to >> 3, to & 7
+            if BITS[to] & last_rank:
+                for promo in PROMOTION_PIECES:
+                    moves.append((fr, fc, tr, tc, promo))
+            else:
+                moves.append((fr, fc, tr, tc, ''))
+        return moves
+
+    def will_be_in_check_after_move(self, move):
+        """
+        只用 occupancy 的位元運算模擬走子，檢查走子方國王是否會被將軍。
+        """
+        fr, fc, tr, tc, _ = move
+        frm = fr * 8 + fc
+        to = tr * 8 + tc
+        piece = self.squares[frm]
+        is_white = piece.isupper()
+        occupied = self.occupied[True] | self.occupied[False]
+        removed = BITS[to]
+        occupied = (occupied ^ BITS[frm]) | BITS[to]
+        if piece in ('P', 'p') and fc != tc and not self.squares[to]:
+            ep_sq = fr * 8 + tc
+            removed |= BITS[ep_sq]
+            occupied ^= BITS[ep_sq]
+        if piece in ('K', 'k'):
+            king_sq = to
+        else:
+            king_sq = self.pieces['K' if is_white else 'k'].bit_length() - 1
+        return self._attackers(king_sq, not is_white, occupied, removed) != 0
+
+    def can_castle(self, kingside, is_white):
+        if is_white:
+            right = WHITE_KINGSIDE if kingside else WHITE_QUEENSIDE
+        else:
+            right = BLACK_KINGSIDE if kingside else BLACK_QUEENSIDE
+        if not self.castling & right:
+            return False
+        between, passing, _ = CASTLING_PATHS[right]
+        occupied = self.occupied[True] | self.occupied[False]
+        if occupied & between:
+            return False
+        for sq in passing:
+            if self._attackers(sq, not is_white, occupied):
+                return False
+        return True
+
+    def castling_moves(self):
+        is_white = self.turn == 'white'
+        moves = []
+        if not self.pieces['K' if is_white else 'k'] & BITS[60 if is_white else 4]:
+            return moves
+        for kingside in (True, False):
+            if self.can_castle(kingside, is_white):
+                if is_white:
+                    right = WHITE_KINGSIDE if kingside else WHITE_QUEENSIDE
+                else:
+                    right = BLACK_KINGSIDE if kingside else BLACK_QUEENSIDE
+                moves.append(CASTLING_PATHS[right][2] + ('',))
+        return moves
+
+    def legal_moves(self):
+        # 與 Position 相同，依 key 快取最近一次的結果
+        if self._legal_key == self.key:
+            return self._legal
+        legal = [move for move in self.pseudo_legal_moves()
+                 if not self.will_be_in_check_after_move(move)]
+        legal += self.castling_moves()
+        self._legal_key = self.key
+        self._legal = legal
+        return legal
+
+    def iter_legal_moves(self, stages=ALL_STAGES):
+        """
+        與 Position.iter_legal_moves 相同的階段順序，逐步檢查國王安全，取到需要的走法就可以停下。
+        """
+        pseudo = self.pseudo_legal_moves()
+        squares = self.squares
+        king = 'K' if self.turn == 'white' else 'k'
+        if stages & CAPTURES:
+            for move in pseudo:
+                if (move[4] or self.is_capture(move)) and not self.will_be_in_check_after_move(move):
+                    yield move
+        for stage in (QUIET, KING):
+            if not stages & stage:
+                continue
+            for move in pseudo:
+                if ((squares[move[0] * 8 + move[1]] == king) == (stage == KING)
+                        and not (move[4] or self.is_capture(move))
+                        and not self.will_be_in_check_after_move(move)):
+                    yield move
+        if stages & KING:
+            yield from self.castling_moves()
+
+    def has_any_legal_move(self):
+        if self._legal_key == self.key:
+            return bool(self._legal)
+        for _ in self.iter_legal_moves():
+            return True
+        return False
+
+    def is_legal_move(self, move):
+        return move in self.legal_moves()
+
+    def is_valid_move(self, from_r, from_c, to_r, to_c, is_white):
+        piece = self.squares[from_r * 8 + from_c]
+        if not piece or piece.isupper() != is_white:
+            return False
+        return any(m[2] == to_r and m[3] == to_c
+                   for m in self.pseudo_legal_moves() if m[0] == from_r and m[1] == from_c)
+
+    def is_capture(self, move):
+        fr, fc, tr, tc, _ = move
+        if self.squares[tr * 8 + tc]:
+            return True
+        return self.squares[fr * 8 + fc] in ('P', 'p') and fc != tc
+
+    def is_checkmate(self):
+        return self.is_in_check() and not self.has_any_legal_move()
+
+    def is_stalemate(self):
+        return not self.is_in_check() and not self.has_any_legal_move()
+
+    def is_fifty_move_rule(self):
+        return self.half_move_clock >= 100
+
+    def is_threefold_repetition(self):
+        return self.repetitions.get(self.key, 0) >= 3
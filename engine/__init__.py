@@ -0,0 +1,3 @@
+from .search import Searcher, SearchResult
+from .tt import TranspositionTable
+from .evaluate import evaluate
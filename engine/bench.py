@@ -0,0 +1,51 @@
+# 固定局面組的搜尋基準：每個局面用全新的 Searcher 搜到同一個深度，
+# 比較節點數與時間，用來確認走法排序或剪枝的改動確實讓搜尋樹變小。
+# 用法：
+#   python -m engine.bench --depth 4
+import argparse
+import sys
+import time
+
+from position import create_position, move_to_uci
+
+from .search import Searcher
+
+BENCH_FENS = (
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4",
+    "r1b1k2r/ppppnppp/2n2q2/2b5/3NP3/2P1B3/PP3PPP/RN1QKB1R w KQkq - 0 7",
+    "2rq1rk1/pp1bppbp/2np1np1/8/3NP3/1BN1BP2/PPPQ2PP/2KR3R b - - 0 11",
+    "r2q1rk1/1b2bppp/p2p1n2/1p2p3/3NP3/1BN1B3/PPP2PPP/R2Q1RK1 w - - 0 12",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1",
+)
+
+
+def run_bench(depth, fens=BENCH_FENS, out=sys.stdout):
+    """
+    逐一搜尋 fens 到 depth 層，印出每個局面的節點數與最佳走法，回傳節點總數。
+    """
+    total_nodes = 0
+    start = time.perf_counter()
+    for i, fen in enumerate(fens, 1):
+        result = Searcher().search(create_position(fen=fen), depth=depth)
+        total_nodes += result.nodes
+        best = move_to_uci(result.best_move) if result.best_move else '-'
+        print(f"{i:>2} {result.nodes:>9} nodes {result.elapsed:>7.2f}s score {result.score:>6} best {best}",
+              file=out)
+    elapsed = time.perf_counter() - start
+    print(f"total {total_nodes} nodes in {elapsed:.2f}s ({total_nodes / elapsed:,.0f} nps)", file=out)
+    return total_nodes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search a fixed set of positions to a fixed depth")
+    parser.add_argument('--depth', type=int, default=4)
+    args = parser.parse_args(argv)
+    run_bench(args.depth)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
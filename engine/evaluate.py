@@ -0,0 +1,17 @@
+# 靜態評估：以執行方的角度回傳分數（單位：centipawn，正數代表執行方佔優）。
+from .psqt import MAX_PHASE
+
+# 輪到自己走本身就是一點優勢
+TEMPO_BONUS = 10
+
+
+def evaluate(position):
+    """
+    子力與位置分數已由 Position 在 make/unmake 時增量維護（中局、殘局各一份），
+    這裡只依局面階段內插兩者，再加上少量即時計算的項目，因此是 O(1)。
+    """
+    phase = min(position.phase, MAX_PHASE)
+    score = (position.mg * phase + position.eg * (MAX_PHASE - phase)) // MAX_PHASE
+    if position.turn == 'white':
+        return score + TEMPO_BONUS
+    return TEMPO_BONUS - score
@@ -0,0 +1,126 @@
+# 子力價值與棋子位置表（piece-square tables），分中局（mg）與殘局（eg）兩組。
+# 表格以白方視角書寫，第一列是第 8 橫列，因此白子直接用 row * 8 + col 查表，
+# 黑子則上下翻轉後查表並取負號。
+# PSQT_MG / PSQT_EG 已經把子力價值加進去，Position 只需要做加減就能維持總分。
+
+MATERIAL_MG = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0}
+MATERIAL_EG = {'P': 120, 'N': 300, 'B': 320, 'R': 530, 'Q': 950, 'K': 0}
+
+# 用來計算局面階段：全部子力都在時為 24（中局），只剩兵和國王時為 0（殘局）
+PHASE_WEIGHTS = {'P': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0}
+MAX_PHASE = 24
+
+_PAWN_MG = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+_PAWN_EG = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+    5, 5, 5, 5, 5, 5, 5, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+_KNIGHT = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+_BISHOP = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+_ROOK = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0,
+)
+_QUEEN = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+)
+_KING_MG = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20,
+)
+_KING_EG = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+
+_TABLES_MG = {'P': _PAWN_MG, 'N': _KNIGHT, 'B': _BISHOP, 'R': _ROOK, 'Q': _QUEEN, 'K': _KING_MG}
+_TABLES_EG = {'P': _PAWN_EG, 'N': _KNIGHT, 'B': _BISHOP, 'R': _ROOK, 'Q': _QUEEN, 'K': _KING_EG}
+
+
+def _build(tables, material):
+    result = {}
+    for kind, table in tables.items():
+        result[kind] = [material[kind] + table[sq] for sq in range(64)]
+        # 黑子：上下翻轉（row -> 7 - row）並取負號
+        result[kind.lower()] = [-(material[kind] + table[(7 - sq // 8) * 8 + sq % 8])
+                                for sq in range(64)]
+    return result
+
+
+# PSQT_MG[piece][row * 8 + col]：白方視角的分數（黑子為負）
+PSQT_MG = _build(_TABLES_MG, MATERIAL_MG)
+PSQT_EG = _build(_TABLES_EG, MATERIAL_EG)
+PHASE = {piece: PHASE_WEIGHTS[piece.upper()] for piece in 'PNBRQKpnbrqk'}
+
+
+def compute_psqt(board):
+    """
+    從頭計算 (中局分數, 殘局分數, 階段)，建立局面或驗證增量結果時使用。
+    """
+    mg = eg = phase = 0
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece:
+                mg += PSQT_MG[piece][r * 8 + c]
+                eg += PSQT_EG[piece][r * 8 + c]
+                phase += PHASE[piece]
+    return mg, eg, phase
@@ -0,0 +1,372 @@
+# negamax alpha-beta 搜尋，搭配迭代加深與置換表；葉節點再以只看吃子的靜態搜尋（quiescence）收尾。
+import time
+
+from pieces.stages import CAPTURES, QUIET, KING
+
+from .evaluate import evaluate
+from .see import capture_value, is_losing_capture, mvv_lva
+from .tt import (
+    TranspositionTable,
+    EXACT,
+    LOWER,
+    UPPER,
+    MATE_SCORE,
+    MATE_BOUND,
+    score_to_tt,
+    score_from_tt,
+)
+
+INFINITY = MATE_SCORE + 1
+MAX_DEPTH = 64
+# 靜態搜尋可能比主搜尋深很多，killer 表以這個層數為上限
+MAX_PLY = 128
+# 靜態搜尋的 delta pruning：吃到這個子再加上這個餘裕仍追不上 alpha 時不必試
+DELTA_MARGIN = 200
+# 每搜尋這麼多個節點才檢查一次時間，避免頻繁呼叫 time
+CHECK_INTERVAL = 1024
+
+
+class SearchAborted(Exception):
+    """
+    時間或節點數用完、或外部要求停止時，用來一路跳回根節點。
+    """
+
+
+class SearchResult:
+    def __init__(self, best_move, score, depth, nodes, elapsed, pv):
+        self.best_move = best_move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.pv = pv
+
+    def __repr__(self):
+        return (f"SearchResult(best_move={self.best_move}, score={self.score}, depth={self.depth}, "
+                f"nodes={self.nodes})")
+
+
+class Searcher:
+    """
+    對 Position 做迭代加深的 alpha-beta 搜尋。
+
+    同一個 Searcher 的置換表會在每次 search() 之間保留，
+    所以連續對局時前一步的搜尋結果能直接幫助下一步。
+    有殘局庫（tablebase.Tablebases）時，吃子或兵走後進入殘局庫範圍的局面直接取用查表結果。
+    """
+
+    def __init__(self, tt=None, evaluate=evaluate, tablebases=None):
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.evaluate = evaluate
+        self.tablebases = tablebases
+        self.nodes = 0
+        self.stopped = False
+        # 每一層兩個造成剪枝的安靜走法（killer），以及以 from * 64 + to 為索引的 history 分數
+        self._killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self._history = [0] * (64 * 64)
+        self._deadline = None
+        self._node_limit = None
+        self._stop_event = None
+
+    def stop(self):
+        """
+        要求目前的搜尋盡快結束（可從其他執行緒呼叫）。
+        """
+        self.stopped = True
+
+    def search(self, position, depth=None, movetime=None, nodes=None, info=None, stop_event=None):
+        """
+        搜尋 position 的最佳走法。
+
+        depth:    最大深度（預設不限，直到時間或節點數用完）
+        movetime: 時間預算（秒）
+        nodes:    節點數預算
+        info:     每完成一層就呼叫 info(result)，可用來輸出搜尋資訊
+        stop_event: threading.Event，被設定時搜尋盡快結束
+        回傳最後一個完整完成的深度所得的 SearchResult。
+        """
+        self.tt.new_search()
+        self.nodes = 0
+        self.stopped = False
+        for killers in self._killers:
+            killers[0] = killers[1] = None
+        # history 保留到下一次搜尋，但減半讓舊的經驗慢慢淡掉
+        self._history = [value >> 1 for value in self._history]
+        start = time.perf_counter()
+        self._deadline = start + movetime if movetime else None
+        self._node_limit = nodes
+        self._stop_event = stop_event
+        max_depth = depth or MAX_DEPTH
+
+        moves = position.legal_moves()
+        result = SearchResult(moves[0] if moves else None, 0, 0, 0, 0.0,
+                              [moves[0]] if moves else [])
+        if len(moves) <= 1 and not depth:
+            # 只有一步可走（或沒有走法）時不必搜尋
+            return result
+        if self.tablebases is not None and moves:
+            move = self.tablebases.best_move(position)
+            if move is not None:
+                score = self._tablebase_score(self.tablebases.probe(position), 0)
+                return SearchResult(move, score, 0, 0, time.perf_counter() - start, [move])
+
+        for d in range(1, max_depth + 1):
+            try:
+                score = self._negamax(position, d, -INFINITY, INFINITY, 0)
+            except SearchAborted:
+                break
+            pv = self._principal_variation(position, d)
+            elapsed = time.perf_counter() - start
+            result = SearchResult(pv[0] if pv else result.best_move, score, d, self.nodes, elapsed, pv)
+            if info is not None:
+                info(result)
+            if abs(score) >= MATE_BOUND and MATE_SCORE - abs(score) <= d:
+                # 已經找到在搜尋深度內的將死，不必再加深
+                break
+            if self._deadline is not None and elapsed * 2 > movetime:
+                # 下一層通常比這一層花更多時間，來不及就不要開始
+                break
+        result.nodes = self.nodes
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def _check_limits(self):
+        if self.stopped or (self._stop_event is not None and self._stop_event.is_set()):
+            raise SearchAborted
+        if self._node_limit is not None and self.nodes >= self._node_limit:
+            raise SearchAborted
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchAborted
+
+    def _negamax(self, position, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self._check_limits()
+
+        if ply > 0:
+            # 搜尋中只要重複一次就當作和棋，避免引擎繞圈
+            if position.half_move_clock >= 100 or position.repetitions.get(position.key, 0) >= 2:
+                return 0
+            # 子力只會在吃子時減少，所以只有剛吃子或剛走兵（半步數歸零）時才需要查殘局庫
+            if self.tablebases is not None and position.half_move_clock == 0:
+                outcome = self.tablebases.probe(position)
+                if outcome is not None:
+                    return self._tablebase_score(outcome, ply)
+
+        key = position.key
+        tt_move = None
+        entry = self.tt.probe(key)
+        if entry is not None:
+            tt_depth, bound, tt_score, tt_move = entry
+            if tt_depth >= depth and ply > 0:
+                tt_score = score_from_tt(tt_score, ply)
+                if bound == EXACT:
+                    return tt_score
+                if bound == LOWER and tt_score >= beta:
+                    return tt_score
+                if bound == UPPER and tt_score <= alpha:
+                    return tt_score
+
+        if depth <= 0:
+            return self._quiesce(position, alpha, beta, ply)
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        for move in self._staged_moves(position, tt_move, ply):
+            position.make_move(move)
+            try:
+                score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                position.unmake_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not (move[4] or position.is_capture(move)):
+                            self._record_cutoff(move, depth, ply)
+                        break
+
+        if best_move is None:
+            # 一步都沒有：被將死或逼和
+            return -MATE_SCORE + ply if position.is_in_check() else 0
+        if best_score >= beta:
+            bound = LOWER
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.tt.store(key, depth, bound, score_to_tt(best_score, ply), best_move)
+        return best_score
+
+    def _quiesce(self, position, alpha, beta, ply):
+        """
+        靜態搜尋：只試吃子與升變，直到局面「安靜」為止，避免在吃子交換的中途評估。
+        執行方可以選擇不吃（stand pat），所以靜態評估就是下限。
+        被將軍時沒有 stand pat，要試所有解將的走法。
+        依 SEE 會吃虧的吃子直接略過。
+        """
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self._check_limits()
+
+        if position.is_in_check():
+            moves = position.legal_moves()
+            if not moves:
+                return -MATE_SCORE + ply
+            if ply >= MAX_PLY:
+                return self.evaluate(position)
+            best_score = -INFINITY
+            moves = self._order_moves(position, moves, None, ply)
+        else:
+            best_score = self.evaluate(position)
+            if best_score >= beta or ply >= MAX_PLY:
+                return best_score
+            if best_score > alpha:
+                alpha = best_score
+            board = position.board
+            captures = []
+            # 只產生吃子與升變，安靜走法完全不必產生
+            for move in position.iter_legal_moves(CAPTURES):
+                promo = move[4]
+                if promo:
+                    if promo != 'Q':
+                        continue
+                elif best_score + capture_value(board, move) + DELTA_MARGIN <= alpha:
+                    # 就算白吃這個子也追不上 alpha
+                    continue
+                if is_losing_capture(position, move):
+                    continue
+                captures.append((mvv_lva(board, move), move))
+            captures.sort(reverse=True)
+            moves = [move for _, move in captures]
+
+        for move in moves:
+            position.make_move(move)
+            try:
+                score = -self._quiesce(position, -beta, -alpha, ply + 1)
+            finally:
+                position.unmake_move()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    def _record_cutoff(self, move, depth, ply):
+        # 安靜走法造成剪枝：記為這一層的 killer，並加進 history
+        killers = self._killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        fr, fc, tr, tc, _ = move
+        self._history[(fr * 8 + fc) * 64 + tr * 8 + tc] += depth * depth
+
+    def _tablebase_score(self, outcome, ply):
+        """
+        殘局庫的 (勝負, 距離將死半步數) 換成搜尋分數，與搜尋中找到的將死分數同一個尺度。
+        """
+        result, plies = outcome
+        if result == 0:
+            return 0
+        score = MATE_SCORE - ply - plies
+        return score if result > 0 else -score
+
+    def _staged_moves(self, position, tt_move, ply):
+        """
+        分階段產生要搜尋的走法：置換表的最佳走法、不吃虧的吃子與升變（依 MVV-LVA）、
+        這一層的 killer、依 history 排序的其他安靜走法，最後是依 SEE 會吃虧的吃子。
+        前面的走法造成剪枝時，後面的階段就不會產生，也不必排序。
+        """
+        searched = []
+        if tt_move is not None and position.is_legal_move(tt_move):
+            searched.append(tt_move)
+            yield tt_move
+
+        board = position.board
+        captures = []
+        losing = []
+        for move in position.iter_legal_moves(CAPTURES):
+            if move == tt_move:
+                continue
+            if is_losing_capture(position, move):
+                losing.append((mvv_lva(board, move), move))
+            else:
+                captures.append((mvv_lva(board, move), move))
+        captures.sort(reverse=True)
+        for _, move in captures:
+            yield move
+
+        for move in self._killers[min(ply, MAX_PLY)]:
+            if (move is not None and move != tt_move and not position.is_capture(move)
+                    and position.is_legal_move(move)):
+                searched.append(move)
+                yield move
+
+        quiet = [move for move in position.iter_legal_moves(QUIET | KING) if move not in searched]
+        yield from self._order_quiet(quiet)
+        losing.sort(reverse=True)
+        for _, move in losing:
+            yield move
+
+    def _order_moves(self, position, moves, tt_move, ply=0):
+        """
+        置換表的最佳走法排第一；接著是不吃虧的吃子與升變（依 MVV-LVA），
+        然後是這一層的 killer 走法、依 history 排序的其他安靜走法，依 SEE 會吃虧的吃子放最後。
+        """
+        board = position.board
+        first = []
+        captures = []
+        losing = []
+        killers = []
+        quiet = []
+        killer_moves = self._killers[min(ply, MAX_PLY)]
+        for move in moves:
+            if move == tt_move:
+                first.append(move)
+            elif move[4] or position.is_capture(move):
+                if is_losing_capture(position, move):
+                    losing.append((mvv_lva(board, move), move))
+                else:
+                    captures.append((mvv_lva(board, move), move))
+            elif move == killer_moves[0] or move == killer_moves[1]:
+                killers.append(move)
+            else:
+                quiet.append(move)
+        captures.sort(reverse=True)
+        losing.sort(reverse=True)
+        return (first + [move for _, move in captures] + killers + self._order_quiet(quiet)
+                + [move for _, move in losing])
+
+    def _order_quiet(self, quiet):
+        """
+        安靜走法依 history 分數由高到低排序。
+        """
+        history = self._history
+        quiet.sort(key=lambda move: history[(move[0] * 8 + move[1]) * 64 + move[2] * 8 + move[3]],
+                   reverse=True)
+        return quiet
+
+    def _principal_variation(self, position, max_length):
+        """
+        沿著置換表的最佳走法取出主要變化，並確認每一步都合法。
+        """
+        pv = []
+        seen = set()
+        for _ in range(max_length):
+            entry = self.tt.probe(position.key)
+            if entry is None or entry[3] is None or position.key in seen:
+                break
+            move = entry[3]
+            if move not in position.legal_moves():
+                break
+            seen.add(position.key)
+            pv.append(move)
+            position.make_move(move)
+        for _ in pv:
+            position.unmake_move()
+        return pv
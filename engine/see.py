@@ -0,0 +1,131 @@
+# 吃子走法的評估：MVV-LVA（先吃最值錢的、用最便宜的去吃）與靜態交換評估（SEE）。
+# SEE 只看目標格：雙方輪流用最便宜的攻擊者吃回，算出這一串交換對走子方的子力得失。
+# 攻擊者沿射線尋找，已經參與交換的棋子視為離開棋盤，因此後面的城堡、主教、皇后（x-ray）會自然補上。
+# 不考慮釘子與吃回時的升變，當作排序與剪枝用的估計值。
+from pieces.tables import KNIGHT_TARGETS, KING_TARGETS, ROOK_RAYS, BISHOP_RAYS
+
+from .psqt import MATERIAL_MG
+
+SEE_VALUES = dict(MATERIAL_MG, K=20000)
+
+
+def capture_value(board, move):
+    """
+    這一步吃到的子力價值（含 en passant）；不是吃子時回傳 0。
+    """
+    fr, fc, tr, tc, _ = move
+    target = board[tr][tc]
+    if target:
+        return SEE_VALUES[target.upper()]
+    if fc != tc and board[fr][fc] in ('P', 'p'):
+        return SEE_VALUES['P']
+    return 0
+
+
+def mvv_lva(board, move):
+    """
+    吃子排序分數：被吃的子越值錢越前面，價值相同時用越便宜的子去吃越前面。
+    """
+    fr, fc, _, _, promo = move
+    score = capture_value(board, move) * 16 - SEE_VALUES[board[fr][fc].upper()] // 100
+    if promo:
+        score += SEE_VALUES[promo] * 16
+    return score
+
+
+def _least_valuable_attacker(board, row, col, white, gone):
+    """
+    回傳 white 方攻擊 (row, col) 最便宜的棋子 (價值, (row, col))，沒有時回傳 None。
+    gone 裡的格子已經在交換中離開棋盤。
+    """
+    if white:
+        pawn, knight, bishop, rook, queen, king = 'P', 'N', 'B', 'R', 'Q', 'K'
+        pawn_row = row + 1
+    else:
+        pawn, knight, bishop, rook, queen, king = 'p', 'n', 'b', 'r', 'q', 'k'
+        pawn_row = row - 1
+
+    if 0 <= pawn_row < 8:
+        for c in (col - 1, col + 1):
+            if 0 <= c < 8 and board[pawn_row][c] == pawn and (pawn_row, c) not in gone:
+                return SEE_VALUES['P'], (pawn_row, c)
+
+    square = row * 8 + col
+    for r, c in KNIGHT_TARGETS[square]:
+        if board[r][c] == knight and (r, c) not in gone:
+            return SEE_VALUES['N'], (r, c)
+
+    best = None
+    for rays, own in ((BISHOP_RAYS[square], bishop), (ROOK_RAYS[square], rook)):
+        for ray in rays:
+            for r, c in ray:
+                piece = board[r][c]
+                if not piece or (r, c) in gone:
+                    continue
+                if piece == own or piece == queen:
+                    value = SEE_VALUES[piece.upper()]
+                    if best is None or value < best[0]:
+                        best = value, (r, c)
+                break
+        if best is not None and best[0] < SEE_VALUES['R']:
+            # 主教已經是滑行棋子裡最便宜的，不必再看直線
+            return best
+    if best is not None:
+        return best
+
+    for r, c in KING_TARGETS[square]:
+        if board[r][c] == king and (r, c) not in gone:
+            return SEE_VALUES['K'], (r, c)
+    return None
+
+
+def see(position, move):
+    """
+    靜態交換評估：走這一步並讓雙方在目標格上一路吃回（各自可以隨時停手）後，
+    走子方淨得的子力（centipawn）。負數表示這一步吃虧。
+    """
+    board = position.board
+    fr, fc, tr, tc, promo = move
+    piece = board[fr][fc]
+    white = piece.isupper()
+    gone = {(fr, fc)}
+    if fc != tc and not board[tr][tc] and piece in ('P', 'p'):
+        # en passant：被吃的兵不在目標格，但同樣離開棋盤
+        gone.add((fr, tc))
+
+    gains = [capture_value(board, move)]
+    on_square = SEE_VALUES[piece.upper()]
+    if promo:
+        gains[0] += SEE_VALUES[promo] - SEE_VALUES['P']
+        on_square = SEE_VALUES[promo]
+    side = not white
+    while True:
+        attacker = _least_valuable_attacker(board, tr, tc, side, gone)
+        if attacker is None:
+            break
+        value, square = attacker
+        if value == SEE_VALUES['K'] and \
+                _least_valuable_attacker(board, tr, tc, not side, gone | {square}) is not None:
+            # 對方還有棋子守著這一格，國王不能吃回
+            break
+        gains.append(on_square - gains[-1])
+        on_square = value
+        gone.add(square)
+        side = not side
+
+    # 從最後一次吃子往回推：每一方都可以選擇不再吃回
+    for i in range(len(gains) - 1, 0, -1):
+        gains[i - 1] = -max(-gains[i - 1], gains[i])
+    return gains[0]
+
+
+def is_losing_capture(position, move):
+    """
+    回傳 True 表示這一步吃子（或升變）依 SEE 會吃虧。
+    被吃的子不比吃子的子便宜時一定不虧，不必真的計算 SEE。
+    """
+    board = position.board
+    fr, fc, _, _, promo = move
+    if not promo and capture_value(board, move) >= SEE_VALUES[board[fr][fc].upper()]:
+        return False
+    return see(position, move) < 0
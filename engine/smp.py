@@ -0,0 +1,330 @@
+# Lazy SMP：多個行程同時搜尋同一個根局面，透過共用的置換表互相幫忙。
+# 置換表放在 multiprocessing.shared_memory，每格固定 16 bytes（兩個 uint64）：
+#   word0 = key ^ data，word1 = data
+# 讀取時 word0 ^ word1 必須等於 key，兩個 word 被不同行程寫到一半（torn write）時對不起來，
+# 當作沒查到就好，所以完全不需要鎖。
+# data 的位元配置：走法 16 bits | 分數 24 bits | 深度 8 bits | 界線 2 bits | (保留) | age 8 bits
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import SimpleQueue, shared_memory
+
+from position import create_position
+
+from .search import Searcher, SearchResult
+
+ENTRY_BYTES = 16
+# 表格前面保留的 uint64：停止旗標、age
+HEADER_WORDS = 8
+STOP_WORD = 0
+AGE_WORD = 1
+
+SCORE_OFFSET = 1 << 23
+PROMOTION_CODES = {'': 0, 'N': 1, 'B': 2, 'R': 3, 'Q': 4}
+PROMOTIONS = ('', 'N', 'B', 'R', 'Q')
+MASK64 = (1 << 64) - 1
+# 主執行者以外的行程，每隔幾個行程多搜一層
+DEPTH_SKIP = 2
+
+
+def pack_move(move):
+    # 走法 tuple 轉成 16 bits；0 表示沒有走法（a8 走到 a8 不可能出現）
+    if move is None:
+        return 0
+    fr, fc, tr, tc, promo = move
+    return (fr * 8 + fc) | ((tr * 8 + tc) << 6) | (PROMOTION_CODES[promo] << 12)
+
+
+_MOVE_CACHE = {0: None}
+
+
+def unpack_move(code):
+    move = _MOVE_CACHE.get(code)
+    if move is None and code:
+        frm = code & 63
+        to = (code >> 6) & 63
+        move = _MOVE_CACHE[code] = (frm >> 3, frm & 7, to >> 3, to & 7, PROMOTIONS[code >> 12])
+    return move
+
+
+def pack_entry(depth, bound, score, move, age):
+    return (pack_move(move) | ((score + SCORE_OFFSET) << 16) | (max(0, min(depth, 255)) << 40)
+            | (bound << 48) | (age << 56))
+
+
+def unpack_entry(data):
+    """
+    回傳 (depth, bound, score, move, age)。
+    """
+    return ((data >> 40) & 0xFF, (data >> 48) & 3, ((data >> 16) & 0xFFFFFF) - SCORE_OFFSET,
+            unpack_move(data & 0xFFFF), data >> 56)
+
+
+class SharedTranspositionTable:
+    """
+    放在共用記憶體的置換表，介面與 TranspositionTable 相同，可以直接交給 Searcher。
+
+    建立者（name 為 None）配置記憶體並負責 unlink；其他行程以 name 連上同一塊記憶體。
+    age 存在共用的表頭裡：只有建立者的 new_search() 會遞增，其他行程只讀取。
+    """
+
+    def __init__(self, size=1 << 20, name=None):
+        bits = max(1, (size - 1).bit_length())
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.owner = name is None
+        nbytes = (HEADER_WORDS + 2 * self.size) * 8
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.words = self.shm.buf.cast('Q')
+        self.age = self.words[AGE_WORD]
+
+    def close(self):
+        self.words.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def new_search(self):
+        if self.owner:
+            self.words[AGE_WORD] = (self.words[AGE_WORD] + 1) & 0xFF
+        self.age = self.words[AGE_WORD]
+
+    def clear(self):
+        start = HEADER_WORDS * 8
+        self.shm.buf[start:start + self.size * ENTRY_BYTES] = bytes(self.size * ENTRY_BYTES)
+        if self.owner:
+            self.words[AGE_WORD] = 0
+        self.age = 0
+
+    # 停止旗標：Searcher 會呼叫 is_set()，所以這個物件也可以直接當作 stop_event
+    def is_set(self):
+        return self.words[STOP_WORD] != 0
+
+    def set_stop(self, stop=True):
+        self.words[STOP_WORD] = 1 if stop else 0
+
+    def _read(self, key):
+        # 回傳通過驗證的 data，沒有資料或驗證失敗時回傳 None
+        slot = HEADER_WORDS + 2 * (key & self.mask)
+        words = self.words
+        check = words[slot]
+        data = words[slot + 1]
+        if data and check ^ data == key:
+            return data
+        return None
+
+    def probe(self, key):
+        """
+        回傳 (depth, bound, score, move)，找不到（或讀到寫到一半的資料）時回傳 None。
+        """
+        data = self._read(key)
+        if data is None:
+            return None
+        return unpack_entry(data)[:4]
+
+    def store(self, key, depth, bound, score, move):
+        slot = HEADER_WORDS + 2 * (key & self.mask)
+        words = self.words
+        old_data = words[slot + 1]
+        old_valid = old_data and words[slot] ^ old_data == key
+        if old_data and not old_valid:
+            # 別的局面佔著這一格：只有舊資料過期或新的深度不比它淺時才覆蓋
+            old_depth, _, _, _, old_age = unpack_entry(old_data)
+            if old_age == self.age and depth < old_depth:
+                return
+        elif old_valid and move is None:
+            # 沒有新的最佳走法時，保留舊的供走法排序使用
+            move = unpack_entry(old_data)[3]
+        data = pack_entry(depth, bound, score, move, self.age)
+        words[slot + 1] = data
+        words[slot] = (key ^ data) & MASK64
+
+    def hashfull(self):
+        """
+        取樣前 1000 格，回傳本次搜尋使用中的比例（千分比）。
+        """
+        sample = min(1000, self.size)
+        words = self.words
+        used = 0
+        for i in range(sample):
+            data = words[HEADER_WORDS + 2 * i + 1]
+            if data and data >> 56 == self.age:
+                used += 1
+        return used * 1000 // sample
+
+
+class HelperSearcher(Searcher):
+    """
+    輔助行程用的搜尋：killer 以外的安靜走法順序以亂數打散，讓各行程先搜不同的分支，
+    結果透過共用的置換表互相利用。
+    """
+
+    def __init__(self, tt, seed):
+        super().__init__(tt)
+        self._rng = random.Random(seed)
+
+    def _order_quiet(self, quiet):
+        self._rng.shuffle(quiet)
+        return quiet
+
+
+# 子行程裡連上的共用置換表，同一個 name 只連一次
+_ATTACHED = {}
+# 主執行者每完成一層就把結果放進這個佇列，由父行程轉給 info
+_INFO_QUEUE = None
+
+
+def _init_worker(info_queue):
+    global _INFO_QUEUE
+    _INFO_QUEUE = info_queue
+
+
+def _attach(name, size):
+    tt = _ATTACHED.get(name)
+    if tt is None:
+        for old in _ATTACHED.values():
+            old.words.release()
+            old.shm.close()
+        _ATTACHED.clear()
+        tt = _ATTACHED[name] = SharedTranspositionTable(size, name=name)
+    return tt
+
+
+def smp_worker(task):
+    """
+    子行程執行的工作：task = (共用表名稱, 表大小, 編號, 起始 FEN, 走法, 深度, 秒數, 節點數)。
+    編號 0 是主執行者，照一般方式搜尋，每完成一層就把結果放進 _INFO_QUEUE；
+    其他編號打散走法順序，且每隔一個多搜一層。
+    回傳 (編號, SearchResult)。
+    """
+    name, size, index, fen, moves, depth, movetime, nodes = task
+    tt = _attach(name, size)
+    position = create_position(fen=fen)
+    for move in moves:
+        position.make_move(move)
+    info = None
+    if index == 0:
+        searcher = Searcher(tt)
+        if _INFO_QUEUE is not None:
+            info = _INFO_QUEUE.put
+    else:
+        searcher = HelperSearcher(tt, seed=index)
+        if depth:
+            depth += index % DEPTH_SKIP
+    return index, searcher.search(position, depth=depth, movetime=movetime, nodes=nodes, info=info,
+                                  stop_event=tt)
+
+
+def _root(position):
+    """
+    回傳 (起始 FEN, 走法列表)，讓子行程重建局面時保留重複局面的紀錄。
+    """
+    history = position.move_history
+    for _ in history:
+        position.unmake_move()
+    fen = position.fen()
+    for move in history:
+        position.make_move(move)
+    return fen, history
+
+
+class LazySMP:
+    """
+    以 jobs 個行程做 Lazy SMP 搜尋；行程池與共用置換表在多次 search() 之間保留。
+    """
+
+    def __init__(self, jobs=None, size=1 << 20):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.tt = SharedTranspositionTable(size)
+        # SimpleQueue 的 put 直接寫入管線，主執行者回傳結果前放進去的資料一定已經可以讀到
+        self.info_queue = SimpleQueue()
+        self.executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                                            initargs=(self.info_queue,))
+        # 在建立者的執行緒裡先把子行程都 fork 出來。若等到 search() 才 fork，
+        # 呼叫端（例如 uci.py）的其他執行緒可能正拿著 stdin 的鎖，子行程結束時會卡住
+        self.executor.submit(os.getpid).result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.tt.set_stop()
+        self.executor.shutdown(cancel_futures=True)
+        self.tt.close()
+        self.info_queue.close()
+
+    def search(self, position, depth=None, movetime=None, nodes=None, info=None, stop_event=None):
+        """
+        與 Searcher.search 相同的參數；回傳最深的完成結果，nodes 是所有行程的總和。
+        主執行者結束（或 stop_event 被設定）時通知其他行程停止。
+        nodes 平均分給每個行程，總數不會超過預算太多。
+        info 會收到主執行者每一層的結果（nodes 只算主執行者），最後再以合併的結果呼叫一次。
+        """
+        start = time.perf_counter()
+        self.tt.new_search()
+        self.tt.set_stop(False)
+        fen, moves = _root(position)
+        if nodes:
+            nodes = max(1, nodes // self.jobs)
+        futures = [self.executor.submit(smp_worker, (self.tt.name, self.tt.size, index, fen, moves,
+                                                     depth, movetime, nodes))
+                   for index in range(self.jobs)]
+        main = futures[0]
+        while not main.done():
+            if stop_event is not None and stop_event.is_set():
+                break
+            wait([main], timeout=0.01)
+            self._forward_info(info)
+        self.tt.set_stop()
+        results = [future.result() for future in futures]
+        self._forward_info(info)
+        # 完成深度最深的行程；一樣深時以主執行者優先
+        _, best = max(results, key=lambda item: (item[1].depth, item[0] == 0))
+        total = sum(result.nodes for _, result in results)
+        result = SearchResult(best.best_move, best.score, best.depth, total, time.perf_counter() - start, best.pv)
+        if info is not None:
+            info(result)
+        return result
+
+    def _forward_info(self, info):
+        # 取出主執行者已完成的各層結果；沒有 info 時也要清空，免得留給下一次搜尋
+        while not self.info_queue.empty():
+            result = self.info_queue.get()
+            if info is not None:
+                info(result)
+
+
+def main(argv=None):
+    import argparse
+    from position import STARTING_FEN, move_to_uci
+
+    parser = argparse.ArgumentParser(description="Measure Lazy SMP scaling (nodes per second and depth)")
+    parser.add_argument('--fen', default=STARTING_FEN)
+    parser.add_argument('--movetime', type=float, default=3.0)
+    parser.add_argument('-j', '--jobs', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--hash', type=int, default=1 << 20, help="shared table entries")
+    args = parser.parse_args(argv)
+
+    position = create_position(fen=args.fen)
+    for jobs in args.jobs:
+        with LazySMP(jobs, args.hash) as smp:
+            # 先讓每個子行程跑一次極短的搜尋，把啟動與 import 的時間排除在量測之外
+            smp.search(position, depth=1)
+            result = smp.search(position, movetime=args.movetime)
+        nps = result.nodes / result.elapsed if result.elapsed else 0
+        print(f"{jobs:>2} processes: depth {result.depth:>2} nodes {result.nodes:>9} "
+              f"nps {nps:>9,.0f} best {move_to_uci(result.best_move)}")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
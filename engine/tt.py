@@ -0,0 +1,76 @@
+# 固定大小的置換表（transposition table），以局面的 Zobrist key 為索引。
+# 表格大小在建立時決定，長時間對局也不會無限制地佔用記憶體。
+
+# 分數的界線種類
+EXACT, LOWER, UPPER = 0, 1, 2
+
+MATE_SCORE = 100000
+# 超過這個值就視為「幾步內將死」的分數，存取時要依 ply 調整
+MATE_BOUND = MATE_SCORE - 1000
+
+
+def score_to_tt(score, ply):
+    # 將死分數以「距離目前節點」儲存，取出時再換回「距離根節點」
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class TranspositionTable:
+    """
+    每一格存 (key, depth, bound, score, move, age)。
+
+    取代策略：空格、同一局面、上一次搜尋留下的舊資料，或新的深度不小於舊的深度時才覆蓋。
+    表格在兩次搜尋之間保留，前一步的結果可以直接沿用到下一步。
+    """
+
+    def __init__(self, size=1 << 18):
+        # 大小取 2 的次方，索引只需要 key & mask
+        bits = max(1, (size - 1).bit_length())
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.table = [None] * self.size
+        self.age = 0
+
+    def new_search(self):
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        self.table = [None] * self.size
+        self.age = 0
+
+    def probe(self, key):
+        """
+        回傳 (depth, bound, score, move)，找不到時回傳 None。
+        """
+        entry = self.table[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry[1:5]
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        index = key & self.mask
+        old = self.table[index]
+        if (old is None or old[0] == key or old[5] != self.age or depth >= old[1]):
+            if move is None and old is not None and old[0] == key:
+                # 沒有新的最佳走法時，保留舊的供走法排序使用
+                move = old[4]
+            self.table[index] = (key, depth, bound, score, move, self.age)
+
+    def hashfull(self):
+        """
+        取樣前 1000 格，回傳本次搜尋使用中的比例（千分比），對應 UCI 的 hashfull。
+        """
+        sample = self.table[:1000]
+        used = sum(1 for entry in sample if entry is not None and entry[5] == self.age)
+        return used * 1000 // len(sample)
@@ -0,0 +1,119 @@
+# 在背景執行緒裡跑搜尋與終局判斷，GUI 只要定時 poll() 取回結果，主迴圈就不會被卡住。
+import itertools
+import queue
+import threading
+
+from position import Position, STARTING_FEN
+
+from .search import Searcher
+
+SEARCH, ANALYSIS = 'search', 'analysis'
+
+
+def analyse(position):
+    """
+    終局判斷：回傳將軍、將死、和棋等旗標，以及執行方的合法走法數。
+    """
+    moves = position.legal_moves()
+    in_check = position.is_in_check()
+    return {
+        'in_check': in_check,
+        'checkmate': in_check and not moves,
+        'stalemate': not in_check and not moves,
+        'fifty_move': position.is_fifty_move_rule(),
+        'threefold': position.is_threefold_repetition(),
+        'legal_moves': len(moves),
+    }
+
+
+class EngineWorker:
+    """
+    單一背景執行緒依序處理工作。
+
+    工作以 (起始 FEN, 之後的走法) 描述局面，worker 自己重建一個 Position，
+    不會碰到 GUI 手上的那一個；重播走法也保留了重複局面的紀錄。
+    結果放進佇列，由呼叫端（例如 Tk 的 root.after 迴圈）以 poll() 取回。
+    """
+
+    def __init__(self, searcher=None):
+        self.searcher = searcher if searcher is not None else Searcher()
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._ids = itertools.count(1)
+        self._cancelled = set()
+        self._current = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="engine-worker", daemon=True)
+        self._thread.start()
+
+    def submit_search(self, moves, fen=STARTING_FEN, movetime=None, depth=None, nodes=None, context=None):
+        """
+        排入一個搜尋工作，回傳工作編號。結果為 SearchResult。
+        """
+        return self._submit(SEARCH, fen, moves, {'movetime': movetime, 'depth': depth, 'nodes': nodes},
+                            context)
+
+    def submit_analysis(self, moves, fen=STARTING_FEN, context=None):
+        """
+        排入一個終局判斷工作，回傳工作編號。結果為 analyse() 的 dict。
+        """
+        return self._submit(ANALYSIS, fen, moves, {}, context)
+
+    def _submit(self, kind, fen, moves, limits, context):
+        job_id = next(self._ids)
+        self._jobs.put((job_id, kind, fen, list(moves), limits, context))
+        return job_id
+
+    def cancel(self, job_id=None):
+        """
+        取消工作：排隊中的直接丟棄，正在跑的搜尋會盡快停下並回傳目前最好的結果。
+        不指定 job_id 時停止目前正在跑的搜尋。
+        """
+        with self._lock:
+            if job_id is None or job_id == self._current:
+                self._stop_event.set()
+            else:
+                self._cancelled.add(job_id)
+
+    def poll(self):
+        """
+        不阻塞地取回所有已完成的結果：[(job_id, kind, result, context), ...]
+        """
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def close(self):
+        self.cancel()
+        self._jobs.put(None)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            job_id, kind, fen, moves, limits, context = job
+            with self._lock:
+                if job_id in self._cancelled:
+                    self._cancelled.discard(job_id)
+                    continue
+                self._current = job_id
+                self._stop_event = threading.Event()
+
+            position = Position.from_fen(fen)
+            for move in moves:
+                position.make_move(move)
+            try:
+                if kind == SEARCH:
+                    result = self.searcher.search(position, stop_event=self._stop_event, **limits)
+                else:
+                    result = analyse(position)
+            except Exception as exc:  # 把錯誤也送回主執行緒，避免 GUI 一直等待
+                result = exc
+            with self._lock:
+                self._current = None
+            self._results.put((job_id, kind, result, context))
@@ -0,0 +1,150 @@
+# EPD 測試題組：每行一個局面加上運算元（bm 最佳走法、am 應避免的走法、id 題號…），
+# 把題目分給多個行程用引擎解題，統計解題率與每題花費的時間。
+# 用法：
+#   python epd.py wac.epd --movetime 1 -j 4
+#   python epd.py suite.epd --depth 6
+import argparse
+import shlex
+import sys
+import time
+
+from engine import Searcher
+from position import BACKENDS, create_position, move_to_san, san_to_move, uci_to_move
+from workers import PositionPool, fen_of, read_fens
+
+
+def parse_epd(line):
+    """
+    拆開一行 EPD，回傳 (FEN, 運算元 dict)。
+    運算元的值是字串列表，例如 {'bm': ['Nf3', 'e4'], 'id': ['WAC.001']}。
+    EPD 沒有半步數與回合數時，以 hmvc / fmvn 運算元補上（預設 0 與 1）。
+    """
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"Invalid EPD: {line}")
+    operations = {}
+    rest = fields[4] if len(fields) > 4 else ''
+    for op in _split_operations(rest):
+        words = shlex.split(op)
+        if words:
+            operations[words[0]] = words[1:]
+    fen = fen_of(line)
+    if len(fen.split()) == 4:
+        fen += f" {operations.get('hmvc', ['0'])[0]} {operations.get('fmvn', ['1'])[0]}"
+    return fen, operations
+
+
+def _split_operations(text):
+    # 以分號切開運算元，但引號裡的分號不算
+    ops = []
+    current = ''
+    quoted = False
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        if ch == ';' and not quoted:
+            ops.append(current.strip())
+            current = ''
+        else:
+            current += ch
+    if current.strip():
+        ops.append(current.strip())
+    return ops
+
+
+def _parse_moves(position, tokens):
+    """
+    把 bm / am 的走法（SAN 或 UCI）轉成走法 tuple，無法解讀的略過。
+    """
+    moves = set()
+    for token in tokens:
+        try:
+            moves.add(san_to_move(position, token))
+        except ValueError:
+            if len(token) in (4, 5) and token[1] in '12345678' and token[3] in '12345678':
+                move = uci_to_move(token)
+                if move in position.legal_moves():
+                    moves.add(move)
+    return moves
+
+
+def solve(task):
+    """
+    子行程執行的工作：task = (行號, EPD 行, 後端, 時間限制, 深度限制)。
+    回傳 dict：題號、是否解出、引擎走法（SAN）、深度、分數、節點數與時間。
+    """
+    index, line, backend, movetime, depth = task
+    fen, operations = parse_epd(line)
+    position = create_position(backend, fen=fen)
+    best = _parse_moves(position, operations.get('bm', []))
+    avoid = _parse_moves(position, operations.get('am', []))
+
+    start = time.perf_counter()
+    result = Searcher().search(position, depth=depth, movetime=movetime)
+    elapsed = time.perf_counter() - start
+
+    move = result.best_move
+    solved = move is not None and (move in best if best else True) and move not in avoid
+    return {
+        'index': index,
+        'id': ' '.join(operations.get('id', [])) or f"#{index + 1}",
+        'solved': solved and bool(best or avoid),
+        'move': move_to_san(position, move) if move is not None else '-',
+        'expected': ' '.join(operations.get('bm', [])) or ('!' + ' '.join(operations.get('am', []))),
+        'depth': result.depth,
+        'score': result.score,
+        'nodes': result.nodes,
+        'time': elapsed,
+    }
+
+
+def run_suite(lines, movetime=None, depth=None, backend='list', pool=None, out=sys.stdout):
+    """
+    解整個題組，依完成順序印出每一題，最後印出解題率；回傳結果列表（依題號排序）。
+    """
+    if movetime is None and depth is None:
+        movetime = 1.0
+    tasks = [(i, line, backend, movetime, depth) for i, line in enumerate(lines)]
+    start = time.perf_counter()
+    if pool is not None:
+        results = (result for _, result in pool.run_unordered(solve, tasks))
+    else:
+        results = map(solve, tasks)
+
+    finished = []
+    for result in results:
+        finished.append(result)
+        mark = "ok " if result['solved'] else "-- "
+        print(f"{mark} {result['id']:<14} {result['move']:<8} expected {result['expected']:<14} "
+              f"depth {result['depth']:>2} score {result['score']:>6} {result['time']:7.2f}s", file=out)
+
+    elapsed = time.perf_counter() - start
+    solved = sum(1 for result in finished if result['solved'])
+    total = len(finished)
+    rate = 100.0 * solved / total if total else 0.0
+    avg = sum(result['time'] for result in finished) / total if total else 0.0
+    print(f"solved {solved}/{total} ({rate:.1f}%), {avg:.2f}s per position, {elapsed:.1f}s wall", file=out)
+    return sorted(finished, key=lambda result: result['index'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run an EPD test suite (bm/am) through the engine")
+    parser.add_argument('path')
+    parser.add_argument('--movetime', type=float, help="seconds per position (default 1)")
+    parser.add_argument('-d', '--depth', type=int, help="fixed search depth per position")
+    parser.add_argument('-b', '--backend', choices=BACKENDS, default='list')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="worker processes (1 = in this process, 0 = all cores)")
+    args = parser.parse_args(argv)
+
+    pool = PositionPool(args.jobs or None) if args.jobs != 1 else None
+    try:
+        results = run_suite(list(read_fens(args.path)), args.movetime, args.depth, args.backend, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+    return 0 if all(result['solved'] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# server.py 的壓力測試客戶端：同時開很多盤棋，每盤隨機走合法走法，量測每一步的回應延遲。
+# 多盤棋共用少數幾條連線，請求帶 id，回應依 id 對回去。
+# 用法：
+#   python loadtest.py --games 1000 --connections 50 --plies 40
+#   python loadtest.py --spawn -j 4 --games 2000          # 自動啟動一個本機伺服器
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from server import DEFAULT_PORT
+
+
+class Connection:
+    """
+    一條到伺服器的連線；request() 送出請求並等待同一個 id 的回應。
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._listener = asyncio.create_task(self._listen())
+
+    @classmethod
+    async def open(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port, limit=1 << 16)
+        return cls(reader, writer)
+
+    async def _listen(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                reply = json.loads(line)
+                future = self._pending.pop(reply.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(reply)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("connection closed"))
+
+    async def request(self, **fields):
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        fields['id'] = request_id
+        self.writer.write(json.dumps(fields, separators=(',', ':')).encode() + b'\n')
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self._listener.cancel()
+
+
+async def play_random_game(connection, plies, rng, latencies, engine=None):
+    """
+    開一盤棋並隨機走到結束或走滿 plies 半步，每一步的延遲（秒）加進 latencies。
+    回傳 (走了幾步, 結果)。
+    """
+    reply = await connection.request(op='new', engine=engine)
+    if not reply['ok']:
+        raise RuntimeError(reply['error'])
+    game = reply['game']
+    played = 0
+    while reply['result'] == '*' and played < plies and reply['legal']:
+        move = rng.choice(reply['legal'])
+        start = time.perf_counter()
+        reply = await connection.request(op='move', game=game, move=move)
+        latencies.append(time.perf_counter() - start)
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        played += 1
+    await connection.request(op='close', game=game)
+    return played, reply['result']
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+async def run_load(host, port, games, connections, plies, seed=None, engine=None, out=sys.stdout):
+    """
+    同時進行 games 盤棋（平均分配到 connections 條連線），結束後印出延遲百分位數與吞吐量。
+    回傳排序好的延遲列表（秒）。
+    """
+    pool = [await Connection.open(host, port) for _ in range(connections)]
+    rng = random.Random(seed)
+    latencies = []
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        play_random_game(pool[i % connections], plies, random.Random(rng.getrandbits(32)), latencies, engine)
+        for i in range(games)))
+    elapsed = time.perf_counter() - start
+    for connection in pool:
+        await connection.close()
+
+    latencies.sort()
+    finished = sum(1 for _, result in results if result != '*')
+    moves = len(latencies)
+    print(f"{games} concurrent games over {connections} connections: {moves} moves in {elapsed:.2f}s "
+          f"({moves / elapsed:,.0f} moves/s), {finished} games finished by the rules", file=out)
+    print("latency ms: " + ", ".join(f"p{int(p * 100)} {percentile(latencies, p) * 1000:.1f}"
+                                       for p in (0.5, 0.9, 0.99))
+          + f", max {latencies[-1] * 1000 if latencies else 0:.1f}", file=out)
+    return latencies
+
+
+def spawn_server(port, jobs):
+    """
+    啟動一個本機伺服器子行程，等它開始接受連線後回傳。
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py')
+    process = subprocess.Popen([sys.executable, script, '--port', str(port), '-j', str(jobs)],
+                               stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('serving'):
+        process.kill()
+        raise RuntimeError("server did not start")
+    return process
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure move latency of server.py under many concurrent games")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--games', type=int, default=1000, help="concurrent games")
+    parser.add_argument('--connections', type=int, default=50)
+    parser.add_argument('--plies', type=int, default=40, help="random moves per game at most")
+    parser.add_argument('--engine', choices=('white', 'black'), help="let the server's engine play one side")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--spawn', action='store_true', help="start a local server for the test")
+    parser.add_argument('-j', '--jobs', type=int, default=0, help="worker processes of the spawned server")
+    args = parser.parse_args(argv)
+
+    server = spawn_server(args.port, args.jobs) if args.spawn else None
+    try:
+        asyncio.run(run_load(args.host, args.port, args.games, min(args.connections, args.games), args.plies,
+                             args.seed, args.engine))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
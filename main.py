@@ -1,43 +1,63 @@
+import argparse
+import sys
+import time
 import tkinter as tk
 import tkinter.simpledialog as sd
+from tkinter import filedialog as fd
 from tkinter import messagebox as mb
-from board import pieces, starting_board
-from pieces import (
-    is_valid_knight_move,
-    is_valid_bishop_move,
-    is_valid_pawn_move,
-    is_valid_queen_move,
-    is_valid_rook_move,
-    is_valid_king_move
-)
+from board import pieces
+from position import Position, STARTING_FEN, move_to_san
+from pgn import Game, read_pgn, write_game
+from book import OpeningBook, is_standard, load_randoms
+from archive import GameArchive
+from posindex import PositionIndex
+from tablebase import Tablebases
+from engine import Searcher
+from engine.worker import EngineWorker, SEARCH, ANALYSIS
 
 # 棋盤參數
 ROWS, COLS = 8, 8
 TILE_SIZE = 80
 OFFSET = 20  # 在繪製棋盤時，讓畫布向右下偏移 20px，留出座標標籤空間
+POLL_INTERVAL = 50  # 每隔多少毫秒向背景 worker 取一次結果
+CLOCK_INTERVAL = 100  # 時鐘顯示的更新間隔（毫秒）
+
+LIGHT_COLOR = "#FFFFFF"
+DARK_COLOR = "#9370BE"
+# 標示圖層（由下而上）：上一步、選取的棋子、可走的目標格
+HIGHLIGHT_LAYERS = ('last_move', 'selection', 'legal_target')
 
 
 class ChessGUI:
-    def __init__(self, tk_root):
+    def __init__(self, tk_root, engine_color=None, time_control=None, increment=0, book=None,
+                 index=None, archive=None, tablebases=None):
         self.root = tk_root
         self.root.title("Chess game")
 
-        # 紀錄可以被 en passant 吃掉的目標格 (row, col)，若無則為 None
-        self.en_passant_target = None
-
-        # 初始化棋盤狀態
-        self.board = [row[:] for row in starting_board()]
-        self.turn = 'white'  # 白方先下
+        # 棋局狀態與規則都交給無介面的 Position，GUI 只負責顯示與輸入
+        self.start_fen = STARTING_FEN
+        self.position = Position.from_fen(self.start_fen)
         self.selected = None  # 當前被選中的棋子座標 (row, col)
+        self.last_move = None  # 上一步 (from_row, from_col, to_row, to_col, promotion)
         self.move_count = 0  # 記錄回合數（每白方移動一次 +1）
 
-        # 加入旗標：追蹤白/黑國王與左右 Rook 是否已移動
-        self.white_king_moved = False
-        self.black_king_moved = False
-        self.white_rook_a_moved = False  # a1
-        self.white_rook_h_moved = False  # h1
-        self.black_rook_a_moved = False  # a8
-        self.black_rook_h_moved = False  # h8
+        # 搜尋與終局判斷都在背景 worker 執行，主迴圈只負責定時取回結果
+        self.engine = EngineWorker(Searcher(tablebases=tablebases))
+        self.book = book  # OpeningBook；有開局庫時引擎先查庫，查到就立刻走
+        self.tablebases = tablebases  # Tablebases：殘局庫範圍內顯示結果，引擎直接照表走
+        self.index = index  # PositionIndex：查詢走到過目前局面的棋局
+        self.archive = archive  # 與 index 對應的 GameArchive（用來統計勝負）
+        self.engine_color = engine_color  # 'white'、'black' 或 None（雙人對弈）
+        self.search_job = None  # 正在等待的搜尋工作編號
+        self.analysis_job = None  # 正在等待的終局判斷工作編號
+        self.game_over = False
+        self.result = '*'  # PGN 的結果欄位
+
+        # 雙方時鐘（秒），time_control 為 None 時不計時
+        self.time_control = time_control
+        self.increment = increment
+        self.clocks = {'white': time_control, 'black': time_control}
+        self.turn_started = time.monotonic()
 
         # 建立主框架：左側為棋盤，右側為棋譜區
         frame = tk.Frame(self.root)
@@ -61,74 +81,71 @@ class ChessGUI:
         )
         self.move_log.grid(row=0, column=1, padx=10, sticky='n')
 
+        # 下方：時鐘、狀態與引擎控制
+        controls = tk.Frame(frame)
+        controls.grid(row=1, column=0, columnspan=2, sticky='we')
+        self.clock_labels = {
+            'white': tk.Label(controls, font=("Consolas", 14)),
+            'black': tk.Label(controls, font=("Consolas", 14)),
+        }
+        self.clock_labels['white'].pack(side='left', padx=10)
+        self.clock_labels['black'].pack(side='left', padx=10)
+        self.status_label = tk.Label(controls, font=("Arial", 12))
+        self.status_label.pack(side='left', padx=10)
+        tk.Button(controls, text="Engine move", command=self.engine_move).pack(side='right', padx=5)
+        tk.Button(controls, text="Stop", command=self.stop_engine).pack(side='right', padx=5)
+        tk.Button(controls, text="Save PGN", command=self.save_pgn).pack(side='right', padx=5)
+        tk.Button(controls, text="Load PGN", command=self.load_pgn).pack(side='right', padx=5)
+        tk.Button(controls, text="Copy FEN", command=self.copy_fen).pack(side='right', padx=5)
+        tk.Button(controls, text="Load FEN", command=self.load_fen).pack(side='right', padx=5)
+        if self.index is not None:
+            tk.Button(controls, text="Explorer", command=self.show_explorer).pack(side='right', padx=5)
+
         # 綁定滑鼠左鍵：點擊棋盤後觸發 on_click()
         self.canvas.bind("<Button-1>", self.on_click)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        # 按 1、2、3 切換上一步、選取、目標格的標示
+        for key, layer in zip("123", HIGHLIGHT_LAYERS):
+            self.root.bind(key, lambda event, layer=layer: self.toggle_layer(layer))
+
+        # 被選中後的合法走法列表
+        self.legal_moves = []
+
+        # 棋格、棋子與座標只建立一次，之後只更新有變化的格子
+        self.square_items = [[None] * COLS for _ in range(ROWS)]
+        self.piece_items = [[None] * COLS for _ in range(ROWS)]
+        self.drawn = [[''] * COLS for _ in range(ROWS)]  # 畫面上目前顯示的棋子
+        self.visible_layers = {layer: True for layer in HIGHLIGHT_LAYERS}
+        self.build_board()
 
         # 首次繪製棋盤
         self.draw_board()
 
-        # 被選中後的合法走法列表
-        self.legal_moves = []
+        self.update_clocks()
+        self.root.after(POLL_INTERVAL, self.poll_engine)
+        self.maybe_start_engine()
 
-        # 50 步規則計數器
-        self.half_move_clock = 0  # 自上次吃子或兵移動以來的半步數
-
-        # 加一行：
-        self.position_history = []
-        # 在一開始（初始棋局）也要加進去：
-        self.record_current_position()
-
-    def record_current_position(self):
-        """
-        將目前棋盤、執行權、castling 權、en passant 目標等資訊
-        轉成一個字串，並 append 到 position_history。
-        為簡化，只取棋子位置＋回合＋castling＋en passant。
-        """
-        # 1. 棋子佈局：用「每列 8 個字元」的字串 + '/' 分隔
-        rows = []
-        for r in self.board:
-            row_s = ''.join(piece if piece else '.' for piece in r)
-            rows.append(row_s)
-        board_part = '/'.join(rows)
-        # 2. 執行權：w 或 b
-        turn_part = 'w' if self.turn == 'white' else 'b'
-        # 3. castling 權：KQkq 或 '-'
-        rights = ''
-        if not self.white_king_moved:
-            if not self.white_rook_h_moved: rights += 'K'
-            if not self.white_rook_a_moved: rights += 'Q'
-        if not self.black_king_moved:
-            if not self.black_rook_h_moved: rights += 'k'
-            if not self.black_rook_a_moved: rights += 'q'
-        castle_part = rights if rights else '-'
-        # 4. en passant 目標：座標 or '-'
-        if self.en_passant_target:
-            ep = self.en_passant_target
-            file = chr(ord('a') + ep[1])
-            rank = str(8 - ep[0])
-            ep_part = file + rank
-        else:
-            ep_part = '-'
+    # 以下屬性直接對應到 Position，保留舊的存取方式
+    @property
+    def board(self):
+        return self.position.board
 
-        pos_str = f"{board_part} {turn_part} {castle_part} {ep_part}"
-        self.position_history.append(pos_str)
+    @property
+    def turn(self):
+        return self.position.turn
 
-    def is_threefold_repetition(self):
-        """
-        若最後一個局面已經至少出現 3 次，回傳 True。
-        """
-        if not self.position_history:
-            return False
-        last = self.position_history[-1]
-        # count occurrences
-        return self.position_history.count(last) >= 3
+    @property
+    def en_passant_target(self):
+        return self.position.en_passant_target
 
-    def draw_board(self):
+    @property
+    def half_move_clock(self):
+        return self.position.half_move_clock
+
+    def build_board(self):
         """
-        在 Canvas 上繪製棋盤格、座標標籤，以及當前所有棋子。
+        建立棋格、棋子文字與座標標籤，並記下每一格的 canvas item ID。
         """
-        self.canvas.delete("all")
-        # 先畫棋格與棋子，再畫座標標籤
         for r in range(ROWS):
             for c in range(COLS):
                 # 計算這個格子的左上與右下座標 (加上 OFFSET)
@@ -138,18 +155,17 @@ class ChessGUI:
                 y2 = y1 + TILE_SIZE
 
                 # 棋格顏色
-                color = "#FFFFFF" if (r + c) % 2 == 0 else "#9370BE"
-                self.canvas.create_rectangle(x1, y1, x2, y2, fill=color)
-
-                # 如果此格有棋子，就畫出它
-                piece = self.board[r][c]
-                if piece:
-                    self.canvas.create_text(
-                        x1 + TILE_SIZE // 2,
-                        y1 + TILE_SIZE // 2,
-                        text=pieces[piece],
-                        font=("Arial", 32)
-                    )
+                color = LIGHT_COLOR if (r + c) % 2 == 0 else DARK_COLOR
+                self.square_items[r][c] = self.canvas.create_rectangle(x1, y1, x2, y2, fill=color,
+                                                                       tags=('square',))
+                # 每一格都先放一個空白文字，之後只改它的內容
+                self.piece_items[r][c] = self.canvas.create_text(
+                    x1 + TILE_SIZE // 2,
+                    y1 + TILE_SIZE // 2,
+                    text='',
+                    font=("Arial", 32),
+                    tags=('piece',)
+                )
 
         # 繪製橫向座標 a~h（在棋格下方）
         for c in range(COLS):
@@ -165,6 +181,74 @@ class ChessGUI:
             rank_label = str(8 - r)
             self.canvas.create_text(x, y, text=rank_label, font=("Arial", 12))
 
+    def draw_board(self):
+        """
+        與上一次畫面比對，只更新內容有變化的格子，再重畫標示圖層。
+        """
+        board = self.board
+        for r in range(ROWS):
+            drawn_row = self.drawn[r]
+            board_row = board[r]
+            for c in range(COLS):
+                piece = board_row[c]
+                if piece != drawn_row[c]:
+                    self.canvas.itemconfigure(self.piece_items[r][c], text=pieces[piece] if piece else '')
+                    drawn_row[c] = piece
+        self.draw_highlights()
+
+    def draw_highlights(self):
+        """
+        重畫三個標示圖層；每層有自己的 tag，可以整層隱藏或顯示。
+        """
+        for layer in HIGHLIGHT_LAYERS:
+            self.canvas.delete(layer)
+
+        if self.last_move is not None:
+            from_row, from_col, to_row, to_col, _ = self.last_move
+            for r, c in ((from_row, from_col), (to_row, to_col)):
+                self.canvas.create_rectangle(*self.square_bounds(r, c), fill="#F2E36B", width=0,
+                                             tags=('last_move',))
+        if self.selected is not None:
+            self.canvas.create_rectangle(*self.square_bounds(*self.selected), outline="#2E8B57", width=4,
+                                         tags=('selection',))
+        for move in self.legal_moves:
+            x1, y1, x2, y2 = self.square_bounds(move[2], move[3])
+            pad = TILE_SIZE * 3 // 8
+            self.canvas.create_oval(x1 + pad, y1 + pad, x2 - pad, y2 - pad, fill="#5B8C5A", width=0,
+                                    tags=('legal_target',))
+
+        # 上一步的底色在棋子之下，選取框與目標點在棋子之上
+        self.canvas.tag_raise('last_move', 'square')
+        self.canvas.tag_raise('piece')
+        self.canvas.tag_raise('selection')
+        self.canvas.tag_raise('legal_target')
+        for layer, visible in self.visible_layers.items():
+            if not visible:
+                self.canvas.itemconfigure(layer, state='hidden')
+
+    def toggle_layer(self, layer):
+        """
+        切換某個標示圖層的顯示，不必重畫棋盤。
+        """
+        self.visible_layers[layer] = not self.visible_layers[layer]
+        self.canvas.itemconfigure(layer, state='normal' if self.visible_layers[layer] else 'hidden')
+
+    def square_bounds(self, row, col):
+        x1 = col * TILE_SIZE + OFFSET
+        y1 = row * TILE_SIZE + OFFSET
+        return x1, y1, x1 + TILE_SIZE, y1 + TILE_SIZE
+
+    def select(self, square):
+        """
+        選取（或取消選取）一格，並更新可走目標的標示。
+        """
+        self.selected = square
+        if square is None:
+            self.legal_moves = []
+        else:
+            self.legal_moves = [move for move in self.position.legal_moves() if move[:2] == square]
+        self.draw_highlights()
+
     def is_own_piece(self, piece):
         """
         判斷傳入的 piece 是否屬於當前玩家 self.turn。
@@ -175,41 +259,6 @@ class ChessGUI:
         else:
             return piece.islower()
 
-    def get_all_legal_moves(self, is_white):
-        """
-        獲取指定顏色所有合法移動
-        """
-        legal_moves = []
-
-        for r in range(ROWS):
-            for c in range(COLS):
-                piece = self.board[r][c]
-                if not piece:
-                    continue
-
-                # 檢查是否為該方的棋子
-                if (is_white and piece.islower()) or (not is_white and piece.isupper()):
-                    continue
-
-                # 檢查所有可能的目標位置
-                for tr in range(ROWS):
-                    for tc in range(COLS):
-                        # 跳過原地
-                        if (r, c) == (tr, tc):
-                            continue
-
-                        # 檢查該移動是否基本合法
-                        if not self.is_valid_move(r, c, tr, tc, is_white):
-                            continue
-
-                        # 檢查移動後是否會讓自己國王陷入將軍
-                        if self.will_be_in_check_after_move(r, c, tr, tc, is_white):
-                            continue
-
-                        legal_moves.append(((r, c), (tr, tc)))
-
-        return legal_moves
-
     def is_enemy_piece(self, piece, is_white):
         """
         判斷傳入的 piece 是否為敵方棋子
@@ -231,252 +280,6 @@ class ChessGUI:
                 return res.upper()
             # 持續詢問直到輸入合法
 
-    def record_castle(self, notation):
-        """
-        記錄castling移動，使用與log_move相同的格式
-        """
-        num_width, move_width = 3, 8
-        self.move_log.config(state='normal')
-        if self.turn == 'white':
-            self.move_count += 1
-            text = f"{self.move_count:>{num_width}}. {notation:<{move_width}}"
-        else:
-            text = f"{notation}\n"
-        self.move_log.insert('end', text)
-        self.move_log.config(state='disabled')
-        self.move_log.see('end')
-
-    def can_castle(self, kingside, is_white):
-        """
-        檢查是否可以進行 castling
-        """
-        if is_white:
-            king_row = 7
-            king_moved = self.white_king_moved
-            rook_moved = self.white_rook_h_moved if kingside else self.white_rook_a_moved
-        else:
-            king_row = 0
-            king_moved = self.black_king_moved
-            rook_moved = self.black_rook_h_moved if kingside else self.black_rook_a_moved
-
-        # 國王或城堡已移動
-        if king_moved or rook_moved:
-            return False
-
-        # 檢查路徑是否清空
-        if kingside:
-            # 短易位：檢查 f 和 g 格
-            return self.board[king_row][5] == "" and self.board[king_row][6] == ""
-        else:
-            # 長易位：檢查 b, c, d 格
-            return (self.board[king_row][1] == "" and
-                    self.board[king_row][2] == "" and
-                    self.board[king_row][3] == "")
-
-    def perform_castle(self, kingside, is_white):
-        """
-        執行 castling 移動
-        """
-        if is_white:
-            king_row = 7
-            king_col = 4
-        else:
-            king_row = 0
-            king_col = 4
-
-        if kingside:
-            # 短易位
-            new_king_col = 6
-            rook_col = 7
-            new_rook_col = 5
-            notation = "O-O"
-        else:
-            # 長易位
-            new_king_col = 2
-            rook_col = 0
-            new_rook_col = 3
-            notation = "O-O-O"
-
-        # 移動國王
-        king_piece = self.board[king_row][king_col]
-        self.board[king_row][new_king_col] = king_piece
-        self.board[king_row][king_col] = ""
-
-        # 移動城堡
-        rook_piece = self.board[king_row][rook_col]
-        self.board[king_row][new_rook_col] = rook_piece
-        self.board[king_row][rook_col] = ""
-
-        # 標記國王已移動
-        if is_white:
-            self.white_king_moved = True
-        else:
-            self.black_king_moved = True
-
-        # 記錄棋譜
-        self.record_castle(notation)
-
-        return True
-
-    def is_in_check(self, is_white):
-        """
-        回傳 True 表示「is_white」方的國王目前被將軍。
-        """
-        # 1. 找到該方國王的位置
-        king_symbol = 'K' if is_white else 'k'
-        king_pos = None
-        for r in range(ROWS):
-            for c in range(COLS):
-                if self.board[r][c] == king_symbol:
-                    king_pos = (r, c)
-                    break
-            if king_pos:
-                break
-
-        # 如果找不到國王（理論上不會發生），我們不當作將軍
-        if not king_pos:
-            return False
-        kr, kc = king_pos
-
-        # 2. 掃描對方所有棋子，看是否能走到國王格
-        for r in range(ROWS):
-            for c in range(COLS):
-                p = self.board[r][c]
-                if p and self.is_enemy_piece(p, is_white):
-                    pt = p.upper()
-                    # 根據 p 類型呼叫相應的合法走法函式
-                    # 注意：這裡要傳入攻擊方的顏色
-                    attacking_is_white = p.isupper()
-                    if pt == 'P' and is_valid_pawn_move(self.board, r, c, kr, kc, attacking_is_white,
-                                                        self.en_passant_target):
-                        return True
-                    elif pt == 'N' and is_valid_knight_move(self.board, r, c, kr, kc, attacking_is_white):
-                        return True
-                    elif pt == 'B' and is_valid_bishop_move(self.board, r, c, kr, kc, attacking_is_white):
-                        return True
-                    elif pt == 'R' and is_valid_rook_move(self.board, r, c, kr, kc, attacking_is_white):
-                        return True
-                    elif pt == 'Q' and is_valid_queen_move(self.board, r, c, kr, kc, attacking_is_white):
-                        return True
-                    elif pt == 'K' and is_valid_king_move(self.board, r, c, kr, kc, attacking_is_white):
-                        return True
-        return False
-
-    def is_valid_move(self, from_r, from_c, to_r, to_c, is_white):
-        """
-        檢查一個移動是否合法（不包含會讓自己國王被將軍的情況）
-        """
-        piece = self.board[from_r][from_c]
-        if not piece:
-            return False
-
-        # 這行幫助 IDE 理解 piece 的類型（可選）
-        assert isinstance(piece, str), f"Expected string, got {type(piece)}"
-
-        # 確保棋子顏色正確
-        if (is_white and piece.islower()) or (not is_white and piece.isupper()):
-            return False
-
-        piece_type = piece.upper()
-
-        # 檢查基本移動合法性
-        if piece_type == 'P':
-            return is_valid_pawn_move(self.board, from_r, from_c, to_r, to_c, is_white, self.en_passant_target)
-        elif piece_type == 'N':
-            return is_valid_knight_move(self.board, from_r, from_c, to_r, to_c, is_white)
-        elif piece_type == 'B':
-            return is_valid_bishop_move(self.board, from_r, from_c, to_r, to_c, is_white)
-        elif piece_type == 'R':
-            return is_valid_rook_move(self.board, from_r, from_c, to_r, to_c, is_white)
-        elif piece_type == 'Q':
-            return is_valid_queen_move(self.board, from_r, from_c, to_r, to_c, is_white)
-        elif piece_type == 'K':
-            return is_valid_king_move(self.board, from_r, from_c, to_r, to_c, is_white)
-        return False
-
-    def is_checkmate(self, is_white):
-        """
-        回傳 True 表示「is_white」方已經將死。
-        """
-        # 1. 如果沒有被將軍，不是將死
-        if not self.is_in_check(is_white):
-            return False
-
-        # 2. 掃描該方所有棋子，模擬所有合法移動，看看是否能逃脫將軍
-        for r in range(ROWS):
-            for c in range(COLS):
-                p = self.board[r][c]
-                # 檢查是否為該方的棋子
-                if p and ((is_white and p.isupper()) or (not is_white and p.islower())):
-                    # 該棋子能走的所有格子
-                    for tr in range(ROWS):
-                        for tc in range(COLS):
-                            # 跳過原地
-                            if (r, c) == (tr, tc):
-                                continue
-
-                            # 檢查該走法是否合法
-                            if not self.is_valid_move(r, c, tr, tc, is_white):
-                                continue
-
-                            # 模擬走子
-                            orig_from, orig_to = self.board[r][c], self.board[tr][tc]
-                            self.board[tr][tc] = self.board[r][c]
-                            self.board[r][c] = ''
-
-                            # 檢查模擬後是否仍在將軍
-                            in_check = self.is_in_check(is_white)
-
-                            # 還原
-                            self.board[r][c], self.board[tr][tc] = orig_from, orig_to
-
-                            if not in_check:
-                                # 找到一個能破解將軍的走法，就不是將死
-                                return False
-
-        # 所有走法都無法破解，則將死
-        return True
-
-    def will_be_in_check_after_move(self, from_r, from_c, to_r, to_c, is_white):
-        """
-        檢查移動後是否會讓自己國王陷入將軍
-        """
-        # 模擬移動
-        orig_from = self.board[from_r][from_c]
-        orig_to = self.board[to_r][to_c]
-
-        self.board[to_r][to_c] = orig_from
-        self.board[from_r][from_c] = ""
-
-        # 檢查是否被將軍
-        in_check = self.is_in_check(is_white)
-
-        # 還原棋盤
-        self.board[from_r][from_c] = orig_from
-        self.board[to_r][to_c] = orig_to
-
-        return in_check
-
-    def is_stalemate(self, is_white):
-        """
-        回傳 True 表示「is_white」方此時雖不在將軍，
-        但已經沒有任何合法走法──和棋。
-        """
-        # 1. 如果還在將軍，就不是和棋
-        if self.is_in_check(is_white):
-            return False
-
-        # 2. 檢查是否有任何合法移動
-        legal_moves = self.get_all_legal_moves(is_white)
-        return len(legal_moves) == 0
-
-    def is_fifty_move_rule(self):
-        """
-        檢查是否達到50步規則（100半步）
-        """
-        return self.half_move_clock >= 100
-
-
     def on_click(self, event):
         """
         處理滑鼠左鍵點擊事件：選棋子、移動棋子、檢查合法性、更新棋譜、重繪棋盤。
@@ -496,13 +299,17 @@ class ChessGUI:
         if not (0 <= row < ROWS and 0 <= col < COLS):
             return
 
+        # 棋局結束或輪到引擎時，不接受點擊走子
+        if self.game_over or self.analysis_job is not None or self.search_job is not None:
+            return
+
         clicked_piece = self.board[row][col]
 
         # Step1：如果尚未選取棋子 (self.selected is None)
         if self.selected is None:
             # 只能點到「自己」的棋子才算有效選取
             if clicked_piece and self.is_own_piece(clicked_piece):
-                self.selected = (row, col)
+                self.select((row, col))
             return
 
         # Step2：已選取過棋子，現在要嘗試移動
@@ -511,219 +318,358 @@ class ChessGUI:
 
         # 如果目標格有自己人棋子，就重新選取
         if clicked_piece and self.is_own_piece(clicked_piece):
-            self.selected = (row, col)
+            self.select((row, col))
             return
 
-        # 移動前先檢查「合法性」
-        is_white = piece_to_move.isupper()
-        piece_type = piece_to_move.upper()
-
-        # 檢查是否為 Castling 移動
-        if (piece_type == "K" and from_row == row and
-                from_col == 4 and abs(col - from_col) == 2):
-
-            kingside = (col > from_col)  # 如果目標列大於起始列，則為短易位
-
-            if self.can_castle(kingside, is_white):
-                if self.perform_castle(kingside, is_white):
-                    self.selected = None
-                    # Castling 不重置 50 步計數器（因為沒有吃子或兵移動）
-                    self.half_move_clock += 1
-                    # 換回合
-                    self.turn = 'black' if self.turn == 'white' else 'white'
-                    print(f"Castling performed. Turn: {self.turn}")
-                    # 重繪棋盤
-                    self.draw_board()
-                    return
-            else:
-                print("Invalid castling move")
-                self.selected = None
-                return
-
-        # 一般移動檢查
-        valid = False
-        if piece_type == "P":
-            valid = is_valid_pawn_move(self.board, from_row, from_col, row, col, is_white, self.en_passant_target)
-        elif piece_type == "N":
-            valid = is_valid_knight_move(self.board, from_row, from_col, row, col, is_white)
-        elif piece_type == "R":
-            valid = is_valid_rook_move(self.board, from_row, from_col, row, col, is_white)
-        elif piece_type == "B":
-            valid = is_valid_bishop_move(self.board, from_row, from_col, row, col, is_white)
-        elif piece_type == "Q":
-            valid = is_valid_queen_move(self.board, from_row, from_col, row, col, is_white)
-        elif piece_type == "K":
-            valid = is_valid_king_move(self.board, from_row, from_col, row, col, is_white)
-
-        if not valid:
-            print(f"Invalid {piece_type} move")
-            self.selected = None
+        # self.legal_moves 是選取時從本手的合法走法列表篩出來的，直接比對即可
+        targets = [move for move in self.legal_moves if move[2] == row and move[3] == col]
+        if not targets:
+            print(f"Invalid {piece_to_move.upper()} move")
+            self.select(None)
             return
 
-        # 檢查移動後是否會讓自己國王陷入將軍
-        if self.will_be_in_check_after_move(from_row, from_col, row, col, is_white):
-            print("Move would leave king in check")
-            self.selected = None
-            return
+        # 若兵到達底線，彈出升變選單
+        move = targets[0]
+        if move[4]:
+            move = (from_row, from_col, row, col, self.promotion_dialog(piece_to_move.isupper()))
 
-        # 檢查 Knight / Rook 歧義
-        ambiguous = False
-        if piece_type in ("N", "R"):
-            # 掃描所有同型同色棋子能否走到 (row, col)
-            for r in range(ROWS):
-                for c in range(COLS):
-                    if (r, c) != (from_row, from_col) and self.board[r][c].upper() == piece_type and self.is_own_piece(
-                            self.board[r][c]):
-                        # 其他同型棋子也能走到同一格，算作歧義
-                        fn = is_valid_knight_move if piece_type == "N" else is_valid_rook_move
-                        if fn(self.board, r, c, row, col, is_white):
-                            # 還要檢查該移動不會讓自己國王陷入將軍
-                            if not self.will_be_in_check_after_move(r, c, row, col, is_white):
-                                ambiguous = True
-                                break
-                if ambiguous:
-                    break
-
-        # Step3：若合法才「吃或走格子」並更新棋譜
-        # 判斷是否吃子：只要目標格非空且非己方
-        target_piece = self.board[row][col]
-        is_capture = bool(target_piece) and not self.is_own_piece(target_piece)
-
-        # 先處理 en passant 捕獲
-        if piece_type == "P" and (row, col) == self.en_passant_target and self.en_passant_target is not None:
-            # 被吃掉的兵位於「from_row, to_col」的相對位置
-            captured_row = from_row  # 斜行，原本兵所在地行
-            captured_col = col  # 新行的欄
-            # 從棋盤上移除那顆被吃的兵
-            self.board[captured_row][captured_col] = ""
-            is_capture = True
-
-        # 更新 50 步規則計數器
-        if piece_type == "P" or is_capture:
-            # 兵移動或吃子，重置計數器
-            self.half_move_clock = 0
-        else:
-            # 其他移動，增加計數器
-            self.half_move_clock += 1
+        self.play_move(move)
+
+    def play_move(self, move):
+        """
+        執行一步（玩家或引擎），切換時鐘並重繪棋盤；
+        將死與和棋的判斷交給背景 worker，結果回來後才寫入棋譜。
+        """
+        position = self.position
+        # 記譜需要走之前的局面；這裡只算好 SAN，等背景的終局判斷回來（poll_engine）才寫入棋譜
+        notation = move_to_san(position, move)
 
-        # 更新自己兵的位置
-        self.board[row][col] = piece_to_move
-        self.board[from_row][from_col] = ""
+        self.switch_clock()
+        position.make_move(move)
+        self.last_move = move
         self.selected = None
+        self.legal_moves = []
+        self.draw_board()
 
-        # 更新移動標記
-        if piece_type == "R":
-            if is_white and from_row == 7 and from_col == 0:
-                self.white_rook_a_moved = True
-            elif is_white and from_row == 7 and from_col == 7:
-                self.white_rook_h_moved = True
-            elif not is_white and from_row == 0 and from_col == 0:
-                self.black_rook_a_moved = True
-            elif not is_white and from_row == 0 and from_col == 7:
-                self.black_rook_h_moved = True
-        elif piece_type == "K":
-            if is_white:
-                self.white_king_moved = True
-            else:
-                self.black_king_moved = True
+        self.analysis_job = self.engine.submit_analysis(position.move_history, fen=self.start_fen,
+                                                        context=notation)
 
-        # 若兵到達底線，彈出升變選單
-        if piece_type == "P" and (row == 0 or row == 7):
-            promoted = self.promotion_dialog(is_white)
-            # 將該格的"P"或"p"換成選擇的大寫（白）或小寫（黑）
-            self.board[row][col] = promoted if is_white else promoted.lower()
-
-        # 最後更新 en_passant_target
-        # 當此步是兵從初始位置兩格前進，才設定下一步可被過路吃的目標格
-        if piece_type == "P" and abs(row - from_row) == 2:
-            # 例如白方兵從 row=6 -> row=4，en passant 目標為 (5, from_col)
-            self.en_passant_target = ((from_row + row) // 2, from_col)
-        else:
-            self.en_passant_target = None
+    def poll_engine(self):
+        """
+        由 root.after 定時呼叫，取回背景 worker 完成的工作。
+        """
+        for job_id, kind, result, context in self.engine.poll():
+            if isinstance(result, Exception):
+                print(f"Engine error: {result!r}")
+                if job_id == self.search_job:
+                    self.search_job = None
+                if job_id == self.analysis_job:
+                    self.analysis_job = None
+                continue
+            if kind == ANALYSIS and job_id == self.analysis_job:
+                self.analysis_job = None
+                self.on_position_changed(result, context)
+                continue
+            if kind == SEARCH and job_id == self.search_job:
+                self.search_job = None
+                self.status_label.config(text="")
+                if result.best_move is not None and not self.game_over:
+                    print(f"Engine: depth {result.depth} score {result.score} nodes {result.nodes}")
+                    self.play_move(result.best_move)
+        self.root.after(POLL_INTERVAL, self.poll_engine)
+
+    def on_position_changed(self, status, notation):
+        """
+        終局判斷回來後：記錄棋譜、顯示結束訊息，必要時讓引擎接著走。
+        notation 為 None 表示是載入局面後的判斷，沒有新的一步要記。
+        """
+        if notation is not None:
+            # 記錄棋譜 (SAN 已包含 + 和 # 標記)
+            self.log_move(notation)
+            print(f"Turn: {self.turn}")
 
-        # 換回合
-        self.turn = 'black' if self.turn == 'white' else 'white'
+        self.check_game_over(status)
+        if not self.game_over:
+            self.show_tablebase()
+            self.maybe_start_engine()
 
-        # 檢查對手是否被將軍或將死
+    def check_game_over(self, status):
+        """
+        依終局判斷結果顯示結束訊息，並記下 PGN 結果。
+        """
         opponent_is_white = (self.turn == 'white')
-        in_check = self.is_in_check(opponent_is_white)
-        in_checkmate = False
+        # 顯示將死訊息
+        if status['checkmate']:
+            self.end_game('0-1' if opponent_is_white else '1-0')
+            mb.showinfo("Checkmate", f"{'白方' if opponent_is_white else '黑方'}國王被將死！遊戲結束。")
+        elif status['stalemate']:
+            self.end_game('1/2-1/2')
+            mb.showinfo("Stalemate", f"{'白方' if opponent_is_white else '黑方'}無路可走，和棋！")
+        elif status['fifty_move']:
+            self.end_game('1/2-1/2')
+            mb.showinfo("Stalemate", f"{'白方' if opponent_is_white else '黑方'}50步規則：和棋！")
+        elif status['threefold']:
+            self.end_game('1/2-1/2')
+            mb.showinfo("Stalemate", "三重重複局面：和棋！")
 
-        if in_check:
-            in_checkmate = self.is_checkmate(opponent_is_white)
+    def show_tablebase(self):
+        """
+        局面在殘局庫範圍內時，在狀態列顯示查表結果。
+        """
+        if self.tablebases is None:
+            return
+        outcome = self.tablebases.probe(self.position)
+        if outcome is None:
+            return
+        result, plies = outcome
+        if result == 0:
+            text = "Tablebase: draw"
+        else:
+            winner = self.turn if result > 0 else ('black' if self.turn == 'white' else 'white')
+            text = f"Tablebase: {winner} mates in {(plies + 1) // 2}"
+        self.status_label.config(text=text)
+
+    def end_game(self, result):
+        self.game_over = True
+        self.result = result
+
+    def new_game(self, fen=STARTING_FEN, moves=()):
+        """
+        從 fen 重新開始一盤棋，並重播 moves（載入棋譜時使用）。
+        fen 有誤時拋出 ValueError，目前的棋局不受影響。
+        """
+        position = Position.from_fen(fen)
+        if self.search_job is not None:
+            self.engine.cancel(self.search_job)
+            self.search_job = None
+            self.status_label.config(text="")
+        if self.analysis_job is not None:
+            # 舊棋局的判斷結果編號對不上，回來時會被忽略
+            self.engine.cancel(self.analysis_job)
+            self.analysis_job = None
+        self.start_fen = fen
+        self.position = position
+        self.game_over = False
+        self.result = '*'
+        self.selected = None
+        self.legal_moves = []
+        self.last_move = None
+        self.clocks = {'white': self.time_control, 'black': self.time_control}
+        self.turn_started = time.monotonic()
 
-        # 記錄棋譜 (包含 + 和 # 標記)
-        self.log_move(piece_to_move, from_row, from_col, row, col, is_capture, ambiguous, in_check, in_checkmate)
+        self.move_log.config(state='normal')
+        self.move_log.delete('1.0', 'end')
+        self.move_log.config(state='disabled')
+        self.move_count = self.position.fullmove_number - 1
+        if self.turn == 'black':
+            # 從黑方開始時，第一行先補上白方的位置
+            self.move_count += 1
+            self.move_log.config(state='normal')
+            self.move_log.insert('end', f"{self.move_count:>3}. {'...':<8}")
+            self.move_log.config(state='disabled')
+
+        for move in moves:
+            notation = move_to_san(self.position, move)
+            self.position.make_move(move)
+            self.last_move = move
+            self.log_move(notation)
+        self.draw_board()
+        self.analysis_job = self.engine.submit_analysis(self.position.move_history, fen=self.start_fen)
 
-        print(f"Turn: {self.turn}")
+    def load_fen(self):
+        """
+        輸入 FEN 並從該局面開始新的一盤棋。
+        """
+        fen = sd.askstring("Load FEN", "FEN:", initialvalue=self.position.fen())
+        if not fen:
+            return
+        try:
+            Position.from_fen(fen.strip())
+        except ValueError as exc:
+            mb.showerror("FEN", str(exc))
+            return
+        self.new_game(fen.strip())
 
-        # 1) 記錄新的局面
-        self.record_current_position()
+    def copy_fen(self):
+        """
+        把目前局面的 FEN（含半步數與回合數）複製到剪貼簿。
+        """
+        fen = self.position.fen()
+        self.root.clipboard_clear()
+        self.root.clipboard_append(fen)
+        print(fen)
 
-        # 重繪棋盤
-        self.draw_board()
+    def show_explorer(self):
+        """
+        顯示棋局庫中走到過目前局面的棋局數，以及之後各走法的次數與勝負。
+        """
+        games = self.index.games(self.position)
+        lines = [f"{len(games)} 盤棋走到過這個局面"]
+        stats = self.index.move_stats(self.position, self.archive)
+        for move, (count, white, draw, black) in list(stats.items())[:10]:
+            notation = move_to_san(self.position, move)
+            lines.append(f"{notation:<8} {count:>6}   +{white} ={draw} -{black}")
+        mb.showinfo("Explorer", "\n".join(lines))
 
-        # 顯示將死訊息
-        if in_checkmate:
-            mb.showinfo("Checkmate", f"{'白方' if opponent_is_white else '黑方'}國王被將死！遊戲結束。")
-        else:
-            if self.is_stalemate(opponent_is_white):
-                mb.showinfo("Stalemate", f"{'白方' if opponent_is_white else '黑方'}無路可走，和棋！")
-                return
-            elif self.is_fifty_move_rule():
-                mb.showinfo("Stalemate", f"{'白方' if opponent_is_white else '黑方'}50步規則：和棋！")
+    def save_pgn(self):
+        """
+        把目前這盤棋存成 PGN 檔（附加在檔案最後）。
+        """
+        path = fd.asksaveasfilename(defaultextension=".pgn", filetypes=[("PGN", "*.pgn")])
+        if not path:
+            return
+        headers = {
+            'Event': "Casual game",
+            'Date': time.strftime("%Y.%m.%d"),
+            'White': "Engine" if self.engine_color == 'white' else "Human",
+            'Black': "Engine" if self.engine_color == 'black' else "Human",
+            'Result': self.result,
+        }
+        if self.start_fen != STARTING_FEN:
+            headers['FEN'] = self.start_fen
+        with open(path, 'a', encoding='utf-8') as f:
+            write_game(f, Game(headers, self.position.move_history))
+
+    def load_pgn(self):
+        """
+        載入 PGN 檔的第一盤棋。
+        """
+        path = fd.askopenfilename(filetypes=[("PGN", "*.pgn"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            game = next(read_pgn(path), None)
+        except OSError as exc:
+            mb.showerror("PGN", str(exc))
+            return
+        if game is None:
+            mb.showinfo("PGN", "檔案裡沒有棋局。")
+            return
+        # [FEN] 標頭有誤時整盤棋都無法載入，目前的棋局保持不變
+        try:
+            Position.from_fen(game.fen)
+        except ValueError as exc:
+            mb.showerror("PGN", str(exc))
+            return
+        if game.error:
+            mb.showinfo("PGN", f"棋譜有誤，只載入到出錯前：{game.error}")
+        self.new_game(game.fen, game.moves)
+
+    def maybe_start_engine(self):
+        if self.engine_color == self.turn and not self.game_over:
+            self.engine_move()
+
+    def engine_move(self):
+        """
+        讓引擎替目前執行方思考一步（在背景執行，不會卡住視窗）。
+        """
+        # 上一步的終局判斷還沒回來時不能再走，否則那一步的棋譜會被蓋掉
+        if self.game_over or self.analysis_job is not None or self.search_job is not None:
+            return
+        self.select(None)
+        if self.book is not None:
+            move = self.book.choose(self.position)
+            if move is not None:
+                self.status_label.config(text="Book move")
+                self.play_move(move)
                 return
-            elif self.is_threefold_repetition():
-                mb.showinfo("Stalemate", "三重重複局面：和棋！")
+        if self.tablebases is not None:
+            move = self.tablebases.best_move(self.position)
+            if move is not None:
+                self.play_move(move)
                 return
+        self.search_job = self.engine.submit_search(self.position.move_history, fen=self.start_fen,
+                                                    movetime=self.think_time())
+        self.status_label.config(text="Engine thinking...")
 
-    def log_move(self, piece, from_row, from_col, to_row, to_col, is_capture=False, ambiguous=False, in_check=False,
-                 in_checkmate=False):
-        from_file = chr(ord('a') + from_col)
-        to_file = chr(ord('a') + to_col)
-        to_rank = str(8 - to_row)
-
-        # 兵的記譜
-        if piece.upper() == 'P':
-            if is_capture:
-                move_notation = f"{from_file}x{to_file}{to_rank}"
-            else:
-                move_notation = f"{to_file}{to_rank}"
-        else:
-            cap = 'x' if is_capture else ''
-            if ambiguous:
-                # ambiguous
-                move_notation = f"{piece.upper()}{from_file}{cap}{to_file}{to_rank}"
-            else:
-                # 正常
-                move_notation = f"{piece.upper()}{cap}{to_file}{to_rank}"
-
-        # 如果剛才是升變，board[to_row][to_col] 現在是新的棋子
-        new_piece = self.board[to_row][to_col].upper()
-        if piece.upper() == 'P' and new_piece in ('Q', 'R', 'B', 'N'):
-            # 加上 =Q 等
-            move_notation += f"={new_piece}"
-
-        # 添加將軍和將死標記
-        if in_checkmate:
-            move_notation += "#"
-        elif in_check:
-            move_notation += "+"
+    def stop_engine(self):
+        """
+        要求引擎立刻停止，並以目前為止最好的走法應著。
+        """
+        if self.search_job is not None:
+            self.engine.cancel(self.search_job)
+
+    def think_time(self):
+        """
+        依剩餘時間分配這一步的思考時間（秒）。
+        """
+        if self.time_control is None:
+            return 3.0
+        remaining = self.clocks[self.turn] - (time.monotonic() - self.turn_started)
+        return max(0.05, remaining / 30 + self.increment * 0.8)
 
+    def switch_clock(self):
+        """
+        走子方按下時鐘：扣掉這一步用掉的時間並加上每步加秒。
+        """
+        now = time.monotonic()
+        if self.time_control is not None:
+            self.clocks[self.turn] -= now - self.turn_started
+            self.clocks[self.turn] += self.increment
+        self.turn_started = now
+
+    def update_clocks(self):
+        if self.time_control is not None:
+            for color, label in self.clock_labels.items():
+                remaining = self.clocks[color]
+                if color == self.turn and not self.game_over:
+                    remaining -= time.monotonic() - self.turn_started
+                remaining = max(0.0, remaining)
+                minutes, seconds = divmod(int(remaining), 60)
+                label.config(text=f"{'白' if color == 'white' else '黑'} {minutes:02d}:{seconds:02d}")
+                if remaining <= 0 and color == self.turn and not self.game_over:
+                    self.end_game('0-1' if color == 'white' else '1-0')
+                    self.stop_engine()
+                    mb.showinfo("Time", f"{'白方' if color == 'white' else '黑方'}超時，遊戲結束。")
+        self.root.after(CLOCK_INTERVAL, self.update_clocks)
+
+    def on_close(self):
+        self.engine.close()
+        for resource in (self.book, self.index, self.archive, self.tablebases):
+            if resource is not None:
+                resource.close()
+        self.root.destroy()
+
+    def log_move(self, notation):
+        """
+        把剛走完的一步（SAN）寫進棋譜，白方的步數前面加上回合數。
+        """
         # 對齊 & 插入
         num_width, move_width = 3, 8
         self.move_log.config(state='normal')
         if self.turn == 'black':  # 剛移動完的是白方
             self.move_count += 1
-            text = f"{self.move_count:>{num_width}}. {move_notation:<{move_width}}"
+            text = f"{self.move_count:>{num_width}}. {notation:<{move_width}}"
         else:  # 剛移動完的是黑方
-            text = f"{move_notation}\n"
+            text = f"{notation}\n"
         self.move_log.insert('end', text)
         self.move_log.config(state='disabled')
         self.move_log.see('end')
 
 # 主程式：建立 TK 視窗並啟動
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chess game")
+    parser.add_argument('--engine', choices=('white', 'black'), help="side played by the engine")
+    parser.add_argument('--time', type=float, help="minutes per side (no clock if omitted)")
+    parser.add_argument('--increment', type=float, default=0, help="seconds added per move")
+    parser.add_argument('--book', help="Polyglot opening book (.bin) for the engine")
+    parser.add_argument('--book-randoms', help="non-standard Polyglot random table used by the book")
+    parser.add_argument('--index', help="position index (.idx) for the explorer")
+    parser.add_argument('--archive', help="game archive (.cga) the index was built from")
+    parser.add_argument('--tablebases', help="directory of endgame tables (.tb) made by tablebase.py")
+    args = parser.parse_args()
+
+    book = None
+    if args.book:
+        randoms = load_randoms(args.book_randoms) if args.book_randoms else None
+        if randoms is not None and not is_standard(randoms):
+            print("warning: random table does not give the standard Polyglot keys", file=sys.stderr)
+        book = OpeningBook(args.book, randoms)
+
     root = tk.Tk()
-    app = ChessGUI(root)
+    app = ChessGUI(root, engine_color=args.engine,
+                   time_control=args.time * 60 if args.time else None, increment=args.increment, book=book,
+                   index=PositionIndex(args.index) if args.index else None,
+                   archive=GameArchive(args.archive) if args.archive else None,
+                   tablebases=Tablebases(args.tablebases) if args.tablebases else None)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,206 @@
+# perft：從某局面往下數到指定深度的所有葉節點數，用來驗證走法產生器並量測速度。
+# 用法：
+#   python perft.py                         # 所有參考局面，深度 3，list 後端
+#   python perft.py --backend bitboard -d 4
+#   python perft.py --fen "<FEN>" -d 3 --divide
+#   python perft.py -d 5 -j 8                # 用 8 個行程平行計算
+#   python perft.py --fen-file positions.fen -d 3 -j 8
+import argparse
+import sys
+import time
+
+from position import BACKENDS, STARTING_FEN, create_position, move_to_uci, uci_to_move
+from workers import PositionPool, fen_of, read_fens
+
+# 標準參考局面與各深度的正確節點數（深度 1 起算）
+REFERENCE_POSITIONS = [
+    ("startpos", STARTING_FEN,
+     [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603]),
+    ("en-passant", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624]),
+    ("promotion", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333]),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487]),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594]),
+]
+
+
+def perft(position, depth):
+    """
+    回傳 position 往下 depth 層的葉節點數。
+    """
+    moves = position.legal_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move()
+    return nodes
+
+
+def divide(position, depth):
+    """
+    回傳 [(UCI 走法, 該走法之下的節點數), ...]，用來找出與參考程式不同的分支。
+    """
+    result = []
+    for move in position.legal_moves():
+        position.make_move(move)
+        result.append((move_to_uci(move), perft(position, depth - 1)))
+        position.unmake_move()
+    return result
+
+
+def _perft_task(task):
+    """
+    子行程執行的工作：task = (FEN, 後端, 先走的 UCI 走法, 剩餘深度)。
+    只傳字串，不傳局面物件，pickle 的成本很小。
+    """
+    fen, backend, uci_moves, depth = task
+    position = create_position(backend, fen=fen)
+    for uci in uci_moves:
+        position.make_move(uci_to_move(uci))
+    return perft(position, depth)
+
+
+def parallel_divide(fen, depth, backend='list', pool=None, split_depth=1):
+    """
+    把根節點（split_depth=2 時為前兩層）的分支分給行程池計算，
+    回傳 [(UCI 走法, 節點數), ...]，格式與 divide() 相同。
+    """
+    position = create_position(backend, fen=fen)
+    split_depth = max(1, min(split_depth, depth - 1))
+    tasks = []
+    counts = {}
+    for move in position.legal_moves():
+        root = move_to_uci(move)
+        counts[root] = 0
+        if split_depth == 1:
+            tasks.append((fen, backend, (root,), depth - 1))
+            continue
+        position.make_move(move)
+        replies = position.legal_moves()
+        position.unmake_move()
+        # 沒有回應的走法（將死或逼和）在這個深度之下沒有葉節點，維持 0 即可
+        for reply in replies:
+            tasks.append((fen, backend, (root, move_to_uci(reply)), depth - 2))
+
+    own_pool = pool is None
+    if own_pool:
+        pool = PositionPool()
+    try:
+        for task, nodes in pool.run_unordered(_perft_task, tasks):
+            counts[task[2][0]] += nodes
+    finally:
+        if own_pool:
+            pool.close()
+    return list(counts.items())
+
+
+def run_perft(fen, depth, backend='list', show_divide=False, out=sys.stdout, pool=None, split_depth=1):
+    """
+    執行一次 perft 並印出節點數與每秒節點數，回傳節點數。
+    有給 pool 時以平行模式計算。
+    """
+    position = create_position(backend, fen=fen)
+    start = time.perf_counter()
+    if pool is not None and depth > 1:
+        counts = parallel_divide(fen, depth, backend, pool, split_depth)
+        nodes = sum(n for _, n in counts)
+    elif show_divide:
+        counts = divide(position, depth)
+        nodes = sum(n for _, n in counts)
+    else:
+        nodes = perft(position, depth)
+    elapsed = time.perf_counter() - start
+    if show_divide:
+        for uci, n in sorted(counts):
+            print(f"{uci}: {n}", file=out)
+    nps = nodes / elapsed if elapsed > 0 else 0
+    print(f"depth {depth}: {nodes} nodes in {elapsed:.3f}s ({nps:,.0f} nps)", file=out)
+    return nodes
+
+
+def run_suite(depth, backend='list', out=sys.stdout, pool=None, split_depth=1):
+    """
+    以參考局面驗證走法產生器，回傳 True 表示全部節點數正確。
+    """
+    all_ok = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in REFERENCE_POSITIONS:
+        d = min(depth, len(expected))
+        start = time.perf_counter()
+        if pool is not None and d > 1:
+            nodes = sum(n for _, n in parallel_divide(fen, d, backend, pool, split_depth))
+        else:
+            nodes = perft(create_position(backend, fen=fen), d)
+        elapsed = time.perf_counter() - start
+        total_nodes += nodes
+        total_time += elapsed
+        ok = nodes == expected[d - 1]
+        all_ok = all_ok and ok
+        nps = nodes / elapsed if elapsed > 0 else 0
+        status = "ok" if ok else f"FAIL (expected {expected[d - 1]})"
+        print(f"{name:<12} depth {d}: {nodes:>10} nodes {elapsed:8.3f}s {nps:>12,.0f} nps  {status}",
+              file=out)
+    nps = total_nodes / total_time if total_time > 0 else 0
+    print(f"{'total':<12} [{backend}] {total_nodes} nodes {total_time:.3f}s {nps:,.0f} nps", file=out)
+    return all_ok
+
+
+def run_batch(lines, depth, backend='list', pool=None, out=sys.stdout):
+    """
+    對一串 FEN（或 EPD）各自做 perft；有 pool 時每個局面是一個工作，依輸入順序印出結果。
+    """
+    tasks = [(fen_of(line), backend, (), depth) for line in lines]
+    start = time.perf_counter()
+    if pool is not None:
+        results = pool.map(_perft_task, tasks)
+    else:
+        results = map(_perft_task, tasks)
+    total = 0
+    for task, nodes in zip(tasks, results):
+        total += nodes
+        print(f"{nodes:>12}  {task[0]}", file=out)
+    elapsed = time.perf_counter() - start
+    nps = total / elapsed if elapsed > 0 else 0
+    print(f"{len(tasks)} positions, {total} nodes in {elapsed:.3f}s ({nps:,.0f} nps)", file=out)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft benchmark and move generator check")
+    parser.add_argument('-d', '--depth', type=int, default=3)
+    parser.add_argument('-b', '--backend', choices=BACKENDS, default='list')
+    parser.add_argument('--fen', help="run a single position instead of the reference suite")
+    parser.add_argument('--divide', action='store_true', help="print node counts per root move")
+    parser.add_argument('--fen-file', help="run perft on every FEN in this file")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="worker processes (1 = in this process, 0 = all cores)")
+    parser.add_argument('--split', type=int, choices=(1, 2), default=1,
+                        help="plies to expand before handing work to the pool")
+    args = parser.parse_args(argv)
+
+    pool = PositionPool(args.jobs or None) if args.jobs != 1 else None
+    try:
+        if args.fen_file:
+            run_batch(read_fens(args.fen_file), args.depth, args.backend, pool)
+            return 0
+        if args.fen or args.divide:
+            run_perft(args.fen or STARTING_FEN, args.depth, args.backend, args.divide,
+                      pool=pool, split_depth=args.split)
+            return 0
+        return 0 if run_suite(args.depth, args.backend, pool=pool, split_depth=args.split) else 1
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+# PGN 讀寫：逐盤串流讀取棋譜檔，記憶體用量只跟單盤棋有關，跟檔案大小無關。
+# 用法：
+#   python pgn.py games.pgn                  # 讀入並驗證每一步，印出速度
+#   python pgn.py games.pgn --headers-only   # 只讀標頭（建立索引用）
+#   python pgn.py games.pgn --no-validate    # 只切出 SAN，不重播走法
+#   python pgn.py games.pgn --out clean.pgn  # 驗證後重新輸出
+import argparse
+import re
+import sys
+import time
+
+from position import BACKENDS, STARTING_FEN, create_position, move_to_san, san_to_move
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+# PGN 規定一定要有、而且要依這個順序輸出的七個標頭
+SEVEN_TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+TAG_DEFAULTS = {'Date': '????.??.??', 'Result': '*'}
+LINE_WIDTH = 80
+
+_TAG_RE = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# 註解 {...}、行尾註解 ;...、NAG $n、變化括號、回合數 12. / 12...，其餘都是走法或結果
+_TOKEN_RE = re.compile(r'\{[^}]*\}?|;[^\n]*|\$\d+|[()]|\d+\.+|[^\s{}();$]+')
+
+
+class Game:
+    """
+    一盤棋：標頭、起始局面與走法。
+
+    sans 是棋譜上的原始 SAN；有驗證時 moves 是對應的走法 tuple。
+    只讀標頭時兩者都是空的。驗證失敗時 error 記錄原因，moves 停在出錯前一步。
+    """
+
+    def __init__(self, headers=None, moves=None, sans=None, error=None):
+        self.headers = headers if headers is not None else {}
+        self.moves = moves if moves is not None else []
+        self.sans = sans if sans is not None else []
+        self.error = error
+
+    @property
+    def fen(self):
+        return self.headers.get('FEN', STARTING_FEN)
+
+    @property
+    def result(self):
+        return self.headers.get('Result', '*')
+
+    def replay(self, backend='list'):
+        """
+        回傳走完所有走法後的局面。
+        """
+        position = create_position(backend, fen=self.fen)
+        for move in self.moves:
+            position.make_move(move)
+        return position
+
+    def __repr__(self):
+        return (f"Game({self.headers.get('White', '?')} - {self.headers.get('Black', '?')}, "
+                f"{self.result}, {len(self.moves) or len(self.sans)} plies)")
+
+
+def read_pgn(path, **options):
+    """
+    開啟 PGN 檔並逐盤產生 Game，參數同 read_games()。
+    """
+    with open(path, encoding='utf-8', errors='replace') as f:
+        yield from read_games(f, **options)
+
+
+def read_games(stream, headers_only=False, validate=True, backend='list'):
+    """
+    從文字串流逐盤產生 Game。
+
+    headers_only: 只解析標頭，走法部分直接略過
+    validate:     以規則引擎把 SAN 轉成走法（False 時只保留 SAN 字串）
+    """
+    headers = {}
+    movetext = []
+    in_moves = False
+    for line in stream:
+        if line.startswith('%'):
+            # 跳脫行，依規格忽略
+            continue
+        stripped = line.strip()
+        if stripped.startswith('['):
+            if in_moves:
+                yield _finish_game(headers, movetext, headers_only, validate, backend)
+                headers = {}
+                movetext = []
+                in_moves = False
+            match = _TAG_RE.match(stripped)
+            if match:
+                headers[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+            continue
+        if stripped:
+            in_moves = True
+            if not headers_only:
+                movetext.append(line)
+    if headers or in_moves:
+        yield _finish_game(headers, movetext, headers_only, validate, backend)
+
+
+def _finish_game(headers, movetext, headers_only, validate, backend):
+    if headers_only:
+        return Game(headers)
+    sans = parse_movetext(''.join(movetext), headers)
+    game = Game(headers, sans=sans)
+    if validate:
+        try:
+            position = create_position(backend, fen=game.fen)
+        except ValueError as exc:
+            game.error = str(exc)
+            return game
+        moves = game.moves
+        for san in sans:
+            try:
+                move = san_to_move(position, san)
+            except ValueError as exc:
+                game.error = f"ply {len(moves) + 1}: {exc}"
+                break
+            position.make_move(move)
+            moves.append(move)
+    return game
+
+
+def parse_movetext(text, headers=None):
+    """
+    從走法部分取出主線的 SAN 列表；略過註解、NAG 與變化。
+    遇到結果符號時停止，並在標頭沒有 Result 時補上。
+    """
+    sans = []
+    depth = 0
+    for token in _TOKEN_RE.findall(text):
+        first = token[0]
+        if first == '(':
+            depth += 1
+        elif first == ')':
+            depth = max(0, depth - 1)
+        elif depth or first in '{;$' or (first.isdigit() and token[-1] == '.'):
+            continue
+        elif token in RESULTS:
+            if headers is not None:
+                headers.setdefault('Result', token)
+            break
+        else:
+            sans.append(token)
+    return sans
+
+
+def format_game(game, backend='list'):
+    """
+    把 Game 轉成 PGN 文字。走法以規則引擎重新產生標準 SAN，每行不超過 80 字。
+    """
+    headers = dict(game.headers)
+    if game.fen != STARTING_FEN:
+        headers.setdefault('SetUp', '1')
+    lines = []
+    for tag in SEVEN_TAG_ROSTER:
+        lines.append(_format_tag(tag, headers.pop(tag, TAG_DEFAULTS.get(tag, '?'))))
+    for tag, value in headers.items():
+        lines.append(_format_tag(tag, value))
+    lines.append('')
+
+    position = create_position(backend, fen=game.fen)
+    tokens = []
+    for i, move in enumerate(game.moves):
+        if position.turn == 'white':
+            tokens.append(f"{position.fullmove_number}.")
+        elif i == 0:
+            tokens.append(f"{position.fullmove_number}...")
+        tokens.append(move_to_san(position, move))
+        position.make_move(move)
+    tokens.append(game.result)
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+def _format_tag(tag, value):
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'[{tag} "{value}"]'
+
+
+def write_game(out, game, backend='list'):
+    """
+    把一盤棋寫進文字串流，盤與盤之間空一行。
+    """
+    out.write(format_game(game, backend))
+    out.write('\n')
+
+
+def write_games(out, games, backend='list'):
+    """
+    把多盤棋依序寫出，回傳寫出的盤數；games 可以是 read_games() 的產生器。
+    """
+    count = 0
+    for game in games:
+        write_game(out, game, backend)
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read, validate and re-export PGN files")
+    parser.add_argument('path')
+    parser.add_argument('--headers-only', action='store_true', help="only parse tag pairs")
+    parser.add_argument('--no-validate', action='store_true', help="split SAN tokens without replaying them")
+    parser.add_argument('-b', '--backend', choices=BACKENDS, default='list')
+    parser.add_argument('--out', help="write the validated games to this PGN file")
+    args = parser.parse_args(argv)
+
+    validate = not args.no_validate
+    out = open(args.out, 'w', encoding='utf-8') if args.out else None
+    games = plies = errors = 0
+    start = time.perf_counter()
+    try:
+        for game in read_pgn(args.path, headers_only=args.headers_only, validate=validate,
+                             backend=args.backend):
+            games += 1
+            plies += len(game.moves) if validate else len(game.sans)
+            if game.error:
+                errors += 1
+                print(f"game {games}: {game.error}", file=sys.stderr)
+            elif out is not None and validate:
+                write_game(out, game, args.backend)
+    finally:
+        if out is not None:
+            out.close()
+    elapsed = time.perf_counter() - start
+    rate = games / elapsed * 60 if elapsed > 0 else 0
+    print(f"{games} games, {plies} plies, {errors} errors in {elapsed:.3f}s ({rate:,.0f} games/min)")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
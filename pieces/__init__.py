@@ -1,7 +1,9 @@
-from .bishop import is_valid_bishop_move
-from .rook import is_valid_rook_move
-from .queen import is_valid_queen_move
-from .king import is_valid_king_move
-from .knight import is_valid_knight_move
-from .pawn import is_valid_pawn_move
+from .bishop import is_valid_bishop_move, generate_bishop_moves
+from .rook import is_valid_rook_move, generate_rook_moves
+from .queen import is_valid_queen_move, generate_queen_moves
+from .king import is_valid_king_move, generate_king_moves
+from .knight import is_valid_knight_move, generate_knight_moves
+from .pawn import is_valid_pawn_move, generate_pawn_moves
 from .utils import is_own_piece, is_opponent_piece
+from .attacks import is_square_attacked
+from .stages import generate_captures
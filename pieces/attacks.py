@@ -0,0 +1,48 @@
+from .tables import KNIGHT_TARGETS, KING_TARGETS, ROOK_RAYS, BISHOP_RAYS
+
+
+def is_square_attacked(board, row, col, by_white):
+    """
+    回傳 True 表示 by_white 方有棋子攻擊 (row, col)。
+    從目標格往外找：騎士與國王查表、兵看斜後方兩格、滑行棋子沿八條射線找第一個棋子。
+    """
+    square = row * 8 + col
+    if by_white:
+        pawn, knight, king, straight, diagonal = 'P', 'N', 'K', ('R', 'Q'), ('B', 'Q')
+        pawn_row = row + 1
+    else:
+        pawn, knight, king, straight, diagonal = 'p', 'n', 'k', ('r', 'q'), ('b', 'q')
+        pawn_row = row - 1
+
+    # 兵：白兵從下方斜吃上來，黑兵從上方斜吃下來
+    if 0 <= pawn_row < 8:
+        if col > 0 and board[pawn_row][col - 1] == pawn:
+            return True
+        if col < 7 and board[pawn_row][col + 1] == pawn:
+            return True
+
+    for r, c in KNIGHT_TARGETS[square]:
+        if board[r][c] == knight:
+            return True
+
+    for r, c in KING_TARGETS[square]:
+        if board[r][c] == king:
+            return True
+
+    for ray in ROOK_RAYS[square]:
+        for r, c in ray:
+            piece = board[r][c]
+            if piece:
+                if piece in straight:
+                    return True
+                break
+
+    for ray in BISHOP_RAYS[square]:
+        for r, c in ray:
+            piece = board[r][c]
+            if piece:
+                if piece in diagonal:
+                    return True
+                break
+
+    return False
@@ -1,4 +1,5 @@
 from .utils import is_opponent_piece
+from .tables import BISHOP_RAYS, slide_moves
 
 def is_valid_bishop_move(board, from_row, from_col, to_row, to_col, is_white):
     if abs(from_row - to_row) != abs(from_col - to_col):
@@ -16,3 +17,7 @@ def is_valid_bishop_move(board, from_row, from_col, to_row, to_col, is_white):
 
     destination = board[to_row][to_col]
     return destination == "" or is_opponent_piece(destination, is_white)
+
+
+def generate_bishop_moves(board, from_row, from_col, is_white):
+    return slide_moves(board, from_row, from_col, is_white, BISHOP_RAYS[from_row * 8 + from_col])
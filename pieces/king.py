@@ -1,4 +1,5 @@
 from .utils import is_opponent_piece
+from .tables import KING_TARGETS
 
 def is_valid_king_move(board, from_row, from_col, to_row, to_col, is_white):
     row_diff = abs(to_row - from_row)
@@ -10,3 +11,13 @@ def is_valid_king_move(board, from_row, from_col, to_row, to_col, is_white):
         return target == "" or is_opponent_piece(target, is_white)
 
     return False
+
+
+def generate_king_moves(board, from_row, from_col, is_white):
+    # castling 需要檢查被攻擊的格子，由 Position 另外產生
+    moves = []
+    for tr, tc in KING_TARGETS[from_row * 8 + from_col]:
+        target = board[tr][tc]
+        if target == "" or target.isupper() != is_white:
+            moves.append((from_row, from_col, tr, tc, ''))
+    return moves
@@ -1,4 +1,5 @@
 from .utils import is_opponent_piece
+from .tables import KNIGHT_TARGETS
 
 def is_valid_knight_move(board, from_row, from_col, to_row, to_col, is_white):
     row_diff = abs(to_row - from_row)
@@ -12,3 +13,12 @@ def is_valid_knight_move(board, from_row, from_col, to_row, to_col, is_white):
         return True
 
     return False
+
+
+def generate_knight_moves(board, from_row, from_col, is_white):
+    moves = []
+    for tr, tc in KNIGHT_TARGETS[from_row * 8 + from_col]:
+        target = board[tr][tc]
+        if target == "" or target.isupper() != is_white:
+            moves.append((from_row, from_col, tr, tc, ''))
+    return moves
@@ -27,3 +27,35 @@ def is_valid_pawn_move(board, from_row, from_col, to_row, to_col, is_white, en_p
             return True
     return False
 
+PROMOTION_PIECES = ('Q', 'R', 'B', 'N')
+
+
+def generate_pawn_moves(board, from_row, from_col, is_white, en_passant_target=None):
+    """
+    產生兵的走法：前進一格、起始兩格、斜吃、en passant，到達底線時展開成四種升變。
+    """
+    direction = -1 if is_white else 1
+    start_row = 6 if is_white else 1
+    to_row = from_row + direction
+    moves = []
+
+    # 一格向前走，以及起始兩格前進
+    if board[to_row][from_col] == "":
+        moves.append((from_row, from_col, to_row, from_col, ''))
+        if from_row == start_row and board[to_row + direction][from_col] == "":
+            moves.append((from_row, from_col, to_row + direction, from_col, ''))
+
+    # 斜向吃子與 en passant
+    for to_col in (from_col - 1, from_col + 1):
+        if 0 <= to_col < 8:
+            target = board[to_row][to_col]
+            if target != "":
+                if target.isupper() != is_white:
+                    moves.append((from_row, from_col, to_row, to_col, ''))
+            elif en_passant_target == (to_row, to_col):
+                moves.append((from_row, from_col, to_row, to_col, ''))
+
+    # 到達底線：每一步都展開成四種升變
+    if to_row == 0 or to_row == 7:
+        return [(fr, fc, tr, tc, promo) for fr, fc, tr, tc, _ in moves for promo in PROMOTION_PIECES]
+    return moves
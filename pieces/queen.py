@@ -1,5 +1,6 @@
 from .rook import is_valid_rook_move
 from .bishop import is_valid_bishop_move
+from .tables import QUEEN_RAYS, slide_moves
 
 def is_valid_queen_move(board, from_row, from_col, to_row, to_col, is_white):
     return (
@@ -7,3 +8,7 @@ def is_valid_queen_move(board, from_row, from_col, to_row, to_col, is_white):
         or
         is_valid_bishop_move(board, from_row, from_col, to_row, to_col, is_white)
     )
+
+
+def generate_queen_moves(board, from_row, from_col, is_white):
+    return slide_moves(board, from_row, from_col, is_white, QUEEN_RAYS[from_row * 8 + from_col])
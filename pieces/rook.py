@@ -1,4 +1,5 @@
 from .utils import is_opponent_piece
+from .tables import ROOK_RAYS, slide_moves
 
 def is_valid_rook_move(board, from_row, from_col, to_row, to_col, is_white):
     if from_row != to_row and from_col != to_col:
@@ -16,3 +17,7 @@ def is_valid_rook_move(board, from_row, from_col, to_row, to_col, is_white):
 
     destination = board[to_row][to_col]
     return destination == "" or is_opponent_piece(destination, is_white)
+
+
+def generate_rook_moves(board, from_row, from_col, is_white):
+    return slide_moves(board, from_row, from_col, is_white, ROOK_RAYS[from_row * 8 + from_col])
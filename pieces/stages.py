@@ -0,0 +1,54 @@
+# 分階段產生走法用的階段旗標，以及只產生吃子與升變的產生器。
+from .tables import KNIGHT_TARGETS, KING_TARGETS, ROOK_RAYS, BISHOP_RAYS, QUEEN_RAYS
+from .pawn import PROMOTION_PIECES
+
+# 吃子與升變、國王以外的其他走法、國王的其他走法與 castling
+CAPTURES, QUIET, KING = 1, 2, 4
+ALL_STAGES = CAPTURES | QUIET | KING
+
+STEP_TARGETS = {'N': KNIGHT_TARGETS, 'K': KING_TARGETS}
+SLIDER_RAYS = {'B': BISHOP_RAYS, 'R': ROOK_RAYS, 'Q': QUEEN_RAYS}
+
+
+def generate_captures(board, from_row, from_col, is_white, en_passant_target=None):
+    """
+    只產生 (from_row, from_col) 這個棋子的吃子與升變（含 en passant 與直走升變），
+    不產生其他走法，給分階段產生走法與靜態搜尋使用。
+    """
+    kind = board[from_row][from_col].upper()
+    square = from_row * 8 + from_col
+    moves = []
+    if kind == 'P':
+        to_row = from_row + (-1 if is_white else 1)
+        promote = to_row == 0 or to_row == 7
+        cols = []
+        if promote and board[to_row][from_col] == "":
+            cols.append(from_col)
+        for to_col in (from_col - 1, from_col + 1):
+            if 0 <= to_col < 8:
+                target = board[to_row][to_col]
+                if target != "":
+                    if target.isupper() != is_white:
+                        cols.append(to_col)
+                elif en_passant_target == (to_row, to_col):
+                    cols.append(to_col)
+        if promote:
+            return [(from_row, from_col, to_row, tc, promo) for tc in cols for promo in PROMOTION_PIECES]
+        return [(from_row, from_col, to_row, tc, '') for tc in cols]
+
+    if kind in STEP_TARGETS:
+        for tr, tc in STEP_TARGETS[kind][square]:
+            target = board[tr][tc]
+            if target != "" and target.isupper() != is_white:
+                moves.append((from_row, from_col, tr, tc, ''))
+        return moves
+
+    # 滑行棋子：每條射線只看第一個遇到的棋子
+    for ray in SLIDER_RAYS[kind][square]:
+        for tr, tc in ray:
+            target = board[tr][tc]
+            if target != "":
+                if target.isupper() != is_white:
+                    moves.append((from_row, from_col, tr, tc, ''))
+                break
+    return moves
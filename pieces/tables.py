@@ -0,0 +1,58 @@
+# 預先計算好的目標格表，以 row * 8 + col 為索引。
+# 騎士與國王直接查表，滑行棋子（城堡、主教、皇后）則沿著每個方向的射線走到被擋住為止。
+
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+
+def _targets(offsets):
+    table = []
+    for r in range(8):
+        for c in range(8):
+            table.append(tuple((r + dr, c + dc) for dr, dc in offsets
+                               if 0 <= r + dr < 8 and 0 <= c + dc < 8))
+    return table
+
+
+def _rays(directions):
+    table = []
+    for r in range(8):
+        for c in range(8):
+            rays = []
+            for dr, dc in directions:
+                ray = []
+                tr, tc = r + dr, c + dc
+                while 0 <= tr < 8 and 0 <= tc < 8:
+                    ray.append((tr, tc))
+                    tr += dr
+                    tc += dc
+                if ray:
+                    rays.append(tuple(ray))
+            table.append(tuple(rays))
+    return table
+
+
+KNIGHT_TARGETS = _targets(KNIGHT_OFFSETS)
+KING_TARGETS = _targets(KING_OFFSETS)
+ROOK_RAYS = _rays(ROOK_DIRECTIONS)
+BISHOP_RAYS = _rays(BISHOP_DIRECTIONS)
+QUEEN_RAYS = [rook + bishop for rook, bishop in zip(ROOK_RAYS, BISHOP_RAYS)]
+
+
+def slide_moves(board, from_row, from_col, is_white, rays):
+    """
+    沿著射線產生滑行走法：遇到空格繼續，遇到敵方棋子吃掉後停下，遇到己方棋子直接停下。
+    """
+    moves = []
+    for ray in rays:
+        for tr, tc in ray:
+            target = board[tr][tc]
+            if target == "":
+                moves.append((from_row, from_col, tr, tc, ''))
+                continue
+            if target.isupper() != is_white:
+                moves.append((from_row, from_col, tr, tc, ''))
+            break
+    return moves
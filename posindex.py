@@ -0,0 +1,264 @@
+# 局面索引：「哪些棋局走到過這個局面」。
+# 以 Position 的 Zobrist key（也就是判斷重複局面用的那個 key）為索引，
+# 每筆記錄 (key, 棋局編號, ply, 下一步) 共 16 bytes，依 key 排序存檔，查詢時 mmap + 二分搜尋。
+#
+# 建立索引時逐盤讀取棋局，記錄累積到一定數量就排序後寫成一個分片（shard），
+# 最後以 heapq.merge 把所有分片合併成一個檔案，資料比記憶體大也沒問題。
+# 用法：
+#   python posindex.py build games.cga -o games.idx
+#   python posindex.py query games.idx --fen "<FEN>" --archive games.cga
+import argparse
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+
+from archive import GameArchive, decode_move, encode_move
+from pgn import read_pgn
+from position import STARTING_FEN, create_position, move_to_uci
+
+MAGIC = b'CHPI'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQ')
+# key、棋局編號、ply、下一步（archive 的 16 位元編碼；0 表示棋局在此結束）
+ENTRY = struct.Struct('<QIHH')
+KEY = struct.Struct('<Q')
+NO_MOVE = 0
+SHARD_ENTRIES = 1 << 20
+WRITE_BATCH = 4096
+
+
+def archive_games(archive):
+    """
+    從 GameArchive 逐盤產生 (棋局編號, 起始 FEN, 走法列表)。
+    """
+    for game_id in range(len(archive)):
+        yield game_id, archive.fen(game_id), archive.moves(game_id)
+
+
+def pgn_games(paths):
+    """
+    從 PGN 檔逐盤產生 (棋局編號, 起始 FEN, 走法列表)。
+    有錯的棋局略過且不佔編號，與 archive.pack_pgn() 寫入的棋局編號一致。
+    """
+    game_id = 0
+    for path in paths:
+        for game in read_pgn(path):
+            if game.error:
+                continue
+            yield game_id, game.fen, game.moves
+            game_id += 1
+
+
+def game_entries(game_id, fen, moves, backend='list'):
+    """
+    重播一盤棋，產生每個局面的 (key, 棋局編號, ply, 下一步)。
+    """
+    position = create_position(backend, fen=fen)
+    for ply, move in enumerate(moves):
+        yield position.key, game_id, ply, encode_move(move)
+        position.make_move(move)
+    yield position.key, game_id, len(moves), NO_MOVE
+
+
+def _write_entries(path, entries):
+    # entries 必須已經排序；檔頭的數量在寫完後回填
+    count = 0
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+        batch = []
+        for entry in entries:
+            batch.append(ENTRY.pack(*entry))
+            if len(batch) >= WRITE_BATCH:
+                f.write(b''.join(batch))
+                count += len(batch)
+                batch = []
+        f.write(b''.join(batch))
+        count += len(batch)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, 0, count))
+    return count
+
+
+def _read_entries(path):
+    # 依序讀出一個分片的所有記錄（給 heapq.merge 用）
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            view = memoryview(data)[HEADER.size:]
+            try:
+                yield from ENTRY.iter_unpack(view)
+            finally:
+                view.release()
+        finally:
+            data.close()
+
+
+def build_index(games, out_path, shard_entries=SHARD_ENTRIES, tmp_dir=None, backend='list'):
+    """
+    建立局面索引，回傳 (記錄數, 分片數)。
+    games 是 (棋局編號, 起始 FEN, 走法列表) 的可迭代物件，見 archive_games()、pgn_games()。
+    """
+    tmp_dir = tmp_dir or os.path.dirname(os.path.abspath(out_path))
+    shards = []
+    buffer = []
+
+    def flush():
+        buffer.sort()
+        fd, path = tempfile.mkstemp(suffix='.shard', dir=tmp_dir)
+        os.close(fd)
+        _write_entries(path, buffer)
+        shards.append(path)
+        buffer.clear()
+
+    try:
+        for game_id, fen, moves in games:
+            buffer.extend(game_entries(game_id, fen, moves, backend))
+            if len(buffer) >= shard_entries:
+                flush()
+        if buffer or not shards:
+            flush()
+        if len(shards) == 1:
+            os.replace(shards[0], out_path)
+            shards.clear()
+            with open(out_path, 'rb') as f:
+                count = HEADER.unpack(f.read(HEADER.size))[3]
+            return count, 1
+        # 外部合併：每個分片只讀一個緩衝區的量，記憶體用量與資料大小無關
+        count = _write_entries(out_path, heapq.merge(*(_read_entries(path) for path in shards)))
+        return count, len(shards)
+    finally:
+        for path in shards:
+            os.remove(path)
+
+
+class PositionIndex:
+    """
+    以 mmap 讀取的局面索引；一次查詢只做一次二分搜尋，加上讀出符合的記錄。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path}: not a position index")
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+    def _first_index(self, key):
+        lo, hi = 0, self.count
+        data = self._data
+        base = HEADER.size
+        size = ENTRY.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY.unpack_from(data, base + mid * size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, key):
+        """
+        回傳 key 的所有記錄 [(棋局編號, ply, 下一步編碼), ...]，依棋局編號排序。
+        """
+        result = []
+        data = self._data
+        for i in range(self._first_index(key), self.count):
+            entry_key, game_id, ply, move = ENTRY.unpack_from(data, HEADER.size + i * ENTRY.size)
+            if entry_key != key:
+                break
+            result.append((game_id, ply, move))
+        return result
+
+    def games(self, position):
+        """
+        走到過這個局面的棋局編號（不重複，由小到大）。
+        """
+        return sorted({game_id for game_id, _, _ in self.lookup(position.key)})
+
+    def move_stats(self, position, archive=None):
+        """
+        這個局面之後各個走法的統計：{走法: [次數, 白勝, 和, 黑勝]}，依次數由多到少。
+        沒給 archive 時結果欄位都是 0。
+        """
+        stats = {}
+        for game_id, _, code in self.lookup(position.key):
+            if code == NO_MOVE:
+                continue
+            move = decode_move(code)
+            row = stats.setdefault(move, [0, 0, 0, 0])
+            row[0] += 1
+            if archive is not None:
+                result = archive.result(game_id)
+                if result == '1-0':
+                    row[1] += 1
+                elif result == '1/2-1/2':
+                    row[2] += 1
+                elif result == '0-1':
+                    row[3] += 1
+        return dict(sorted(stats.items(), key=lambda item: -item[1][0]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the position index")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="index every position of an archive (or PGN files)")
+    build.add_argument('source', nargs='+', help="a .cga archive or PGN files")
+    build.add_argument('-o', '--out', required=True)
+    build.add_argument('--shard-entries', type=int, default=SHARD_ENTRIES)
+    query = sub.add_parser('query', help="list the games and next moves of a position")
+    query.add_argument('index')
+    query.add_argument('--fen', default=STARTING_FEN)
+    query.add_argument('--archive', help="archive the index was built from (for results)")
+    query.add_argument('--limit', type=int, default=20, help="game ids to print")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == 'build':
+        if len(args.source) == 1 and args.source[0].endswith('.cga'):
+            with GameArchive(args.source[0]) as archive:
+                count, shards = build_index(archive_games(archive), args.out, args.shard_entries)
+        else:
+            count, shards = build_index(pgn_games(args.source), args.out, args.shard_entries)
+        print(f"{count} positions from {shards} shards in {time.perf_counter() - start:.2f}s")
+        return 0
+
+    archive = GameArchive(args.archive) if args.archive else None
+    try:
+        with PositionIndex(args.index) as index:
+            position = create_position(fen=args.fen)
+            games = index.games(position)
+            stats = index.move_stats(position, archive)
+            elapsed = time.perf_counter() - start
+            print(f"{len(games)} games reached this position ({elapsed * 1000:.1f} ms)")
+            if games:
+                print("games:", ' '.join(str(game_id) for game_id in games[:args.limit]))
+            for move, (count, white, draw, black) in stats.items():
+                print(f"{move_to_uci(move):<6} {count:>7}   +{white} ={draw} -{black}")
+    finally:
+        if archive is not None:
+            archive.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
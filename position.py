@@ -0,0 +1,977 @@
+# 無介面（headless）的棋局狀態與規則引擎。
+# 所有規則判斷都在這裡完成，不需要 Tk root 或 Canvas，
+# 可以直接在批次工作或子行程中大量推演局面。
+from board import starting_board
+from pieces import (
+    is_valid_knight_move,
+    is_valid_bishop_move,
+    is_valid_pawn_move,
+    is_valid_queen_move,
+    is_valid_rook_move,
+    is_valid_king_move,
+    generate_knight_moves,
+    generate_bishop_moves,
+    generate_pawn_moves,
+    generate_queen_moves,
+    generate_rook_moves,
+    generate_king_moves,
+    is_square_attacked,
+    generate_captures,
+)
+from pieces.pawn import PROMOTION_PIECES
+from pieces.stages import CAPTURES, QUIET, KING, ALL_STAGES
+from pieces.tables import KNIGHT_TARGETS, ROOK_RAYS, BISHOP_RAYS
+from zobrist import PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, compute_key, en_passant_key
+from engine.psqt import PSQT_MG, PSQT_EG, PHASE, compute_psqt
+
+ROWS, COLS = 8, 8
+
+# castling 權以位元旗標表示：K=白短、Q=白長、k=黑短、q=黑長
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+ALL_CASTLING = WHITE_KINGSIDE | WHITE_QUEENSIDE | BLACK_KINGSIDE | BLACK_QUEENSIDE
+
+CASTLING_SYMBOLS = (
+    (WHITE_KINGSIDE, 'K'),
+    (WHITE_QUEENSIDE, 'Q'),
+    (BLACK_KINGSIDE, 'k'),
+    (BLACK_QUEENSIDE, 'q'),
+)
+
+# 某格的棋子移動或被吃掉時，要保留的 castling 權（以 row * 8 + col 為索引）
+CASTLING_MASK = [ALL_CASTLING] * 64
+CASTLING_MASK[0 * 8 + 0] = ALL_CASTLING & ~BLACK_QUEENSIDE   # a8
+CASTLING_MASK[0 * 8 + 7] = ALL_CASTLING & ~BLACK_KINGSIDE    # h8
+CASTLING_MASK[0 * 8 + 4] = ALL_CASTLING & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)  # e8
+CASTLING_MASK[7 * 8 + 0] = ALL_CASTLING & ~WHITE_QUEENSIDE   # a1
+CASTLING_MASK[7 * 8 + 7] = ALL_CASTLING & ~WHITE_KINGSIDE    # h1
+CASTLING_MASK[7 * 8 + 4] = ALL_CASTLING & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)  # e1
+
+# undo 紀錄中的走法種類
+NORMAL, EN_PASSANT, CASTLE = 0, 1, 2
+
+VALIDATORS = {
+    'N': is_valid_knight_move,
+    'B': is_valid_bishop_move,
+    'R': is_valid_rook_move,
+    'Q': is_valid_queen_move,
+    'K': is_valid_king_move,
+}
+
+GENERATORS = {
+    'N': generate_knight_moves,
+    'B': generate_bishop_moves,
+    'R': generate_rook_moves,
+    'Q': generate_queen_moves,
+    'K': generate_king_moves,
+}
+
+
+def square_name(row, col):
+    """
+    (row, col) 轉成代數記號，例如 (7, 4) -> 'e1'。
+    """
+    return chr(ord('a') + col) + str(8 - row)
+
+
+def move_to_uci(move):
+    """
+    走法 tuple 轉成 UCI 字串，例如 (6, 4, 4, 4, '') -> 'e2e4'。
+    """
+    fr, fc, tr, tc, promo = move
+    return square_name(fr, fc) + square_name(tr, tc) + promo.lower()
+
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+def parse_square(name):
+    """
+    代數記號轉成 (row, col)，例如 'e1' -> (7, 4)。
+    """
+    return 8 - int(name[1]), ord(name[0]) - ord('a')
+
+
+def parse_fen(fen):
+    """
+    把 FEN 字串拆成 Position() 的參數（dict）。
+    半步數與回合數可以省略，預設為 0 與 1。
+    """
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError(f"Invalid FEN: {fen}")
+
+    board = []
+    for rank in fields[0].split('/'):
+        row = []
+        for ch in rank:
+            if ch.isdigit():
+                row.extend([''] * int(ch))
+            elif ch in 'PNBRQKpnbrqk':
+                row.append(ch)
+            else:
+                raise ValueError(f"Invalid FEN: {fen}")
+        if len(row) != COLS:
+            raise ValueError(f"Invalid FEN: {fen}")
+        board.append(row)
+    if len(board) != ROWS:
+        raise ValueError(f"Invalid FEN: {fen}")
+
+    if fields[1] not in ('w', 'b'):
+        raise ValueError(f"Invalid FEN: {fen}")
+    if fields[2] != '-' and (not fields[2] or any(ch not in 'KQkq' for ch in fields[2])):
+        raise ValueError(f"Invalid FEN: {fen}")
+    castling = 0
+    for bit, sym in CASTLING_SYMBOLS:
+        if sym in fields[2]:
+            castling |= bit
+    if fields[3] == '-':
+        en_passant_target = None
+    elif len(fields[3]) == 2 and fields[3][0] in 'abcdefgh' and fields[3][1] in '36':
+        en_passant_target = parse_square(fields[3])
+    else:
+        raise ValueError(f"Invalid FEN: {fen}")
+    counters = fields[4:6]
+    if len(fields) > 6 or any(not field.isdigit() for field in counters):
+        raise ValueError(f"Invalid FEN: {fen}")
+
+    turn = 'white' if fields[1] == 'w' else 'black'
+    _check_board(board, turn, fen)
+    return {
+        'board': board,
+        'turn': turn,
+        'castling': castling & _castling_available(board),
+        'en_passant_target': _en_passant_available(board, turn, en_passant_target),
+        'half_move_clock': int(counters[0]) if counters else 0,
+        'fullmove_number': max(1, int(counters[1])) if len(counters) > 1 else 1,
+    }
+
+
+def _check_board(board, turn, fen):
+    """
+    局面本身不合理時丟出 ValueError：國王數量不對、兵在底線、或不該走的一方正被將軍。
+    """
+    flat = [piece for row in board for piece in row]
+    if flat.count('K') != 1 or flat.count('k') != 1:
+        raise ValueError(f"Invalid FEN (each side needs exactly one king): {fen}")
+    if any(piece in ('P', 'p') for piece in board[0] + board[7]):
+        raise ValueError(f"Invalid FEN (pawn on the first or last rank): {fen}")
+    waiting_white = turn == 'black'
+    king = 'K' if waiting_white else 'k'
+    for r in range(ROWS):
+        for c in range(COLS):
+            if board[r][c] == king and is_square_attacked(board, r, c, not waiting_white):
+                raise ValueError(f"Invalid FEN (side not to move is in check): {fen}")
+
+
+def _castling_available(board):
+    """
+    國王與城堡都還在原位的 castling 權；FEN 寫了但棋子不在原位的權利直接捨去。
+    """
+    rights = 0
+    if board[7][4] == 'K':
+        rights |= (WHITE_KINGSIDE if board[7][7] == 'R' else 0) | (WHITE_QUEENSIDE if board[7][0] == 'R' else 0)
+    if board[0][4] == 'k':
+        rights |= (BLACK_KINGSIDE if board[0][7] == 'r' else 0) | (BLACK_QUEENSIDE if board[0][0] == 'r' else 0)
+    return rights
+
+
+def _en_passant_available(board, turn, target):
+    """
+    en passant 目標格必須在正確的橫列，且前方真的有剛走兩格的兵，否則當作沒有。
+    """
+    if target is None:
+        return None
+    row, col = target
+    if turn == 'white':
+        ok = row == 2 and board[3][col] == 'p' and not board[2][col] and not board[1][col]
+    else:
+        ok = row == 5 and board[4][col] == 'P' and not board[5][col] and not board[6][col]
+    return target if ok else None
+
+
+def format_fen(board, turn, castling, en_passant_target, half_move_clock, fullmove_number):
+    ranks = []
+    for row in board:
+        rank = ''
+        empty = 0
+        for piece in row:
+            if piece:
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += piece
+            else:
+                empty += 1
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+    rights = ''.join(sym for bit, sym in CASTLING_SYMBOLS if castling & bit) or '-'
+    ep = square_name(*en_passant_target) if en_passant_target else '-'
+    return (f"{'/'.join(ranks)} {'w' if turn == 'white' else 'b'} {rights} {ep} "
+            f"{half_move_clock} {fullmove_number}")
+
+
+def uci_to_move(uci):
+    """
+    UCI 字串轉成走法 tuple，例如 'e7e8q' -> (1, 4, 0, 4, 'Q')。
+    """
+    fr, fc = parse_square(uci[0:2])
+    tr, tc = parse_square(uci[2:4])
+    return fr, fc, tr, tc, uci[4:5].upper()
+
+
+def move_to_san(position, move):
+    """
+    走法轉成標準代數記譜（SAN），例如 'Nbd7'、'exd5'、'e8=Q+'、'O-O#'。
+    歧義判斷取自 legal_moves() 的快取，將死標記只需要知道還有沒有合法走法，任何後端皆可使用。
+    """
+    fr, fc, tr, tc, promo = move
+    piece = position.board[fr][fc]
+    kind = piece.upper()
+    target = square_name(tr, tc)
+
+    if kind == 'K' and abs(tc - fc) == 2:
+        notation = "O-O" if tc > fc else "O-O-O"
+    elif kind == 'P':
+        if position.is_capture(move):
+            notation = f"{chr(ord('a') + fc)}x{target}"
+        else:
+            notation = target
+        if promo:
+            notation += f"={promo}"
+    else:
+        # 同種棋子也能走到同一格時，依序以縱線、橫列、兩者來區分
+        rivals = [m for m in position.legal_moves()
+                  if m[2] == tr and m[3] == tc and (m[0], m[1]) != (fr, fc)
+                  and position.board[m[0]][m[1]] == piece]
+        origin = square_name(fr, fc)
+        if not rivals:
+            prefix = ''
+        elif all(m[1] != fc for m in rivals):
+            prefix = origin[0]
+        elif all(m[0] != fr for m in rivals):
+            prefix = origin[1]
+        else:
+            prefix = origin
+        notation = f"{kind}{prefix}{'x' if position.is_capture(move) else ''}{target}"
+
+    position.make_move(move)
+    try:
+        if position.is_in_check():
+            notation += "#" if not position.has_any_legal_move() else "+"
+    finally:
+        position.unmake_move()
+    return notation
+
+
+def san_to_move(position, san):
+    """
+    SAN 字串轉成走法 tuple。
+
+    不產生整份合法走法列表：只找出能走到目標格的同種棋子，
+    再對唯一的候選檢查國王安全，所以大量讀入棋譜時很快。
+    無法解讀或不合法時丟出 ValueError。
+    """
+    text = san.rstrip('+#!?')
+    if not text:
+        raise ValueError(f"Illegal SAN move: {san}")
+    is_white = position.turn == 'white'
+    board = position.board
+
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        row = 7 if is_white else 0
+        kingside = len(text) == 3
+        if board[row][4] != ('K' if is_white else 'k') or not position.can_castle(kingside, is_white):
+            raise ValueError(f"Illegal SAN move: {san}")
+        return row, 4, row, 6 if kingside else 2, ''
+
+    promo = ''
+    if '=' in text:
+        text, promo = text.split('=', 1)
+    elif text[-1] in 'QRBN' and text[0].islower():
+        text, promo = text[:-1], text[-1]
+    if promo and promo not in PROMOTION_PIECES:
+        raise ValueError(f"Illegal SAN move: {san}")
+
+    kind = text[:1] if text[:1] in ('N', 'B', 'R', 'Q', 'K') else 'P'
+    body = text[1:] if kind != 'P' else text
+    body = body.replace('x', '').replace('-', '').replace(':', '')
+    if len(body) < 2 or body[-2] not in 'abcdefgh' or body[-1] not in '12345678':
+        raise ValueError(f"Illegal SAN move: {san}")
+    tr, tc = parse_square(body[-2:])
+    hint = body[:-2]
+    hint_col = hint_row = None
+    for ch in hint:
+        if ch in 'abcdefgh':
+            hint_col = ord(ch) - ord('a')
+        elif ch in '12345678':
+            hint_row = 8 - int(ch)
+        else:
+            raise ValueError(f"Illegal SAN move: {san}")
+
+    symbol = kind if is_white else kind.lower()
+    candidates = []
+    if kind == 'P':
+        step = -1 if is_white else 1
+        fr = tr - step
+        if hint_col is not None and hint_col != tc:
+            # 吃子：包含 en passant
+            if 0 <= fr < ROWS and board[fr][hint_col] == symbol and (
+                    board[tr][tc] or position.en_passant_target == (tr, tc)):
+                candidates.append((fr, hint_col))
+        elif not board[tr][tc]:
+            if 0 <= fr < ROWS and board[fr][tc] == symbol:
+                candidates.append((fr, tc))
+            elif (0 <= fr < ROWS and not board[fr][tc] and tr == (4 if is_white else 3)
+                  and board[fr - step][tc] == symbol):
+                candidates.append((fr - step, tc))
+        last_row = 0 if is_white else 7
+        if (tr == last_row) != bool(promo):
+            raise ValueError(f"Illegal SAN move: {san}")
+    else:
+        if promo:
+            raise ValueError(f"Illegal SAN move: {san}")
+        validator = VALIDATORS[kind]
+        rows = range(ROWS) if hint_row is None else (hint_row,)
+        cols = range(COLS) if hint_col is None else (hint_col,)
+        for r in rows:
+            for c in cols:
+                if board[r][c] == symbol and validator(board, r, c, tr, tc, is_white):
+                    candidates.append((r, c))
+
+    legal = [(r, c, tr, tc, promo) for r, c in candidates
+             if not position.will_be_in_check_after_move((r, c, tr, tc, promo))]
+    if len(legal) != 1:
+        raise ValueError(f"{'Ambiguous' if legal else 'Illegal'} SAN move: {san}")
+    return legal[0]
+
+
+class Position:
+    """
+    一個局面：棋盤、執行權、castling 權、en passant 目標與 50 步計數器。
+
+    走法以 tuple (from_row, from_col, to_row, to_col, promotion) 表示，
+    promotion 為 '' 或升變棋子的大寫字母（Q, R, B, N）。
+    make_move() 會把還原所需的資訊壓成一筆 undo 紀錄推進堆疊，
+    unmake_move() 再從堆疊取回，因此可以反覆推演而不必複製棋盤。
+    """
+
+    def __init__(self, board=None, turn='white', castling=ALL_CASTLING,
+                 en_passant_target=None, half_move_clock=0, fullmove_number=1):
+        self.board = [row[:] for row in (board or starting_board())]
+        self.turn = turn
+        self.castling = castling
+        # 可以被 en passant 吃掉的目標格 (row, col)，若無則為 None
+        self.en_passant_target = en_passant_target
+        # 自上次吃子或兵移動以來的半步數
+        self.half_move_clock = half_move_clock
+        self.fullmove_number = fullmove_number
+        # 雙方國王的位置，隨 make/unmake 增量更新，不必每次掃描棋盤
+        self.king_squares = {True: self.find_king(True), False: self.find_king(False)}
+
+        # 64 位元 Zobrist key，可直接拿來當各種快取的鍵
+        self.key = compute_key(self.board, turn, castling, en_passant_target)
+        # 子力＋位置分數（白方視角，中局與殘局各一）與局面階段，同樣隨 make/unmake 增量更新
+        self.mg, self.eg, self.phase = compute_psqt(self.board)
+
+        self._undo = []
+        # 最近一次 legal_moves() 的結果與當時的 key；同一個局面重複查詢時直接回傳
+        self._legal_key = None
+        self._legal = None
+        # 自上次不可逆走法以來，每個 key 出現的次數（用來判斷三重重複）
+        self.repetitions = {self.key: 1}
+
+    def copy(self):
+        """
+        複製目前局面（不含 undo 堆疊與歷史）。
+        """
+        return Position(self.board, self.turn, self.castling, self.en_passant_target,
+                        self.half_move_clock, self.fullmove_number)
+
+    @classmethod
+    def from_fen(cls, fen):
+        return cls(**parse_fen(fen))
+
+    def fen(self):
+        return format_fen(self.board, self.turn, self.castling, self.en_passant_target,
+                          self.half_move_clock, self.fullmove_number)
+
+    @property
+    def is_white_turn(self):
+        return self.turn == 'white'
+
+    @property
+    def ply(self):
+        """
+        從建立此物件以來已經走了幾個半步。
+        """
+        return len(self._undo)
+
+    @property
+    def move_history(self):
+        """
+        從建立此物件以來走過的所有走法（依序）。
+        """
+        return [undo[0] for undo in self._undo]
+
+    def castling_string(self):
+        rights = ''.join(sym for bit, sym in CASTLING_SYMBOLS if self.castling & bit)
+        return rights if rights else '-'
+
+    def snapshot(self):
+        """
+        將棋子位置＋回合＋castling＋en passant 轉成一個可讀的字串。
+        重複局面改用 Zobrist key 判斷，這裡只供顯示與除錯。
+        """
+        board_part = '/'.join(''.join(p if p else '.' for p in r) for r in self.board)
+        turn_part = 'w' if self.turn == 'white' else 'b'
+        if self.en_passant_target:
+            ep_part = square_name(*self.en_passant_target)
+        else:
+            ep_part = '-'
+        return f"{board_part} {turn_part} {self.castling_string()} {ep_part}"
+
+    # ------------------------------------------------------------------
+    # make / unmake
+    # ------------------------------------------------------------------
+
+    def make_move(self, move):
+        """
+        在棋盤上執行一步（假設已經是合法走法），並推入 undo 紀錄。
+        Zobrist key 只 XOR 掉變動的項目；重複局面計數在 50 步計數器歸零時整個換新。
+        """
+        fr, fc, tr, tc, promo = move
+        board = self.board
+        piece = board[fr][fc]
+        captured = board[tr][tc]
+        kind = piece.upper()
+        is_white = piece.isupper()
+        frm = fr * 8 + fc
+        to = tr * 8 + tc
+        flag = NORMAL
+        key = self.key
+        mg, eg = self.mg, self.eg
+        undo = (move, captured, self.castling, self.en_passant_target, self.half_move_clock, key,
+                mg, eg, self.phase)
+
+        if self.en_passant_target:
+            key ^= en_passant_key(board, self.en_passant_target, is_white)
+        key ^= PIECE_KEYS[piece][frm]
+        mg -= PSQT_MG[piece][frm]
+        eg -= PSQT_EG[piece][frm]
+        if captured:
+            key ^= PIECE_KEYS[captured][to]
+            mg -= PSQT_MG[captured][to]
+            eg -= PSQT_EG[captured][to]
+            self.phase -= PHASE[captured]
+        if kind == 'P' and fc != tc and captured == '':
+            # en passant：被吃的兵在「from_row, to_col」
+            flag = EN_PASSANT
+            ep_square = fr * 8 + tc
+            ep_pawn = board[fr][tc]
+            key ^= PIECE_KEYS[ep_pawn][ep_square]
+            mg -= PSQT_MG[ep_pawn][ep_square]
+            eg -= PSQT_EG[ep_pawn][ep_square]
+            board[fr][tc] = ''
+        elif kind == 'K' and abs(tc - fc) == 2:
+            # castling：連同城堡一起移動
+            flag = CASTLE
+            if tc > fc:
+                rook_from, rook_to = fr * 8 + 7, fr * 8 + 5
+            else:
+                rook_from, rook_to = fr * 8, fr * 8 + 3
+            rook = board[fr][rook_from & 7]
+            board[fr][rook_to & 7] = rook
+            board[fr][rook_from & 7] = ''
+            key ^= PIECE_KEYS[rook][rook_from] ^ PIECE_KEYS[rook][rook_to]
+            mg += PSQT_MG[rook][rook_to] - PSQT_MG[rook][rook_from]
+            eg += PSQT_EG[rook][rook_to] - PSQT_EG[rook][rook_from]
+
+        board[tr][tc] = piece
+        board[fr][fc] = ''
+        if promo:
+            piece = promo if is_white else promo.lower()
+            board[tr][tc] = piece
+            self.phase += PHASE[piece]
+        elif kind == 'K':
+            self.king_squares[is_white] = (tr, tc)
+        key ^= PIECE_KEYS[piece][to]
+        self.mg = mg + PSQT_MG[piece][to]
+        self.eg = eg + PSQT_EG[piece][to]
+
+        castling = self.castling & CASTLING_MASK[frm] & CASTLING_MASK[to]
+        key ^= CASTLING_KEYS[self.castling] ^ CASTLING_KEYS[castling]
+        self.castling = castling
+
+        if kind == 'P' and abs(tr - fr) == 2:
+            self.en_passant_target = ((fr + tr) // 2, fc)
+            key ^= en_passant_key(board, self.en_passant_target, not is_white)
+        else:
+            self.en_passant_target = None
+
+        if not is_white:
+            self.fullmove_number += 1
+        self.turn = 'black' if is_white else 'white'
+        key ^= SIDE_KEY
+        self.key = key
+
+        if kind == 'P' or captured or flag == EN_PASSANT:
+            # 不可逆的一步：之前的局面不可能再出現，重複計數從頭開始
+            self.half_move_clock = 0
+            self._undo.append(undo + (flag, self.repetitions))
+            self.repetitions = {key: 1}
+        else:
+            self.half_move_clock += 1
+            self._undo.append(undo + (flag, None))
+            self.repetitions[key] = self.repetitions.get(key, 0) + 1
+
+    def unmake_move(self):
+        """
+        取回最後一步，從 undo 紀錄還原棋盤、castling 權、en passant、計數器與 key。
+        """
+        (move, captured, castling, ep, clock, key,
+         self.mg, self.eg, self.phase, flag, repetitions) = self._undo.pop()
+        fr, fc, tr, tc, promo = move
+        board = self.board
+        piece = board[tr][tc]
+        is_white = piece.isupper()
+        if promo:
+            piece = 'P' if is_white else 'p'
+        elif piece in ('K', 'k'):
+            self.king_squares[is_white] = (fr, fc)
+
+        board[fr][fc] = piece
+        board[tr][tc] = captured
+        if flag == EN_PASSANT:
+            board[fr][tc] = 'p' if is_white else 'P'
+        elif flag == CASTLE:
+            if tc > fc:
+                board[fr][7] = board[fr][5]
+                board[fr][5] = ''
+            else:
+                board[fr][0] = board[fr][3]
+                board[fr][3] = ''
+
+        if repetitions is None:
+            count = self.repetitions[self.key] - 1
+            if count:
+                self.repetitions[self.key] = count
+            else:
+                del self.repetitions[self.key]
+        else:
+            self.repetitions = repetitions
+
+        self.castling = castling
+        self.en_passant_target = ep
+        self.half_move_clock = clock
+        self.key = key
+        if not is_white:
+            self.fullmove_number -= 1
+        self.turn = 'white' if is_white else 'black'
+        return move
+
+    # ------------------------------------------------------------------
+    # 規則查詢
+    # ------------------------------------------------------------------
+
+    def find_king(self, is_white):
+        king_symbol = 'K' if is_white else 'k'
+        for r in range(ROWS):
+            for c in range(COLS):
+                if self.board[r][c] == king_symbol:
+                    return r, c
+        return None
+
+    def square_attacked_by(self, square, color):
+        """
+        回傳 True 表示 color（'white' 或 'black'）方有棋子攻擊 square = (row, col)。
+        """
+        return is_square_attacked(self.board, square[0], square[1], color == 'white')
+
+    def is_square_attacked(self, row, col, by_white):
+        return is_square_attacked(self.board, row, col, by_white)
+
+    def is_in_check(self, is_white=None):
+        """
+        回傳 True 表示「is_white」方（預設為執行方）的國王目前被將軍。
+        """
+        if is_white is None:
+            is_white = self.turn == 'white'
+        king_pos = self.king_squares[is_white]
+        # 如果找不到國王（理論上不會發生），我們不當作將軍
+        if not king_pos:
+            return False
+        return is_square_attacked(self.board, king_pos[0], king_pos[1], not is_white)
+
+    def is_valid_move(self, from_r, from_c, to_r, to_c, is_white):
+        """
+        檢查一個移動是否合法（不包含會讓自己國王被將軍的情況，也不包含 castling）
+        """
+        piece = self.board[from_r][from_c]
+        if not piece:
+            return False
+
+        # 確保棋子顏色正確
+        if piece.isupper() != is_white:
+            return False
+
+        piece_type = piece.upper()
+        if piece_type == 'P':
+            return is_valid_pawn_move(self.board, from_r, from_c, to_r, to_c, is_white,
+                                      self.en_passant_target)
+        return VALIDATORS[piece_type](self.board, from_r, from_c, to_r, to_c, is_white)
+
+    def can_castle(self, kingside, is_white):
+        """
+        檢查是否可以進行 castling：權利仍在、路徑清空，
+        且國王不在將軍中、也不會經過或停在被攻擊的格子。
+        """
+        if is_white:
+            king_row = 7
+            right = WHITE_KINGSIDE if kingside else WHITE_QUEENSIDE
+        else:
+            king_row = 0
+            right = BLACK_KINGSIDE if kingside else BLACK_QUEENSIDE
+
+        if not self.castling & right:
+            return False
+
+        row = self.board[king_row]
+        if kingside:
+            if row[5] != "" or row[6] != "":
+                return False
+            passing = (4, 5, 6)
+        else:
+            if row[1] != "" or row[2] != "" or row[3] != "":
+                return False
+            passing = (4, 3, 2)
+
+        for c in passing:
+            if self.is_square_attacked(king_row, c, not is_white):
+                return False
+        return True
+
+    def will_be_in_check_after_move(self, move):
+        """
+        檢查走這一步後，走子方的國王是否會陷入將軍。
+        只在棋盤上模擬棋子移動（含 en passant 被吃的兵）再還原，不推入 undo 紀錄。
+        """
+        fr, fc, tr, tc, _ = move
+        board = self.board
+        piece = board[fr][fc]
+        captured = board[tr][tc]
+        is_white = piece.isupper()
+        en_passant = piece in ('P', 'p') and fc != tc and captured == ''
+
+        board[tr][tc] = piece
+        board[fr][fc] = ''
+        if en_passant:
+            ep_pawn = board[fr][tc]
+            board[fr][tc] = ''
+
+        if piece in ('K', 'k'):
+            king_row, king_col = tr, tc
+        else:
+            king_row, king_col = self.king_squares[is_white]
+        in_check = is_square_attacked(board, king_row, king_col, not is_white)
+
+        board[fr][fc] = piece
+        board[tr][tc] = captured
+        if en_passant:
+            board[fr][tc] = ep_pawn
+        return in_check
+
+    def pins_and_evasions(self, is_white=None):
+        """
+        從「is_white」方（預設為執行方）的國王出發，沿八條射線與騎士、兵的位置掃描一次，
+        回傳 (pinned, evasions)：
+          pinned   {(row, col): 釘住的棋子還能走到的格子}，也就是國王與釘住它的棋子之間的射線（含吃掉對方）
+          evasions 沒有被將軍時為 None；雙重將軍時為空的 tuple（只能走國王）；
+                   否則是吃掉將軍的棋子或擋在中間的格子
+        """
+        if is_white is None:
+            is_white = self.turn == 'white'
+        board = self.board
+        king_row, king_col = self.king_squares[is_white]
+        square = king_row * 8 + king_col
+        if is_white:
+            pawn, knight, straight, diagonal = 'p', 'n', ('r', 'q'), ('b', 'q')
+            pawn_row = king_row - 1
+        else:
+            pawn, knight, straight, diagonal = 'P', 'N', ('R', 'Q'), ('B', 'Q')
+            pawn_row = king_row + 1
+
+        pinned = {}
+        checks = []
+        for rays, sliders in ((ROOK_RAYS[square], straight), (BISHOP_RAYS[square], diagonal)):
+            for ray in rays:
+                blocker = None
+                for i, (r, c) in enumerate(ray):
+                    piece = board[r][c]
+                    if not piece:
+                        continue
+                    if piece.isupper() == is_white:
+                        if blocker is not None:
+                            break
+                        blocker = (r, c)
+                        continue
+                    if piece in sliders:
+                        if blocker is None:
+                            checks.append(ray[:i + 1])
+                        else:
+                            pinned[blocker] = ray[:i + 1]
+                    break
+
+        if 0 <= pawn_row < 8:
+            for c in (king_col - 1, king_col + 1):
+                if 0 <= c < 8 and board[pawn_row][c] == pawn:
+                    checks.append(((pawn_row, c),))
+        for r, c in KNIGHT_TARGETS[square]:
+            if board[r][c] == knight:
+                checks.append(((r, c),))
+
+        if not checks:
+            return pinned, None
+        if len(checks) > 1:
+            return pinned, ()
+        return pinned, checks[0]
+
+    def pseudo_legal_moves(self):
+        """
+        依照每個棋子的走法產生器，產生執行方所有「不考慮國王安全」的走法（不含 castling）。
+        """
+        is_white = self.turn == 'white'
+        board = self.board
+        moves = []
+        for r in range(ROWS):
+            row = board[r]
+            for c in range(COLS):
+                piece = row[c]
+                if not piece or piece.isupper() != is_white:
+                    continue
+                kind = piece.upper()
+                if kind == 'P':
+                    moves += generate_pawn_moves(board, r, c, is_white, self.en_passant_target)
+                else:
+                    moves += GENERATORS[kind](board, r, c, is_white)
+        return moves
+
+    def castling_moves(self):
+        is_white = self.turn == 'white'
+        king_row = 7 if is_white else 0
+        moves = []
+        if self.board[king_row][4] != ('K' if is_white else 'k'):
+            return moves
+        for kingside in (True, False):
+            if self.can_castle(kingside, is_white):
+                moves.append((king_row, 4, king_row, 6 if kingside else 2, ''))
+        return moves
+
+    def legal_moves(self):
+        """
+        獲取執行方所有合法走法。
+
+        結果依 Zobrist key 快取，同一手內的將軍、將死、和棋判斷、記譜與提示
+        都共用這一份列表；回傳的列表是共用的，呼叫端不要修改它。
+        """
+        if self._legal_key == self.key:
+            return self._legal
+        is_white = self.turn == 'white'
+        board = self.board
+        # 釘子與將軍只算一次：被釘住的棋子只能沿釘住的射線走，被將軍時只能吃掉或擋住將軍的棋子，
+        # 不必對每一步都模擬走子再檢查國王
+        pinned, evasions = self.pins_and_evasions(is_white)
+        legal = []
+        for r in range(ROWS):
+            row = board[r]
+            for c in range(COLS):
+                piece = row[c]
+                if not piece or piece.isupper() != is_white:
+                    continue
+                kind = piece.upper()
+                if kind == 'K':
+                    legal += self._safe_king_moves(generate_king_moves(board, r, c, is_white), is_white,
+                                                   evasions is not None)
+                elif evasions != ():
+                    # 雙重將軍時只有國王能動
+                    if kind == 'P':
+                        moves = generate_pawn_moves(board, r, c, is_white, self.en_passant_target)
+                    else:
+                        moves = GENERATORS[kind](board, r, c, is_white)
+                    legal += self._filter_moves(moves, kind, pinned.get((r, c)), evasions)
+        if evasions is None:
+            legal += self.castling_moves()
+        self._legal_key = self.key
+        self._legal = legal
+        return legal
+
+    def iter_legal_moves(self, stages=ALL_STAGES):
+        """
+        惰性地依階段產生合法走法：吃子與升變（CAPTURES）、國王以外的其他走法（QUIET）、
+        國王的其他走法與 castling（KING）。stages 以位元旗標選擇要哪些階段。
+        呼叫端拿到需要的走法就可以停下，後面的棋子與階段都不會產生。
+        取走法的途中若 make_move()，要先 unmake_move() 還原再繼續。
+        """
+        is_white = self.turn == 'white'
+        board = self.board
+        pinned, evasions = self.pins_and_evasions(is_white)
+        in_check = evasions is not None
+        king_row, king_col = self.king_squares[is_white]
+        en_passant_target = self.en_passant_target
+
+        if stages & CAPTURES:
+            for r in range(ROWS):
+                row = board[r]
+                for c in range(COLS):
+                    piece = row[c]
+                    if not piece or piece.isupper() != is_white:
+                        continue
+                    kind = piece.upper()
+                    moves = generate_captures(board, r, c, is_white, en_passant_target)
+                    if not moves:
+                        continue
+                    if kind == 'K':
+                        yield from self._safe_king_moves(moves, is_white, in_check)
+                    elif evasions != ():
+                        yield from self._filter_moves(moves, kind, pinned.get((r, c)), evasions)
+
+        if stages & QUIET and evasions != ():
+            for r in range(ROWS):
+                row = board[r]
+                for c in range(COLS):
+                    piece = row[c]
+                    if not piece or piece.isupper() != is_white or piece in ('K', 'k'):
+                        continue
+                    kind = piece.upper()
+                    if kind == 'P':
+                        # 兵的吃子、en passant 與升變都屬於第一階段，這裡只剩不升變的前進
+                        moves = [move for move in generate_pawn_moves(board, r, c, is_white)
+                                 if move[1] == move[3] and not move[4]]
+                    else:
+                        moves = [move for move in GENERATORS[kind](board, r, c, is_white)
+                                 if board[move[2]][move[3]] == ""]
+                    if moves:
+                        yield from self._filter_moves(moves, kind, pinned.get((r, c)), evasions)
+
+        if stages & KING:
+            moves = [move for move in generate_king_moves(board, king_row, king_col, is_white)
+                     if board[move[2]][move[3]] == ""]
+            yield from self._safe_king_moves(moves, is_white, in_check)
+            if not in_check:
+                yield from self.castling_moves()
+
+    def has_any_legal_move(self):
+        """
+        回傳 True 表示執行方至少有一步合法走法；找到第一步就停，不產生整份列表。
+        """
+        if self._legal_key == self.key:
+            return bool(self._legal)
+        for _ in self.iter_legal_moves():
+            return True
+        return False
+
+    def _filter_moves(self, moves, kind, ray, evasions):
+        """
+        國王以外的棋子的走法，依釘子（ray：釘住的射線）與將軍（evasions：解將格）篩出合法的。
+        """
+        en_passant_target = self.en_passant_target
+        legal = []
+        for move in moves:
+            target = (move[2], move[3])
+            if kind == 'P' and target == en_passant_target and move[1] != move[3]:
+                # en passant 同時移走兩個兵，可能露出橫向的將軍，只有這種走法要實際檢查
+                if not self.will_be_in_check_after_move(move):
+                    legal.append(move)
+                continue
+            if ray is not None and target not in ray:
+                continue
+            if evasions is not None and target not in evasions:
+                continue
+            legal.append(move)
+        return legal
+
+    def _safe_king_moves(self, moves, is_white, in_check):
+        """
+        國王的走法（不含 castling）篩出目標格沒被對方攻擊的。
+        沒被將軍時國王不在任何滑行棋子的射線上，直接查目標格即可；
+        被將軍時要連國王一起移開再查，才不會沿著將軍的射線往後退。
+        """
+        if in_check:
+            return [move for move in moves if not self.will_be_in_check_after_move(move)]
+        return [move for move in moves
+                if not is_square_attacked(self.board, move[2], move[3], not is_white)]
+
+    def is_legal_move(self, move):
+        """
+        檢查單一走法是否合法，不必產生整份走法列表。
+        """
+        fr, fc, tr, tc, promo = move
+        is_white = self.turn == 'white'
+        piece = self.board[fr][fc]
+        if not piece or piece.isupper() != is_white:
+            return False
+
+        if piece.upper() == 'K' and fr == tr and fc == 4 and abs(tc - fc) == 2:
+            return fr == (7 if is_white else 0) and self.can_castle(tc > fc, is_white)
+
+        if not self.is_valid_move(fr, fc, tr, tc, is_white):
+            return False
+
+        last_row = 0 if is_white else 7
+        if piece.upper() == 'P' and tr == last_row:
+            if promo not in PROMOTION_PIECES:
+                return False
+        elif promo:
+            return False
+        return not self.will_be_in_check_after_move(move)
+
+    def is_capture(self, move):
+        fr, fc, tr, tc, _ = move
+        if self.board[tr][tc]:
+            return True
+        return self.board[fr][fc].upper() == 'P' and fc != tc
+
+    def is_checkmate(self):
+        """
+        回傳 True 表示執行方已經被將死。
+        """
+        return self.is_in_check() and not self.has_any_legal_move()
+
+    def is_stalemate(self):
+        """
+        回傳 True 表示執行方雖不在將軍，但已經沒有任何合法走法──和棋。
+        """
+        return not self.is_in_check() and not self.has_any_legal_move()
+
+    def is_fifty_move_rule(self):
+        """
+        檢查是否達到50步規則（100半步）
+        """
+        return self.half_move_clock >= 100
+
+    def is_threefold_repetition(self):
+        """
+        若目前局面已經至少出現 3 次，回傳 True。
+        """
+        return self.repetitions.get(self.key, 0) >= 3
+
+
+# 可選的規則後端：'list' 為 8x8 字串陣列，'bitboard' 為 64 位元整數
+BACKENDS = ('list', 'bitboard')
+
+
+def create_position(backend='list', fen=None, **kwargs):
+    """
+    依照 backend 名稱建立局面，參數與 Position() 相同；也可以直接給 FEN。
+    """
+    if fen is not None:
+        kwargs = parse_fen(fen)
+    if backend == 'list':
+        return Position(**kwargs)
+    if backend == 'bitboard':
+        from bitboard import BitboardPosition
+        return BitboardPosition(**kwargs)
+    raise ValueError(f"Unknown backend: {backend}")
@@ -0,0 +1,294 @@
+# 多盤棋的對弈伺服器：asyncio TCP，協定為一行一個 JSON 物件（請求與回應都是）。
+# 每盤棋在伺服器裡只是一個輕量的 GameSession（起始 FEN 與走法列表），
+# 驗證走法、判斷將死與和棋、引擎思考這些耗 CPU 的工作都交給行程池，事件迴圈不會被卡住。
+#
+# 請求（id 可省略，回應會帶回同一個 id，方便在同一條連線上同時送出多個請求）：
+#   {"id": 1, "op": "new", "fen": "<FEN>", "engine": "black", "movetime": 0.1}
+#   {"id": 2, "op": "move", "game": 7, "move": "e2e4"}      # UCI 或 SAN
+#   {"id": 3, "op": "state", "game": 7}
+#   {"id": 4, "op": "close", "game": 7}
+# 回應：{"id": 2, "ok": true, "game": 7, "fen": ..., "turn": ..., "legal": [...], "result": "*", ...}
+#       {"id": 2, "ok": false, "error": "..."}
+# 用法：
+#   python server.py --port 8765 -j 4
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import sys
+
+from engine import Searcher
+from engine.worker import analyse
+from position import STARTING_FEN, create_position, move_to_san, move_to_uci, san_to_move, uci_to_move
+from workers import PositionPool
+
+DEFAULT_PORT = 8765
+DEFAULT_MOVETIME = 0.1
+# 引擎思考的上限：行程池是所有棋局共用的，一盤棋不能佔住 worker 太久
+MAX_DEPTH = 8
+MAX_MOVETIME = 2.0
+# 一行請求的長度上限（bytes）
+MAX_LINE = 1 << 16
+
+
+def parse_move(position, text):
+    """
+    UCI（e2e4、e7e8q）或 SAN（Nf3、O-O）轉成合法走法，不合法時拋出 ValueError。
+    """
+    legal = position.legal_moves()
+    if 4 <= len(text) <= 5 and text[1] in '12345678' and text[3] in '12345678':
+        try:
+            move = uci_to_move(text)
+        except (ValueError, IndexError):
+            raise ValueError(f"Illegal move: {text}") from None
+        if move not in legal:
+            raise ValueError(f"Illegal move: {text}")
+        return move
+    return san_to_move(position, text)
+
+
+def _outcome(position, status):
+    # 與 GUI 的 check_game_over 相同的終局規則，回傳 (結果, 原因)
+    if status['checkmate']:
+        return ('0-1' if position.turn == 'white' else '1-0'), 'checkmate'
+    if status['stalemate']:
+        return '1/2-1/2', 'stalemate'
+    if status['fifty_move']:
+        return '1/2-1/2', 'fifty-move rule'
+    if status['threefold']:
+        return '1/2-1/2', 'threefold repetition'
+    return '*', None
+
+
+_SEARCHER = None
+
+
+def advance(task):
+    """
+    子行程執行的工作：task = (起始 FEN, 已走的 UCI 走法, 要走的一步, 搜尋限制)。
+    要走的一步為 None 時由引擎決定（搜尋限制為 (深度, 秒數)）。
+    重播棋局後走這一步並做終局判斷，回傳 dict；走法不合法時拋出 ValueError。
+    """
+    global _SEARCHER
+    fen, history, text, limits = task
+    position = create_position(fen=fen)
+    for uci in history:
+        position.make_move(uci_to_move(uci))
+    if text is None:
+        if _SEARCHER is None:
+            _SEARCHER = Searcher()
+        depth, movetime = limits
+        move = _SEARCHER.search(position, depth=depth, movetime=movetime).best_move
+    else:
+        move = parse_move(position, text)
+    san = move_to_san(position, move)
+    position.make_move(move)
+    return _state(position, move_to_uci(move), san)
+
+
+def inspect(fen):
+    """
+    子行程執行的工作：檢查起始局面並回傳狀態（新棋局用）。
+    """
+    return _state(create_position(fen=fen), None, None)
+
+
+def _state(position, uci, san):
+    status = analyse(position)
+    result, termination = _outcome(position, status)
+    return {
+        'move': uci,
+        'san': san,
+        'fen': position.fen(),
+        'turn': position.turn,
+        'check': status['in_check'],
+        'result': result,
+        'termination': termination,
+        'legal': [move_to_uci(move) for move in position.legal_moves()],
+    }
+
+
+class GameSession:
+    """
+    伺服器端的一盤棋：只存起始 FEN、UCI 走法列表與最新狀態，不持有 Position。
+    同一盤棋的請求以 lock 依序處理。
+    """
+
+    def __init__(self, game_id, fen, engine=None, depth=None, movetime=None):
+        self.id = game_id
+        self.fen = fen
+        self.moves = []
+        self.engine = engine  # 引擎負責的顏色，None 表示雙方都由客戶端走
+        # 只給深度時也套上伺服器的時間上限，搜尋一定會在 MAX_MOVETIME 內結束
+        if movetime is None:
+            movetime = MAX_MOVETIME if depth else DEFAULT_MOVETIME
+        self.limits = (depth, min(movetime, MAX_MOVETIME))
+        self.state = None
+        self.lock = asyncio.Lock()
+
+    @property
+    def over(self):
+        return self.state is not None and self.state['result'] != '*'
+
+    def reply(self):
+        reply = {'ok': True, 'game': self.id, 'moves': len(self.moves)}
+        reply.update(self.state)
+        return reply
+
+
+class GameServer:
+    def __init__(self, executor):
+        self.executor = executor
+        self.games = {}
+        self._ids = itertools.count(1)
+        self.requests = 0
+
+    async def run_task(self, func, task):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, task)
+
+    async def handle_connection(self, reader, writer):
+        write_lock = asyncio.Lock()
+        pending = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    break
+                if not line:
+                    break
+                # 每個請求各自成為一個 task，同一條連線上的不同棋局可以同時處理
+                task = asyncio.create_task(self._respond(line, writer, write_lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(self, line, writer, write_lock):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            request_id = request.get('id')
+            reply = await self.dispatch(request)
+        except KeyError as e:
+            reply = {'ok': False, 'error': f"missing field {e}"}
+        except Exception as e:
+            # 任何錯誤（包括子行程裡的）都要回覆，客戶端才不會一直等
+            reply = {'ok': False, 'error': str(e) or type(e).__name__}
+        self.requests += 1
+        if request_id is not None:
+            reply['id'] = request_id
+        async with write_lock:
+            writer.write(json.dumps(reply, separators=(',', ':')).encode() + b'\n')
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def dispatch(self, request):
+        op = request.get('op')
+        if op == 'new':
+            return await self.new_game(request)
+        if op == 'stats':
+            return {'ok': True, 'games': len(self.games), 'requests': self.requests}
+        if op not in ('move', 'state', 'close'):
+            raise ValueError(f"unknown op: {op}")
+        session = self.games.get(request.get('game'))
+        if session is None:
+            raise ValueError(f"unknown game: {request.get('game')}")
+        if op == 'move':
+            return await self.play(session, str(request['move']))
+        if op == 'state':
+            return session.reply()
+        del self.games[session.id]
+        return {'ok': True, 'game': session.id}
+
+    async def new_game(self, request):
+        fen = request.get('fen') or STARTING_FEN
+        if not isinstance(fen, str):
+            raise ValueError("fen must be a string")
+        engine = request.get('engine')
+        if engine not in (None, 'white', 'black'):
+            raise ValueError(f"engine must be white or black: {engine}")
+        depth = request.get('depth')
+        if depth is not None:
+            if not isinstance(depth, int) or isinstance(depth, bool) or depth < 1:
+                raise ValueError(f"depth must be a positive integer: {depth}")
+            depth = min(depth, MAX_DEPTH)
+        movetime = request.get('movetime')
+        if movetime is not None:
+            if not isinstance(movetime, (int, float)) or isinstance(movetime, bool) or not movetime > 0:
+                raise ValueError(f"movetime must be a positive number: {movetime}")
+        state = await self.run_task(inspect, fen)
+        session = GameSession(next(self._ids), fen, engine, depth, movetime)
+        session.state = state
+        async with session.lock:
+            await self._engine_turn(session)
+        # 引擎的第一步成功之後才登記，失敗時不會留下半成品的棋局
+        self.games[session.id] = session
+        return session.reply()
+
+    async def play(self, session, text):
+        async with session.lock:
+            if session.over:
+                raise ValueError(f"game is over: {session.state['result']}")
+            if session.engine == session.state['turn']:
+                raise ValueError("it is the engine's turn")
+            await self._advance(session, text)
+            await self._engine_turn(session)
+            return session.reply()
+
+    async def _engine_turn(self, session):
+        if not session.over and session.engine == session.state['turn']:
+            await self._advance(session, None)
+
+    async def _advance(self, session, text):
+        state = await self.run_task(advance, (session.fen, tuple(session.moves), text, session.limits))
+        session.moves.append(state['move'])
+        session.state = state
+
+
+async def serve(host, port, executor):
+    server = GameServer(executor)
+    listener = await asyncio.start_server(server.handle_connection, host, port, limit=MAX_LINE)
+    # SIGTERM（例如 loadtest.py --spawn 結束時）也要正常離開，呼叫端才會關閉行程池
+    stopped = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set)
+    except NotImplementedError:  # Windows 的事件迴圈不支援
+        pass
+    addresses = ', '.join(str(sock.getsockname()) for sock in listener.sockets)
+    print(f"serving on {addresses}", flush=True)
+    async with listener:
+        await stopped.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host many concurrent games over a JSON-lines TCP protocol")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('-j', '--jobs', type=int, default=0, help="worker processes (0 = all cores)")
+    args = parser.parse_args(argv)
+
+    with PositionPool(args.jobs or None) as pool:
+        # 在開始監聽之前就把子行程 fork 出來，子行程才不會繼承監聽中的 socket
+        pool.submit(os.getpid).result()
+        try:
+            asyncio.run(serve(args.host, args.port, pool.executor))
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
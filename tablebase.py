@@ -0,0 +1,774 @@
+# 殘局庫：以逆推（retrograde analysis）算出 3、4 子殘局每個局面的「距離將死」（DTM）。
+#
+# 每張表對應一種子力組合（例如 KQK、KRK、KPK、KQKR），白方一律是子力較強的一方。
+# 局面索引 = 白王格 * 64^(n-1) + 黑王格 * 64^(n-2) + 其他棋子的格子 …，
+# 利用對稱性縮小：沒有兵時白王只放在 a1-d1-d4 三角形的 10 格（8 種旋轉、翻轉），
+# 有兵時只做左右翻轉，白王放在 a-d 縱線的 32 格。
+# 每個局面一個 byte：0 = 和棋，255 = 不合法（或與其他索引對稱重複）的局面，其餘為「半步數 + 1」，
+# 半步數為奇數表示執行方會贏，偶數表示執行方會被將死。
+# 檔案為 16 bytes 檔頭加上「白方走」與「黑方走」兩段，以 mmap 讀取。
+# 不處理 castling 與吃過路兵：有 castling 權或可以吃過路兵的局面查不到。
+# 用法：
+#   python tablebase.py generate KQK KRK KPK KQKR -d tb -j 4
+#   python tablebase.py probe -d tb --fen "8/8/8/4k3/8/8/8/KQ6 w - - 0 1"
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+
+from position import create_position, move_to_san
+from bitboard import BITS, KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, bishop_attacks, rook_attacks
+from workers import PositionPool
+
+MAGIC = b'CHTB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQ')
+DRAW = 0
+ILLEGAL = 255
+MAX_PIECES = 4
+PIECE_ORDER = 'QRBNP'
+PIECE_VALUES = {'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+PROMOTIONS = ('Q', 'R', 'B', 'N')
+CHUNK = 1 << 14
+
+
+def _transform(sq, t):
+    r, c = divmod(sq, 8)
+    if t & 1:
+        c = 7 - c
+    if t & 2:
+        r = 7 - r
+    if t & 4:
+        r, c = 7 - c, 7 - r  # 沿 a1-h8 對角線翻轉
+    return r * 8 + c
+
+
+# TRANSFORMS[t][sq]：第 t 種對稱變換後的格子
+TRANSFORMS = [[_transform(sq, t) for sq in range(64)] for t in range(8)]
+# 沒有兵：白王在 a1、b1、c1、d1、b2、c2、d2、c3、d3、d4
+TRIANGLE = [r * 8 + c for r in range(7, 3, -1) for c in range(4) if c >= 7 - r]
+# 有兵：白王在 a-d 縱線
+HALF_BOARD = [r * 8 + c for r in range(8) for c in range(4)]
+
+
+def _king_transforms(slots, allowed):
+    # 對每個白王位置，找一個把它變換到 slots 裡的對稱變換
+    table = []
+    for sq in range(64):
+        table.append(next(t for t in allowed if TRANSFORMS[t][sq] in slots))
+    return table
+
+
+DIAGONAL = {r * 8 + 7 - r for r in range(8)}
+FLIP_DIAGONAL = TRANSFORMS[4]
+KING_TRANSFORM_PAWNLESS = _king_transforms(set(TRIANGLE), range(8))
+KING_TRANSFORM_PAWNS = _king_transforms(set(HALF_BOARD), (0, 1))
+
+
+def _sort_pieces(pieces):
+    return ''.join(sorted(pieces, key=PIECE_ORDER.index))
+
+
+def _runs(pieces):
+    # 連續相同棋子的 [起, 迄) 範圍
+    start = 0
+    for i in range(1, len(pieces) + 1):
+        if i == len(pieces) or pieces[i] != pieces[start]:
+            yield start, i
+            start = i
+
+
+def canonical_name(white, black):
+    """
+    白方、黑方（不含國王）的子力轉成表名，回傳 (表名, 是否需要交換顏色)。
+    子力較強的一方當白方；一樣強時以字串排序決定。
+    """
+    white = _sort_pieces(white.upper())
+    black = _sort_pieces(black.upper())
+    key_white = (sum(PIECE_VALUES[p] for p in white), len(white), [-PIECE_ORDER.index(p) for p in white])
+    key_black = (sum(PIECE_VALUES[p] for p in black), len(black), [-PIECE_ORDER.index(p) for p in black])
+    if key_black > key_white:
+        return f"K{black}K{white}", True
+    return f"K{white}K{black}", False
+
+
+def parse_name(name):
+    """
+    'KQKR' -> ('Q', 'R')：白方、黑方國王以外的棋子。
+    """
+    name = name.upper()
+    if not name.startswith('K') or name.count('K') != 2:
+        raise ValueError(f"Invalid material: {name}")
+    white, black = name[1:].split('K')
+    if any(p not in PIECE_ORDER for p in white + black):
+        raise ValueError(f"Invalid material: {name}")
+    if 2 + len(white) + len(black) > MAX_PIECES:
+        raise ValueError(f"Only up to {MAX_PIECES} pieces are supported: {name}")
+    return white, black
+
+
+class Layout:
+    """
+    一張表的棋子排列與索引方式：pieces[0] 是白王，pieces[1] 是黑王，其後是白子再黑子。
+    """
+
+    def __init__(self, name):
+        white, black = parse_name(name)
+        self.name = f"K{white}K{black}"
+        self.pieces = ['K', 'k'] + list(white) + [p.lower() for p in black]
+        self.has_pawns = 'P' in white + black
+        self.slots = HALF_BOARD if self.has_pawns else TRIANGLE
+        self.slot_index = {sq: i for i, sq in enumerate(self.slots)}
+        self.king_transform = KING_TRANSFORM_PAWNS if self.has_pawns else KING_TRANSFORM_PAWNLESS
+        self.size = len(self.slots) * 64 ** (len(self.pieces) - 1)
+        # 同種棋子（例如 KRRK 的兩個城堡）交換位置是同一個局面，索引時把它們的格子排序
+        self.groups = [(i, j) for i, j in _runs(self.pieces) if j - i > 1]
+
+    def index(self, squares):
+        """
+        棋子格子（順序同 pieces）轉成索引；會先套用對稱變換。
+        """
+        transform = TRANSFORMS[self.king_transform[squares[0]]]
+        king = transform[squares[0]]
+        rest = self._sorted([transform[sq] for sq in squares[1:]])
+        if not self.has_pawns and king in DIAGONAL:
+            # 白王在 a1-h8 對角線上時，沿對角線翻轉也是同一個局面，取較小的那一個
+            flipped = self._sorted([FLIP_DIAGONAL[sq] for sq in rest])
+            if flipped < rest:
+                rest = flipped
+        idx = self.slot_index[king]
+        for sq in rest:
+            idx = idx * 64 + sq
+        return idx
+
+    def _sorted(self, rest):
+        for i, j in self.groups:
+            rest[i - 1:j - 1] = sorted(rest[i - 1:j - 1])
+        return rest
+
+    def squares(self, idx):
+        rest = []
+        for _ in range(len(self.pieces) - 1):
+            idx, sq = divmod(idx, 64)
+            rest.append(sq)
+        rest.reverse()
+        return [self.slots[idx]] + rest
+
+
+def _attacks(symbol, sq, occupied):
+    kind = symbol.upper()
+    if kind == 'K':
+        return KING_ATTACKS[sq]
+    if kind == 'N':
+        return KNIGHT_ATTACKS[sq]
+    if kind == 'B':
+        return bishop_attacks(sq, occupied)
+    if kind == 'R':
+        return rook_attacks(sq, occupied)
+    if kind == 'Q':
+        return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+    return PAWN_ATTACKS[symbol == 'P'][sq]
+
+
+def _attacked(target, by_white, pieces, squares, occupied, skip=-1):
+    bit = BITS[target]
+    for i, symbol in enumerate(pieces):
+        if i != skip and symbol.isupper() == by_white and _attacks(symbol, squares[i], occupied) & bit:
+            return True
+    return False
+
+
+def _occupancy(squares):
+    occupied = 0
+    for sq in squares:
+        occupied |= BITS[sq]
+    return occupied
+
+
+def is_legal(pieces, squares, white_to_move):
+    """
+    棋子不重疊、兵不在底線、不該走的一方沒有被將軍。
+    """
+    occupied = _occupancy(squares)
+    if bin(occupied).count('1') != len(squares):
+        return False
+    for symbol, sq in zip(pieces, squares):
+        if symbol in ('P', 'p') and (sq < 8 or sq >= 56):
+            return False
+    king = squares[1] if white_to_move else squares[0]
+    return not _attacked(king, white_to_move, pieces, squares, occupied)
+
+
+def legal_moves(pieces, squares, white_to_move):
+    """
+    產生 (棋子編號, 目標格, 被吃的棋子編號或 -1, 升變)；只產生不會讓自己被將軍的走法。
+    """
+    occupied = _occupancy(squares)
+    own = 0
+    for symbol, sq in zip(pieces, squares):
+        if symbol.isupper() == white_to_move:
+            own |= BITS[sq]
+    king = 0 if white_to_move else 1
+    moves = []
+    for i, symbol in enumerate(pieces):
+        if symbol.isupper() != white_to_move:
+            continue
+        frm = squares[i]
+        if symbol in ('P', 'p'):
+            step = -8 if white_to_move else 8
+            targets = PAWN_ATTACKS[white_to_move][frm] & occupied & ~own
+            one = frm + step
+            if not occupied & BITS[one]:
+                targets |= BITS[one]
+                start_row = 6 if white_to_move else 1
+                if frm // 8 == start_row and not occupied & BITS[one + step]:
+                    targets |= BITS[one + step]
+        else:
+            targets = _attacks(symbol, frm, occupied) & ~own
+        while targets:
+            low = targets & -targets
+            targets ^= low
+            to = low.bit_length() - 1
+            captured = -1
+            if occupied & low:
+                captured = squares.index(to)
+            after = list(squares)
+            after[i] = to
+            after_occupied = (occupied & ~BITS[frm]) | low
+            king_sq = to if i == king else squares[king]
+            if _attacked(king_sq, not white_to_move, pieces, after, after_occupied, captured):
+                continue
+            if symbol in ('P', 'p') and (to < 8 or to >= 56):
+                for promo in PROMOTIONS:
+                    moves.append((i, to, captured, promo))
+            else:
+                moves.append((i, to, captured, ''))
+    return moves
+
+
+def unmoves(pieces, squares, white_moved):
+    """
+    產生「上一步」的局面（棋子格子列表）：white_moved 那一方的某個棋子不吃子、不升變地走回去。
+    不檢查合法性。
+    """
+    occupied = _occupancy(squares)
+    result = []
+    for i, symbol in enumerate(pieces):
+        if symbol.isupper() != white_moved:
+            continue
+        to = squares[i]
+        if symbol in ('P', 'p'):
+            back = 8 if white_moved else -8
+            origins = []
+            one = to + back
+            if 8 <= one < 56 and not occupied & BITS[one]:
+                origins.append(one)
+                double_row = 4 if white_moved else 3
+                if to // 8 == double_row and not occupied & BITS[one + back]:
+                    origins.append(one + back)
+            for frm in origins:
+                before = list(squares)
+                before[i] = frm
+                result.append(before)
+            continue
+        origins = _attacks(symbol, to, occupied) & ~occupied
+        while origins:
+            low = origins & -origins
+            origins ^= low
+            before = list(squares)
+            before[i] = low.bit_length() - 1
+            result.append(before)
+    return result
+
+
+def encode(result, plies):
+    """
+    (勝負, 半步數) 轉成 byte 值；result 為 1（執行方勝）、0（和）、-1（執行方負）。
+    """
+    return DRAW if result == 0 else plies + 1
+
+
+def decode(value):
+    """
+    byte 值轉成執行方觀點的 (勝負, 半步數)：勝 1、和 0、負 -1；不合法局面回傳 None。
+    """
+    if value == ILLEGAL:
+        return None
+    if value == DRAW:
+        return 0, 0
+    plies = value - 1
+    return (1 if plies % 2 else -1), plies
+
+
+# ----------------------------------------------------------------------
+# 讀取
+# ----------------------------------------------------------------------
+
+class Table:
+    """
+    以 mmap 讀取的一張殘局表。
+    """
+
+    def __init__(self, path, name):
+        self.path = path
+        self.layout = Layout(name)
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, size = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION or count != len(self.layout.pieces) or size != self.layout.size:
+            self.close()
+            raise ValueError(f"{path}: not a {name} table")
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+    def value(self, squares, white_to_move):
+        """
+        squares 的順序同 layout.pieces；回傳 byte 值。
+        """
+        offset = HEADER.size + (0 if white_to_move else self.layout.size)
+        return self._data[offset + self.layout.index(squares)]
+
+
+class Tablebases:
+    """
+    殘局庫目錄（內含 <表名>.tb）；每張表在第一次用到時才以 mmap 開啟。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._tables = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for table in self._tables.values():
+            if table is not None:
+                table.close()
+        self._tables.clear()
+
+    def available(self):
+        """
+        目錄裡已有的表名。
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-3] for name in os.listdir(self.directory) if name.endswith('.tb'))
+
+    def table(self, name):
+        if name not in self._tables:
+            path = os.path.join(self.directory, f"{name}.tb")
+            self._tables[name] = Table(path, name) if os.path.exists(path) else None
+        return self._tables[name]
+
+    def lookup(self, placed, white_to_move):
+        """
+        placed 為 [(棋子符號, 格子), ...]（格子以 row * 8 + col 編號），回傳 byte 值；
+        只剩兩個國王時為和棋，沒有對應的表時回傳 None。
+        """
+        white = ''.join(symbol for symbol, _ in placed if symbol.isupper() and symbol != 'K')
+        black = ''.join(symbol for symbol, _ in placed if symbol.islower() and symbol != 'k').upper()
+        if not white and not black:
+            return DRAW
+        name, flipped = canonical_name(white, black)
+        table = self.table(name)
+        if table is None:
+            return None
+        if flipped:
+            # 交換顏色：棋子大小寫互換、棋盤上下翻轉、執行方互換
+            placed = [(symbol.swapcase(), sq ^ 56) for symbol, sq in placed]
+            white_to_move = not white_to_move
+        return table.value(_arrange(table.layout.pieces, placed), white_to_move)
+
+    def _probe(self, position):
+        placed = _placed(position)
+        if placed is None or position.castling:
+            return None
+        value = self.lookup(placed, position.turn == 'white')
+        return None if value is None else decode(value)
+
+    def probe(self, position):
+        """
+        回傳執行方觀點的 (勝負, 距離將死的半步數)，勝負為 1、0、-1；
+        不在殘局庫範圍內（超過 4 子、沒有對應的表、有 castling 權或可以吃過路兵）時回傳 None。
+        """
+        if _has_en_passant(position):
+            return None
+        return self._probe(position)
+
+    def best_move(self, position):
+        """
+        依殘局庫挑一步：會贏時挑最快將死的，和棋時挑保持和棋的，會輸時挑拖最久的。
+        不在殘局庫範圍內或沒有走法時回傳 None。
+        """
+        if self.probe(position) is None:
+            return None
+        best = None
+        best_key = None
+        for move in position.legal_moves():
+            position.make_move(move)
+            try:
+                # 走完後對手可能可以吃過路兵；表本身不考慮過路兵，這裡也一樣
+                outcome = self._probe(position)
+            finally:
+                position.unmake_move()
+            if outcome is None:
+                continue
+            # 對手觀點 → 自己觀點：對手負就是自己勝，越快越好；自己負時越慢越好
+            result, plies = -outcome[0], outcome[1]
+            key = (result, -plies if result > 0 else plies)
+            if best_key is None or key > best_key:
+                best, best_key = move, key
+        return best
+
+
+def _placed(position):
+    placed = []
+    for r, row in enumerate(position.board):
+        for c, piece in enumerate(row):
+            if piece:
+                if len(placed) == MAX_PIECES:
+                    return None
+                placed.append((piece, r * 8 + c))
+    return placed
+
+
+def _has_en_passant(position):
+    ep = position.en_passant_target
+    if ep is None:
+        return False
+    row = 3 if position.turn == 'white' else 4
+    pawn = 'P' if position.turn == 'white' else 'p'
+    board = position.board
+    return any(0 <= c < 8 and board[row][c] == pawn for c in (ep[1] - 1, ep[1] + 1))
+
+
+def _arrange(pieces, placed):
+    # 把 [(符號, 格子)] 依照表的棋子順序排好；同種棋子的先後不影響結果
+    remaining = list(placed)
+    squares = []
+    for symbol in pieces:
+        for k, (other, sq) in enumerate(remaining):
+            if other == symbol:
+                squares.append(sq)
+                del remaining[k]
+                break
+    return squares
+
+
+def piece_count(position):
+    """
+    棋盤上的棋子數（含國王）。
+    """
+    return sum(1 for row in position.board for piece in row if piece)
+
+
+# ----------------------------------------------------------------------
+# 產生
+# ----------------------------------------------------------------------
+
+def dependencies(name):
+    """
+    吃子或升變後會進入的其他表（必須先產生）。
+    """
+    white, black = parse_name(name)
+    result = set()
+
+    def add(w, b):
+        if w or b:
+            result.add(canonical_name(w, b)[0])
+
+    for own, other, is_white in ((white, black, True), (black, white, False)):
+        captures = [other[:k] + other[k + 1:] for k in range(len(other))]
+        for rest in captures:
+            add(own, rest) if is_white else add(rest, own)
+        if 'P' in own:
+            k = own.index('P')
+            for promo in PROMOTIONS:
+                promoted = own[:k] + promo + own[k + 1:]
+                for rest in [other] + captures:
+                    add(promoted, rest) if is_white else add(rest, promoted)
+    return result
+
+
+def generation_order(names):
+    """
+    要產生的表加上所有間接依賴的表，排成依賴的表在前的順序。
+    """
+    order = []
+    seen = set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        for dependency in sorted(dependencies(name)):
+            visit(dependency)
+        order.append(name)
+
+    for name in names:
+        visit(canonical_name(*parse_name(name))[0])
+    return order
+
+
+def _leave(layout, tablebases, squares, white_to_move, move):
+    """
+    吃子或升變（離開這張表）後，對手觀點的 byte 值。
+    """
+    i, to, captured, promo = move
+    placed = []
+    for k, sq in enumerate(squares):
+        if k == captured:
+            continue
+        symbol = layout.pieces[k]
+        if k == i:
+            sq = to
+            if promo:
+                symbol = promo if white_to_move else promo.lower()
+        placed.append((symbol, sq))
+    value = tablebases.lookup(placed, not white_to_move)
+    if value is None:
+        raise ValueError(f"{layout.name}: missing table for {''.join(symbol for symbol, _ in placed)}")
+    return value
+
+
+def _evaluate_moves(layout, tablebases, values, final, squares, white_to_move):
+    """
+    以目前已確定的結果評估一個局面的所有走法，回傳 (可達成的最快勝利半步數, 全部為負時的最長半步數)。
+    同一張表裡還沒確定的局面當作未知（values 為 None 時全部未知）；第二個值為 None 表示還不能確定為負。
+    """
+    best_win = None
+    worst_loss = 0
+    all_lost = True
+    pieces = layout.pieces
+    other = values[not white_to_move] if values is not None else None
+    other_final = final[not white_to_move] if final is not None else None
+    for move in legal_moves(pieces, squares, white_to_move):
+        i, to, captured, promo = move
+        if captured < 0 and not promo:
+            if other is None:
+                all_lost = False
+                continue
+            after = list(squares)
+            after[i] = to
+            idx = layout.index(after)
+            if not other_final[idx]:
+                all_lost = False
+                continue
+            value = other[idx]
+        else:
+            value = _leave(layout, tablebases, squares, white_to_move, move)
+        if value == DRAW:
+            all_lost = False
+            continue
+        plies = value - 1
+        if plies % 2:
+            worst_loss = max(worst_loss, plies + 1)
+        else:
+            all_lost = False
+            best_win = plies + 1 if best_win is None else min(best_win, plies + 1)
+    return best_win, (worst_loss if all_lost else None)
+
+
+# 子行程裡開過的殘局庫，同一個子行程處理下一段時直接沿用
+_WORKER_TABLES = {}
+
+
+def _initial_chunk(task):
+    """
+    子行程：檢查一段索引的局面，回傳 (執行方, 起點, byte 值, 旗標)。
+    旗標 1 表示結果已確定（不合法、將死、逼和，或所有走法都離開這張表），
+    其他局面的 byte 值是經由吃子或升變就能達成的最快勝利（候選，之後可能被更快的取代）。
+    """
+    name, directory, white_to_move, start, stop = task
+    tablebases = _WORKER_TABLES.get(directory)
+    if tablebases is None:
+        tablebases = _WORKER_TABLES[directory] = Tablebases(directory)
+    layout = Layout(name)
+    pieces = layout.pieces
+    king = 0 if white_to_move else 1
+    values = bytearray(stop - start)
+    final = bytearray(stop - start)
+    for k in range(stop - start):
+        squares = layout.squares(start + k)
+        # 與其他索引對稱重複的位置（不是標準形式）不使用，和不合法局面一樣標記
+        if layout.index(squares) != start + k or not is_legal(pieces, squares, white_to_move):
+            values[k] = ILLEGAL
+            final[k] = 1
+            continue
+        moves = legal_moves(pieces, squares, white_to_move)
+        if not moves:
+            if _attacked(squares[king], not white_to_move, pieces, squares, _occupancy(squares)):
+                values[k] = encode(-1, 0)
+            final[k] = 1
+            continue
+        best_win, loss = _evaluate_moves(layout, tablebases, None, None, squares, white_to_move)
+        if best_win is not None:
+            values[k] = encode(1, best_win)
+        elif loss is not None:
+            values[k] = encode(-1, loss)
+            final[k] = 1
+        elif all(move[2] >= 0 or move[3] for move in moves):
+            # 所有走法都離開這張表，沒有勝也不是全負：和棋
+            final[k] = 1
+    return white_to_move, start, bytes(values), bytes(final)
+
+
+def generate(name, directory, pool=None):
+    """
+    產生一張表並寫入 directory/<表名>.tb，回傳 (表名, 局面數, 各結果的統計)；依賴的表必須已經存在。
+
+    第一輪（每個局面各自檢查）分段交給 pool 平行處理；
+    之後依半步數由小到大逐層逆推：會輸的局面，它的上一手（退一步）就是會贏的局面；
+    會贏的局面，它的上一手若所有走法都通往對手勝局，就是會輸的局面。
+    """
+    layout = Layout(canonical_name(*parse_name(name))[0])
+    name = layout.name
+    pieces = layout.pieces
+    size = layout.size
+    tablebases = Tablebases(directory)
+    values = {True: bytearray(size), False: bytearray(size)}
+    final = {True: bytearray(size), False: bytearray(size)}
+    # buckets[半步數] = [(執行方, 索引)]：這一層要處理的局面
+    buckets = {}
+
+    tasks = [(name, directory, side, start, min(start + CHUNK, size))
+             for side in (True, False) for start in range(0, size, CHUNK)]
+    results = pool.map(_initial_chunk, tasks) if pool is not None else map(_initial_chunk, tasks)
+    for side, start, chunk_values, chunk_final in results:
+        values[side][start:start + len(chunk_values)] = chunk_values
+        final[side][start:start + len(chunk_final)] = chunk_final
+        for k, value in enumerate(chunk_values):
+            if value != DRAW and value != ILLEGAL:
+                buckets.setdefault(value - 1, []).append((side, start + k))
+
+    try:
+        plies = 0
+        while buckets:
+            entries = buckets.pop(plies, ())
+            verify = set()
+            for side, idx in entries:
+                if plies % 2:
+                    # 勝：第一個到達的是最快的；已經確定的表示更早就決定了
+                    if final[side][idx]:
+                        continue
+                    values[side][idx] = encode(1, plies)
+                    final[side][idx] = 1
+                elif values[side][idx] != encode(-1, plies):
+                    continue
+                mover = not side
+                for before in unmoves(pieces, layout.squares(idx), mover):
+                    if not is_legal(pieces, before, mover):
+                        continue
+                    prev = layout.index(before)
+                    if final[mover][prev]:
+                        continue
+                    if plies % 2:
+                        verify.add((mover, prev))
+                    elif values[mover][prev] == DRAW or values[mover][prev] - 1 > plies + 1:
+                        buckets.setdefault(plies + 1, []).append((mover, prev))
+            # 對手剛多了勝局：檢查上一手的局面是不是所有走法都輸了
+            for side, idx in verify:
+                if final[side][idx] or values[side][idx] != DRAW:
+                    continue
+                _, loss = _evaluate_moves(layout, tablebases, values, final, layout.squares(idx), side)
+                if loss is not None:
+                    values[side][idx] = encode(-1, loss)
+                    final[side][idx] = 1
+                    buckets.setdefault(loss, []).append((side, idx))
+            plies += 1
+    finally:
+        tablebases.close()
+
+    # 到最後都沒有確定的局面就是和棋
+    stats = {'win': 0, 'draw': 0, 'loss': 0, 'illegal': 0}
+    for side in (True, False):
+        table = values[side]
+        for idx in range(size):
+            value = table[idx]
+            if value == ILLEGAL:
+                stats['illegal'] += 1
+            elif value == DRAW:
+                stats['draw'] += 1
+            elif (value - 1) % 2:
+                stats['win'] += 1
+            else:
+                stats['loss'] += 1
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.tb")
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(pieces), size))
+        f.write(values[True])
+        f.write(values[False])
+    os.replace(path + '.tmp', path)
+    return name, size * 2, stats
+
+
+def generate_all(names, directory, pool=None, out=sys.stdout):
+    """
+    依序產生 names 與它們依賴的表；已經存在的表不重新產生。
+    """
+    for table in generation_order(names):
+        path = os.path.join(directory, f"{table}.tb")
+        if os.path.exists(path):
+            print(f"{table}: exists", file=out)
+            continue
+        start = time.perf_counter()
+        name, count, stats = generate(table, directory, pool)
+        longest = _longest_mate(path)
+        print(f"{name}: {count} positions, +{stats['win']} ={stats['draw']} -{stats['loss']}, "
+              f"longest mate {longest} plies, {time.perf_counter() - start:.1f}s", file=out)
+
+
+def _longest_mate(path):
+    with open(path, 'rb') as f:
+        data = f.read()[HEADER.size:]
+    return max((value - 1 for value in set(data) if value not in (DRAW, ILLEGAL) and (value - 1) % 2), default=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate and probe distance-to-mate endgame tablebases")
+    parser.add_argument('-d', '--directory', default='tablebases')
+    sub = parser.add_subparsers(dest='command', required=True)
+    gen = sub.add_parser('generate', help="generate tables (and the tables they depend on)")
+    gen.add_argument('material', nargs='+', help="e.g. KQK KRK KPK KQKR")
+    gen.add_argument('-j', '--jobs', type=int, default=0, help="worker processes (0 = all cores)")
+    probe = sub.add_parser('probe', help="look up a position")
+    probe.add_argument('--fen', required=True)
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        with PositionPool(args.jobs or None) as pool:
+            generate_all(args.material, args.directory, pool)
+        return 0
+
+    try:
+        position = create_position(fen=args.fen)
+    except ValueError as e:
+        parser.error(str(e))
+    with Tablebases(args.directory) as tablebases:
+        outcome = tablebases.probe(position)
+        if outcome is None:
+            print("position not covered by the tablebases")
+            return 1
+        result, plies = outcome
+        if result == 0:
+            print("draw")
+        else:
+            print(f"{'win' if result > 0 else 'loss'}, mate in {plies} plies")
+        move = tablebases.best_move(position)
+        if move is not None:
+            print("best move:", move_to_san(position, move))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
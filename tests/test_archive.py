@@ -0,0 +1,123 @@
+# 棋局庫（.cga）與局面索引（.idx）：寫入後讀回的內容要與原始棋譜一致。
+import io
+
+import pytest
+
+from archive import ArchiveWriter, GameArchive, decode_move, encode_move, pack_pgn
+from pgn import format_game, read_games
+from posindex import PositionIndex, archive_games, build_index, pgn_games
+from position import STARTING_FEN, create_position, san_to_move
+
+PGN = """[Event "Test"]
+[White "Alpha"]
+[Black "Beta"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 4. Ba4 Nf6 5. O-O Be7 1-0
+
+[Event "Test"]
+[White "Beta"]
+[Black "Alpha"]
+[Result "1/2-1/2"]
+
+1. e4 c5 2. Nf3 d6 3. d4 cxd4 4. Nxd4 Nf6 1/2-1/2
+
+[Event "Endgame"]
+[SetUp "1"]
+[FEN "4k3/P7/8/8/8/8/8/4K3 w - - 0 1"]
+[Result "0-1"]
+
+1. a8=Q+ Kd7 0-1
+
+[Event "Short"]
+[Result "*"]
+
+1. e4 e5 *
+"""
+
+
+@pytest.fixture
+def games():
+    return list(read_games(io.StringIO(PGN)))
+
+
+@pytest.fixture
+def archive_path(tmp_path, games):
+    path = tmp_path / 'games.cga'
+    with ArchiveWriter(path) as writer:
+        for game in games:
+            writer.add_game(game)
+    return path
+
+
+def test_move_codes():
+    for move in create_position().legal_moves() + [(1, 0, 0, 1, 'Q'), (1, 0, 0, 0, 'N')]:
+        assert decode_move(encode_move(move)) == move
+
+
+def test_archive_round_trip(archive_path, games):
+    with GameArchive(archive_path) as archive:
+        assert len(archive) == len(games)
+        for game_id, game in enumerate(games):
+            assert archive.moves(game_id) == game.moves
+            assert archive.fen(game_id) == game.fen
+            assert archive.result(game_id) == game.result
+            assert archive.headers(game_id) == {name: value for name, value in game.headers.items()
+                                                if name != 'SetUp'}
+            # 輸出的 PGN 再讀回來，走法與標頭都不變（未知的七標籤會補上 "?"）
+            exported, = read_games(io.StringIO(format_game(archive.game(game_id))))
+            assert exported.moves == game.moves
+            assert exported.headers.items() >= game.headers.items()
+            assert archive.replay(game_id).fen() == game.replay().fen()
+
+
+def test_pack_pgn(tmp_path, games):
+    pgn_path = tmp_path / 'games.pgn'
+    pgn_path.write_text(PGN + '\n[Event "Broken"]\n\n1. e4 e4 *\n', encoding='utf-8')
+    count, skipped = pack_pgn([pgn_path], tmp_path / 'packed.cga')
+    assert (count, skipped) == (len(games), 1)
+    with GameArchive(tmp_path / 'packed.cga') as archive:
+        assert [archive.moves(i) for i in range(len(archive))] == [game.moves for game in games]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'bad.cga'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        GameArchive(path)
+
+
+@pytest.mark.parametrize('shard_entries', [1 << 20, 7])
+def test_index_round_trip(tmp_path, archive_path, games, shard_entries):
+    index_path = tmp_path / 'games.idx'
+    with GameArchive(archive_path) as archive:
+        count, shards = build_index(archive_games(archive), index_path, shard_entries=shard_entries)
+    assert count == sum(len(game.moves) + 1 for game in games)
+    assert (shards > 1) == (shard_entries < count)
+
+    with PositionIndex(index_path) as index, GameArchive(archive_path) as archive:
+        assert len(index) == count
+        start = create_position(fen=STARTING_FEN)
+        assert index.games(start) == [0, 1, 3]
+        e4 = san_to_move(start, 'e4')
+        assert index.move_stats(start, archive) == {e4: [3, 1, 1, 0]}
+
+        # 每盤棋走過的每個局面都要查得到，而且記錄的下一步正確
+        for game_id, game in enumerate(games):
+            position = create_position(fen=game.fen)
+            for ply, move in enumerate(game.moves):
+                assert (game_id, ply) in {(g, p) for g, p, _ in index.lookup(position.key)}
+                assert move in index.move_stats(position)
+                position.make_move(move)
+            assert game_id in index.games(position)
+
+
+def test_index_from_pgn(tmp_path):
+    # 有錯的棋局不佔編號，直接從 PGN 建的索引與 pack_pgn 的棋局庫編號一致
+    pgn_path = tmp_path / 'games.pgn'
+    pgn_path.write_text('[Event "Broken"]\n\n1. e4 e4 *\n\n' + PGN, encoding='utf-8')
+    build_index(pgn_games([pgn_path]), tmp_path / 'a.idx')
+    pack_pgn([pgn_path], tmp_path / 'packed.cga')
+    with GameArchive(tmp_path / 'packed.cga') as archive:
+        build_index(archive_games(archive), tmp_path / 'b.idx')
+    assert (tmp_path / 'a.idx').read_bytes() == (tmp_path / 'b.idx').read_bytes()
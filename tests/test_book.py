@@ -0,0 +1,79 @@
+# Polyglot 開局庫：內建的亂數表要算出標準的 key，一般的 .bin 不必額外指定 --randoms 就能查。
+import pytest
+
+import book
+from book import ENTRY, RANDOM64, OpeningBook, build_book, encode_move, is_standard, polyglot_key
+from position import STARTING_FEN, create_position, uci_to_move
+
+# Polyglot 規格文件附的測試局面與 key
+KEYS = [
+    (STARTING_FEN, 0x463B96181691FC9C),
+    ("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1", 0x823C9B50FD114196),
+    ("rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 2", 0x0756B94461C50FB0),
+    ("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3", 0x22A48B5A8E47FF78),
+    ("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPPKPPP/RNBQ1BNR b kq - 0 3", 0x652A607CA3F242C1),
+    ("rnbq1bnr/ppp1pkpp/8/3pPp2/8/8/PPPPKPPP/RNBQ1BNR w - - 0 4", 0x00FDD303C946BDD9),
+    ("rnbqkbnr/p1pppppp/8/8/PpP4P/8/1P1PPPP1/RNBQKBNR b KQkq c3 0 3", 0x3C8123EA7B067637),
+    ("rnbqkbnr/p1pppppp/8/8/P6P/R1p5/1P1PPPP1/1NBQKBNR b Kkq - 0 4", 0x5C3F9B829B279560),
+]
+
+
+def test_random64_is_standard():
+    assert len(RANDOM64) == book.RANDOM_COUNT
+    assert is_standard(RANDOM64)
+
+
+@pytest.mark.parametrize('fen, key', KEYS)
+def test_standard_keys(fen, key):
+    for backend in ('list', 'bitboard'):
+        assert polyglot_key(create_position(backend, fen=fen), RANDOM64) == key
+
+
+def write_book(path, entries):
+    with open(path, 'wb') as f:
+        for entry in sorted(entries):
+            f.write(ENTRY.pack(*entry))
+
+
+def test_reads_standard_book(tmp_path):
+    # 依標準 key 寫成的 .bin（一般 Polyglot 工具的輸出），不指定亂數表就能查到
+    start = create_position()
+    path = tmp_path / 'standard.bin'
+    write_book(path, [
+        (0x463B96181691FC9C, encode_move(uci_to_move('e2e4'), start.board), 30, 0),
+        (0x463B96181691FC9C, encode_move(uci_to_move('d2d4'), start.board), 10, 0),
+        (0x463B96181691FC9C, encode_move(uci_to_move('e2e5'), start.board), 99, 0),  # 不合法的條目
+    ])
+    with OpeningBook(path) as opening_book:
+        assert opening_book.moves(start) == [(uci_to_move('e2e4'), 30), (uci_to_move('d2d4'), 10)]
+        assert opening_book.choose(start, best=True) == uci_to_move('e2e4')
+
+
+def test_castling_entry(tmp_path):
+    fen = "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1"
+    position = create_position(fen=fen)
+    castle = uci_to_move('e1g1')
+    path = tmp_path / 'castle.bin'
+    write_book(path, [(polyglot_key(position, RANDOM64), encode_move(castle, position.board), 1, 0)])
+    with OpeningBook(path) as opening_book:
+        assert opening_book.moves(position) == [(castle, 1)]
+
+
+def test_build_and_probe(tmp_path):
+    pgn = tmp_path / 'games.pgn'
+    pgn.write_text('[Result "1-0"]\n\n1. e4 e5 2. Nf3 1-0\n\n[Result "0-1"]\n\n1. d4 d5 0-1\n', encoding='utf-8')
+    count = build_book([pgn], tmp_path / 'built.bin', max_plies=4)
+    assert count == 3  # e4、Nf3（白勝）與 d5（黑勝）；輸棋那方的 e5、d4 分數為 0 不寫入
+    with OpeningBook(tmp_path / 'built.bin') as opening_book:
+        start = create_position()
+        assert opening_book.moves(start) == [(uci_to_move('e2e4'), 2)]
+
+
+def test_probe_cli_zero_weights(tmp_path, capsys):
+    start = create_position()
+    path = tmp_path / 'zero.bin'
+    write_book(path, [(0x463B96181691FC9C, encode_move(uci_to_move('e2e4'), start.board), 0, 0)])
+    assert book.main(['probe', str(path)]) == 0
+    assert 'e2e4' in capsys.readouterr().out
+    with OpeningBook(path) as opening_book:
+        assert opening_book.choose(start) is None
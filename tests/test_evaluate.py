@@ -0,0 +1,42 @@
+# 增量評估：兩個後端在 make/unmake 時維護的中局、殘局分數與階段，都要等於從頭計算的結果。
+import random
+
+import pytest
+
+from engine import evaluate
+from engine.psqt import compute_psqt
+from perft import REFERENCE_POSITIONS
+from position import BACKENDS, create_position
+
+FENS = [fen for _, fen, _ in REFERENCE_POSITIONS]
+
+
+def totals(position):
+    return position.mg, position.eg, position.phase
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('fen', FENS)
+def test_incremental_totals(backend, fen):
+    rng = random.Random(fen)
+    position = create_position(backend, fen=fen)
+    start = totals(position)
+    assert start == compute_psqt(position.board)
+    for _ in range(10):
+        plies = 0
+        for _ in range(40):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.make_move(rng.choice(moves))
+            plies += 1
+            assert totals(position) == compute_psqt(position.board)
+        for _ in range(plies):
+            position.unmake_move()
+        assert totals(position) == start
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_backends_agree(fen):
+    positions = [create_position(backend, fen=fen) for backend in BACKENDS]
+    assert len({evaluate(position) for position in positions}) == 1
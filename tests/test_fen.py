@@ -0,0 +1,48 @@
+# FEN 解析：格式錯誤或不合理的局面要丟出 ValueError，合法的 FEN 要能原樣寫回。
+import pytest
+
+from perft import REFERENCE_POSITIONS
+from position import BACKENDS, STARTING_FEN, create_position
+
+INVALID = [
+    "",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1",            # 只有 7 排
+    "rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",   # 一排超過 8 格
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNX w KQkq - 0 1",   # 不認得的棋子
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1",   # 執行方
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQxq - 0 1",   # 易位權
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e5 0 1",  # en passant 格
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - x 1",   # 半步數
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1 2",  # 多出的欄位
+]
+
+ILLEGAL = [
+    "rnbq1bnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQ - 0 1",      # 黑方沒有國王
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBKKBNR w kq - 0 1",      # 白方兩個國王
+    "rnbqkbnP/pppppppp/8/8/8/8/PPPPPPP1/RNBQKBNR w KQq - 0 1",     # 兵在底線
+    "k7/8/8/8/8/8/8/Q6K w - - 0 1",                                # 不該走的一方正被將軍
+]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('fen', INVALID + ILLEGAL)
+def test_rejects_bad_fen(backend, fen):
+    with pytest.raises(ValueError):
+        create_position(backend, fen=fen)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('fen', [STARTING_FEN] + [fen for _, fen, _ in REFERENCE_POSITIONS])
+def test_round_trip(backend, fen):
+    assert create_position(backend, fen=fen).fen() == fen
+
+
+def test_optional_counters():
+    fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -"
+    assert create_position(fen=fen).fen() == STARTING_FEN
+
+
+def test_drops_unusable_rights():
+    # 國王或城堡不在原位時的易位權、沒有兵可以吃的 en passant 格都會被忽略
+    position = create_position(fen="4k3/8/8/8/8/8/8/4K3 w KQkq e6 0 1")
+    assert position.fen() == "4k3/8/8/8/8/8/8/4K3 w - - 0 1"
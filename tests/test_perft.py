@@ -0,0 +1,51 @@
+# 參考局面的 perft 節點數：兩個規則後端都要與已知的正確值一致。
+# 只跑到節點數一萬左右的深度，完整的驗證請用 python perft.py -d 4。
+import pytest
+
+from perft import REFERENCE_POSITIONS, divide, parallel_divide, perft
+from position import BACKENDS, STARTING_FEN, create_position
+from workers import PositionPool
+
+MAX_NODES = 10000
+
+CASES = [(name, fen, depth, expected)
+         for name, fen, counts in REFERENCE_POSITIONS
+         for depth, expected in enumerate(counts, 1) if expected <= MAX_NODES]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name, fen, depth, expected', CASES, ids=[f"{c[0]}-{c[2]}" for c in CASES])
+def test_reference_counts(backend, name, fen, depth, expected):
+    assert perft(create_position(backend, fen=fen), depth) == expected
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_perft_restores_position(backend):
+    position = create_position(backend, fen=REFERENCE_POSITIONS[1][1])
+    before = position.fen(), position.key
+    perft(position, 2)
+    assert (position.fen(), position.key) == before
+
+
+def test_divide_sums_to_perft():
+    position = create_position(fen=STARTING_FEN)
+    counts = divide(position, 3)
+    assert len(counts) == 20
+    assert sum(nodes for _, nodes in counts) == 8902
+
+
+@pytest.fixture(scope='module')
+def pool():
+    with PositionPool(2) as pool:
+        yield pool
+
+
+@pytest.mark.parametrize('split_depth', [1, 2])
+@pytest.mark.parametrize('fen, depth', [
+    (STARTING_FEN, 3),
+    # Rd8# 之後沒有回應：split_depth=2 時這一步仍然是 0 個節點
+    ("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1", 3),
+])
+def test_parallel_divide_matches_divide(pool, fen, depth, split_depth):
+    expected = divide(create_position(fen=fen), depth)
+    assert parallel_divide(fen, depth, pool=pool, split_depth=split_depth) == expected
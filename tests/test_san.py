@@ -0,0 +1,54 @@
+# SAN：每個參考局面的每一步合法走法，轉成 SAN 再解析回來都要得到同一步。
+import pytest
+
+from perft import REFERENCE_POSITIONS
+from position import BACKENDS, STARTING_FEN, create_position, move_to_san, san_to_move, uci_to_move
+
+FENS = [STARTING_FEN] + [fen for _, fen, _ in REFERENCE_POSITIONS]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('fen', FENS)
+def test_round_trip(backend, fen):
+    position = create_position(backend, fen=fen)
+    for move in position.legal_moves():
+        assert san_to_move(position, move_to_san(position, move)) == move
+    # 一層之後的局面也要成立（包含對手的易位與升變）
+    for move in list(position.legal_moves()):
+        position.make_move(move)
+        for reply in position.legal_moves():
+            assert san_to_move(position, move_to_san(position, reply)) == reply
+        position.unmake_move()
+
+
+@pytest.mark.parametrize('fen, uci, san', [
+    (STARTING_FEN, 'g1f3', 'Nf3'),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 'e1g1', 'O-O'),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 'e1c1', 'O-O-O'),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 'd5e6', 'dxe6'),
+    ("1n6/P6k/8/8/8/8/8/4K3 w - - 0 1", 'a7b8q', 'axb8=Q'),
+    ("1n6/P6k/8/8/8/8/8/4K3 w - - 0 1", 'a7a8n', 'a8=N'),
+    ("4k3/8/8/8/8/2N3N1/8/4K3 w - - 0 1", 'c3e4', 'Nce4'),
+    ("4k3/8/8/1N6/8/1N6/8/4K3 w - - 0 1", 'b5d4', 'N5d4'),
+    ("k7/8/8/8/8/8/8/4K2R w K - 0 1", 'h1h8', 'Rh8+'),
+    ("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", 'a1a8', 'Ra8#'),
+    ("4k3/8/8/8/8/8/R6R/4K3 w - - 0 1", 'h2d2', 'Rhd2'),
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", 'e5d6', 'exd6'),
+])
+def test_known_san(fen, uci, san):
+    position = create_position(fen=fen)
+    move = uci_to_move(uci)
+    assert move_to_san(position, move) == san
+    assert san_to_move(position, san) == move
+
+
+@pytest.mark.parametrize('san', ['Nf4', 'e5', 'O-O', 'Ke2', 'xyz', ''])
+def test_rejects_illegal(san):
+    with pytest.raises(ValueError):
+        san_to_move(create_position(fen=STARTING_FEN), san)
+
+
+def test_rejects_ambiguous():
+    position = create_position(fen="4k3/8/8/8/8/8/R6R/4K3 w - - 0 1")
+    with pytest.raises(ValueError):
+        san_to_move(position, 'Rd2')
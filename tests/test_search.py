@@ -0,0 +1,96 @@
+# 搜尋與置換表：固定局面的最佳走法、各種搜尋限制，以及置換表的取代策略。
+import threading
+
+import pytest
+
+from engine import Searcher, TranspositionTable
+from engine.tt import EXACT, LOWER, MATE_BOUND, MATE_SCORE, score_from_tt, score_to_tt
+from position import BACKENDS, STARTING_FEN, create_position, move_to_uci
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('fen, best, mate_in', [
+    ("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", 'a1a8', 1),
+    ("k7/8/1K6/8/8/8/7Q/8 w - - 0 1", 'h2h8', 1),
+    # 1. Re8+ Rxe8 2. Rxe8#
+    ("3r2k1/5ppp/8/8/8/8/4R3/4R1K1 w - - 0 1", 'e2e8', 2),
+])
+def test_finds_mate(backend, fen, best, mate_in):
+    result = Searcher().search(create_position(backend, fen=fen), depth=2 * mate_in + 1)
+    assert move_to_uci(result.best_move) == best
+    assert result.score == MATE_SCORE - (2 * mate_in - 1)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_wins_hanging_queen(backend):
+    position = create_position(backend, fen="4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1")
+    result = Searcher().search(position, depth=3)
+    assert move_to_uci(result.best_move) == 'd2d5'
+    assert result.score > 400
+
+
+def test_stalemate_and_checkmate_scores():
+    assert Searcher().search(create_position(fen="k7/8/1Q6/8/8/8/8/7K b - - 0 1"), depth=2).score == 0
+    mated = Searcher().search(create_position(fen="R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1"), depth=2)
+    assert mated.best_move is None and mated.score <= -MATE_BOUND
+
+
+def test_limits():
+    position = create_position(fen=STARTING_FEN)
+    assert Searcher().search(position, depth=3).depth == 3
+    info = []
+    Searcher().search(position, depth=3, info=info.append)
+    assert [result.depth for result in info] == [1, 2, 3]
+    # 節點數的檢查每 CHECK_INTERVAL 個節點一次
+    assert Searcher().search(position, nodes=2000).nodes <= 2000 + 1024
+    stop = threading.Event()
+    stop.set()
+    result = Searcher().search(position, depth=10, stop_event=stop)
+    assert result.best_move in position.legal_moves()
+    assert position.fen() == STARTING_FEN
+
+
+def test_single_reply_returns_immediately():
+    # 唯一的應將是吃掉 f2 的城堡
+    result = Searcher().search(create_position(fen="7k/8/8/8/8/8/5r2/r5K1 w - - 0 1"))
+    assert move_to_uci(result.best_move) == 'g1f2' and result.nodes == 0
+
+
+def test_table_survives_between_searches():
+    position = create_position(fen="r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+    searcher = Searcher()
+    first = searcher.search(position, depth=4)
+    second = searcher.search(position, depth=4)
+    assert second.nodes < first.nodes
+    assert second.best_move == first.best_move
+
+
+def test_tt_store_and_probe():
+    tt = TranspositionTable(1000)
+    assert tt.size == 1024
+    tt.store(5, 3, EXACT, 42, (6, 4, 4, 4, ''))
+    assert tt.probe(5) == (3, EXACT, 42, (6, 4, 4, 4, ''))
+    assert tt.probe(5 + tt.size) is None
+    # 同一局面沒有新走法時保留舊的走法
+    tt.store(5, 4, LOWER, 50, None)
+    assert tt.probe(5) == (4, LOWER, 50, (6, 4, 4, 4, ''))
+
+
+def test_tt_replacement():
+    tt = TranspositionTable(16)
+    other = 3 + tt.size
+    tt.store(3, 6, EXACT, 1, None)
+    tt.store(other, 2, EXACT, 2, None)  # 同一次搜尋裡較淺的結果不覆蓋
+    assert tt.probe(3) is not None and tt.probe(other) is None
+    tt.store(other, 6, EXACT, 2, None)
+    assert tt.probe(other) is not None and tt.probe(3) is None
+    tt.new_search()
+    tt.store(3, 1, EXACT, 3, None)  # 上一次搜尋留下的資料可以被覆蓋
+    assert tt.probe(3) == (1, EXACT, 3, None)
+    tt.clear()
+    assert tt.probe(3) is None and tt.hashfull() == 0
+
+
+@pytest.mark.parametrize('score', [MATE_SCORE - 3, -(MATE_SCORE - 5), 250, -MATE_BOUND + 1])
+def test_mate_scores_relative_to_node(score):
+    assert score_from_tt(score_to_tt(score, 7), 7) == score
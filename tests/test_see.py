@@ -0,0 +1,54 @@
+# 吃子評估：MVV-LVA 的排序與 SEE 的交換結果（包含 x-ray、國王吃回與 en passant）。
+import pytest
+
+from engine.see import SEE_VALUES, capture_value, is_losing_capture, mvv_lva, see
+from position import create_position, uci_to_move
+
+P, N, B, R, Q = (SEE_VALUES[piece] for piece in 'PNBRQ')
+
+
+@pytest.mark.parametrize('fen, uci, expected', [
+    # 沒有保護的子直接吃到
+    ("4k3/8/8/3r4/8/8/8/3RK3 w - - 0 1", 'd1d5', R),
+    # 兵保護的城堡：城堡換城堡
+    ("4k3/8/4p3/3r4/8/8/8/3RK3 w - - 0 1", 'd1d5', 0),
+    # 皇后去吃有保護的兵：吃虧
+    ("4k3/8/2p5/3p4/8/8/8/3QK3 w - - 0 1", 'd1d5', P - Q),
+    # 後面的城堡 x-ray 補上：Rxd5 Rxd5 Rxd5，白方淨得一兵
+    ("3rk3/8/8/3p4/8/8/3R4/3RK3 w - - 0 1", 'd2d5', P),
+    # 主教在皇后後面同一條斜線上也會補上
+    ("4k3/8/4p3/3n4/8/1B6/Q7/4K3 w - - 0 1", 'b3d5', N - B + P),
+    # 國王不能吃回有保護的格子
+    ("8/8/4k3/3p4/8/4N3/8/3RK3 w - - 0 1", 'd1d5', P),
+    ("8/8/4k3/3p4/8/8/8/3RK3 w - - 0 1", 'd1d5', P - R),
+    # en passant：被吃的兵不在目標格上
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", 'e5d6', P),
+    # 升變算進交換
+    ("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1", 'a7b8q', R + Q - P),
+])
+def test_see(fen, uci, expected):
+    position = create_position(fen=fen)
+    move = uci_to_move(uci)
+    assert move in position.legal_moves()
+    assert see(position, move) == expected
+    assert is_losing_capture(position, move) == (expected < 0)
+
+
+def test_see_does_not_change_position():
+    position = create_position(fen="3rk3/8/8/3p4/8/8/3R4/3RK3 w - - 0 1")
+    fen = position.fen()
+    see(position, uci_to_move('d2d5'))
+    assert position.fen() == fen
+
+
+def test_capture_value():
+    position = create_position(fen="4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1")
+    assert capture_value(position.board, uci_to_move('e5d6')) == P
+    assert capture_value(position.board, uci_to_move('e5e6')) == 0
+
+
+def test_mvv_lva_order():
+    # 先吃最值錢的，同樣的目標用最便宜的子去吃
+    board = create_position(fen="4k3/8/8/1q1r4/2P5/4N3/8/4K3 w - - 0 1").board
+    pawn_takes_queen, pawn_takes_rook, knight_takes_rook = (uci_to_move(uci) for uci in ('c4b5', 'c4d5', 'e3d5'))
+    assert mvv_lva(board, pawn_takes_queen) > mvv_lva(board, pawn_takes_rook) > mvv_lva(board, knight_takes_rook)
@@ -0,0 +1,127 @@
+# 對弈伺服器：每個請求（包括出錯的）都要收到一行回覆，並帶回同一個 id。
+# 用執行緒池代替行程池，測試時不必啟動子行程。
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import server
+
+
+def exchange(requests):
+    """
+    啟動伺服器，在同一條連線上依序送出 requests（dict 或原始 bytes），回傳 (回覆列表, GameServer)。
+    """
+    async def run():
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            game_server = server.GameServer(pool)
+            listener = await asyncio.start_server(game_server.handle_connection, '127.0.0.1', 0,
+                                                  limit=server.MAX_LINE)
+            port = listener.sockets[0].getsockname()[1]
+            async with listener:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                replies = []
+                for request in requests:
+                    line = request if isinstance(request, bytes) else json.dumps(request).encode() + b'\n'
+                    writer.write(line)
+                    await writer.drain()
+                    replies.append(json.loads(await asyncio.wait_for(reader.readline(), 10)))
+                writer.close()
+                await writer.wait_closed()
+            return replies, game_server
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('request_line, error', [
+    (b'not json\n', 'Expecting value'),
+    (b'[1, 2]\n', 'JSON object'),
+    ({'id': 1, 'op': 'fly'}, 'unknown op'),
+    ({'id': 2, 'op': 'state', 'game': 99}, 'unknown game'),
+    ({'id': 3, 'op': 'new', 'fen': 'bad'}, 'Invalid FEN'),
+    ({'id': 4, 'op': 'new', 'fen': 42}, 'fen must be a string'),
+    ({'id': 5, 'op': 'new', 'engine': 'red'}, 'engine must be'),
+    ({'id': 6, 'op': 'new', 'depth': 0}, 'depth'),
+    ({'id': 7, 'op': 'new', 'depth': '3'}, 'depth'),
+    ({'id': 8, 'op': 'new', 'depth': True}, 'depth'),
+    ({'id': 9, 'op': 'new', 'movetime': -1}, 'movetime'),
+    ({'id': 10, 'op': 'new', 'movetime': 'fast'}, 'movetime'),
+])
+def test_error_replies(request_line, error):
+    (reply,), game_server = exchange([request_line])
+    assert reply['ok'] is False
+    assert error in reply['error']
+    if isinstance(request_line, dict):
+        assert reply['id'] == request_line['id']
+    assert game_server.games == {}
+
+
+def test_game_errors():
+    replies, _ = exchange([
+        {'id': 'a', 'op': 'new', 'fen': '6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1'},
+        {'id': 'b', 'op': 'move', 'game': 1},
+        {'id': 'c', 'op': 'move', 'game': 1, 'move': 'e2e4'},
+        {'id': 'd', 'op': 'move', 'game': 1, 'move': 'Qh7'},
+        {'id': 'e', 'op': 'move', 'game': 1, 'move': 'Ra8'},
+        {'id': 'f', 'op': 'move', 'game': 1, 'move': 'Kg7'},
+        {'id': 'g', 'op': 'close', 'game': 1},
+        {'id': 'h', 'op': 'state', 'game': 1},
+    ])
+    new, missing, illegal, bad_san, mate, over, close, gone = replies
+    assert new['ok'] and new['game'] == 1 and new['id'] == 'a'
+    assert not missing['ok'] and 'missing field' in missing['error'] and missing['id'] == 'b'
+    assert not illegal['ok'] and 'Illegal move' in illegal['error']
+    assert not bad_san['ok'] and 'SAN' in bad_san['error']
+    assert mate['ok'] and mate['san'] == 'Ra8#' and mate['result'] == '1-0'
+    assert not over['ok'] and 'game is over' in over['error']
+    assert close == {'ok': True, 'game': 1, 'id': 'g'}
+    assert not gone['ok'] and 'unknown game' in gone['error']
+
+
+def test_engine_turn():
+    replies, _ = exchange([
+        {'id': 1, 'op': 'new', 'engine': 'white', 'depth': 1},
+        {'id': 2, 'op': 'move', 'game': 1, 'move': 'e7e5'},
+    ])
+    new, reply = replies
+    assert new['ok'] and new['moves'] == 1 and new['turn'] == 'black'
+    assert reply['ok'] and reply['moves'] == 3 and reply['turn'] == 'black'
+
+
+def test_failed_engine_turn_is_not_registered(monkeypatch):
+    def broken(task):
+        raise RuntimeError("engine crashed")
+
+    monkeypatch.setattr(server, 'advance', broken)
+    replies, game_server = exchange([
+        {'id': 1, 'op': 'new', 'engine': 'white'},
+        {'id': 2, 'op': 'stats'},
+    ])
+    assert replies[0] == {'ok': False, 'error': 'engine crashed', 'id': 1}
+    assert replies[1]['games'] == 0
+    assert game_server.games == {}
+
+
+def test_limits_are_capped():
+    session = server.GameSession(1, server.STARTING_FEN, 'white', depth=server.MAX_DEPTH)
+    assert session.limits == (server.MAX_DEPTH, server.MAX_MOVETIME)
+    session = server.GameSession(2, server.STARTING_FEN, 'white', movetime=60)
+    assert session.limits == (None, server.MAX_MOVETIME)
+
+
+def test_sigterm_releases_port():
+    # loadtest.py --spawn 以 SIGTERM 結束伺服器；行程池要跟著關閉，連接埠馬上可以再用
+    import socket
+
+    import loadtest
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    for _ in range(2):
+        process = loadtest.spawn_server(port, 1)
+        process.terminate()
+        assert process.wait(timeout=10) == 0
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', port))
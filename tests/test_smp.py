@@ -0,0 +1,123 @@
+# Lazy SMP：共用記憶體置換表的編碼與驗證、節點預算的分配，以及轉送主執行者每一層的 info。
+import io
+
+import pytest
+
+from engine.smp import (HEADER_WORDS, LazySMP, SharedTranspositionTable, pack_entry, pack_move, unpack_entry,
+                        unpack_move)
+from engine.tt import EXACT, LOWER, UPPER
+from position import STARTING_FEN, create_position
+from uci import UciEngine
+
+
+@pytest.fixture
+def table():
+    tt = SharedTranspositionTable(64)
+    yield tt
+    tt.close()
+
+
+def test_move_codes():
+    assert unpack_move(pack_move(None)) is None
+    for move in create_position().legal_moves() + [(1, 0, 0, 1, 'Q'), (6, 7, 7, 7, 'N')]:
+        assert unpack_move(pack_move(move)) == move
+
+
+@pytest.mark.parametrize('depth, bound, score, move, age', [
+    (0, EXACT, 0, None, 0),
+    (12, LOWER, -99990, (6, 4, 4, 4, ''), 255),
+    (255, UPPER, 99990, (1, 0, 0, 1, 'Q'), 7),
+])
+def test_entry_round_trip(depth, bound, score, move, age):
+    assert unpack_entry(pack_entry(depth, bound, score, move, age)) == (depth, bound, score, move, age)
+
+
+def test_store_and_probe(table):
+    move = (6, 4, 4, 4, '')
+    table.store(5, 3, EXACT, 42, move)
+    assert table.probe(5) == (3, EXACT, 42, move)
+    assert table.probe(5 + table.size) is None
+    table.store(5, 4, LOWER, 50, None)
+    assert table.probe(5) == (4, LOWER, 50, move)
+
+
+def test_torn_entry_is_ignored(table):
+    table.store(9, 3, EXACT, 42, None)
+    slot = HEADER_WORDS + 2 * (9 & table.mask)
+    table.words[slot + 1] ^= 1 << 20  # 模擬另一個行程只寫了一半
+    assert table.probe(9) is None
+
+
+def test_other_process_view(table):
+    # 以 name 連上同一塊記憶體，看得到彼此寫入的資料與停止旗標
+    other = SharedTranspositionTable(64, name=table.name)
+    try:
+        table.store(11, 2, UPPER, -5, None)
+        assert other.probe(11) == (2, UPPER, -5, None)
+        table.set_stop()
+        assert other.is_set()
+        table.set_stop(False)
+        table.new_search()
+        other.new_search()
+        assert other.age == table.age == 1
+    finally:
+        other.close()
+
+
+def test_clear_keeps_header(table):
+    table.set_stop()
+    table.store(3, 1, EXACT, 0, None)
+    table.clear()
+    assert table.probe(3) is None
+    assert table.is_set()
+    assert table.hashfull() == 0
+
+
+@pytest.fixture(scope='module')
+def smp():
+    with LazySMP(2, 1 << 14) as smp:
+        yield smp
+
+
+def test_search(smp):
+    position = create_position(fen="6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    result = smp.search(position, depth=3)
+    assert result.best_move == (7, 0, 0, 0, '')
+    assert position.fen() == "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"
+
+
+def test_keeps_move_history(smp):
+    # 子行程從起始局面重播走法，重複局面的紀錄不會遺失
+    position = create_position(fen=STARTING_FEN)
+    for move in ((7, 6, 5, 5, ''), (0, 6, 2, 5, ''), (5, 5, 7, 6, ''), (2, 5, 0, 6, '')):
+        position.make_move(move)
+    result = smp.search(position, depth=2)
+    assert result.best_move in position.legal_moves()
+    assert len(position.move_history) == 4
+
+
+def test_node_budget_is_shared(smp):
+    info = []
+    result = smp.search(create_position(), nodes=20000, info=info.append)
+    # 每個行程分到一半；檢查間隔是 1024 個節點，所以每個行程最多多出一個間隔
+    assert result.nodes <= 20000 + 2 * 1024
+    # 主執行者每完成一層轉送一次，最後再加上合併的結果
+    assert [r.depth for r in info[:-1]] == list(range(1, len(info)))
+    assert info[-1] is not info[-2] and info[-1].nodes == result.nodes
+
+
+def test_uci_threads():
+    out = io.StringIO()
+    engine = UciEngine(out=out)
+    try:
+        for line in ('setoption name Threads value 2', 'position startpos', 'go nodes 20000'):
+            engine.handle(line)
+        engine._thread.join(timeout=60)
+    finally:
+        engine.handle('quit')
+        engine.stop()
+        engine.smp.close()
+    output = out.getvalue().splitlines()
+    depths = [int(line.split()[2]) for line in output if line.startswith('info depth')]
+    assert depths[:-1] == list(range(1, len(depths)))
+    assert output[-1].startswith('bestmove ')
@@ -0,0 +1,94 @@
+# 殘局庫：產生 KQK、KRK 後檢查已知的最長將死距離、幾個固定局面，以及表內數值的前後一致。
+import io
+import random
+
+import pytest
+
+from position import create_position, move_to_san
+from tablebase import Tablebases, _longest_mate, generate_all
+
+
+@pytest.fixture(scope='module')
+def directory(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('tablebases')
+    generate_all(['KQK', 'KRK'], str(directory), out=io.StringIO())
+    return directory
+
+
+@pytest.fixture
+def tablebases(directory):
+    with Tablebases(str(directory)) as tablebases:
+        yield tablebases
+
+
+@pytest.mark.parametrize('name, plies', [('KQK', 19), ('KRK', 31)])
+def test_longest_mate(directory, name, plies):
+    assert _longest_mate(directory / f"{name}.tb") == plies
+
+
+@pytest.mark.parametrize('fen, outcome, san', [
+    ("k7/8/1K6/8/8/8/7Q/8 w - - 0 1", (1, 1), 'Qh8#'),
+    ("k7/8/K7/8/8/8/8/7R w - - 0 1", (1, 1), 'Rh8#'),
+    ("k6Q/8/1K6/8/8/8/8/8 b - - 0 1", (-1, 0), None),
+    ("8/8/8/8/8/8/8/kQK5 b - - 0 1", (-1, 0), None),
+    ("8/8/8/8/8/8/8/K1k4r w - - 0 1", (-1, 4), 'Ka2'),
+    ("8/8/8/8/3k4/8/8/K7 w - - 0 1", (0, 0), None),
+])
+def test_known_positions(tablebases, fen, outcome, san):
+    position = create_position(fen=fen)
+    assert tablebases.probe(position) == outcome
+    if san is not None:
+        assert move_to_san(position, tablebases.best_move(position)) == san
+
+
+def test_draw_when_rook_hangs(tablebases):
+    # 黑方國王吃掉沒有保護的城堡
+    position = create_position(fen="8/8/8/8/8/8/1kR5/7K b - - 0 1")
+    assert tablebases.probe(position) == (0, 0)
+
+
+def test_out_of_range(tablebases):
+    assert tablebases.probe(create_position()) is None
+    assert tablebases.probe(create_position(fen="4k3/8/8/8/8/8/8/R3K3 w Q - 0 1")) is None
+
+
+def _random_fen(rng, white):
+    while True:
+        squares = rng.sample(range(64), 3)
+        board = [[''] * 8 for _ in range(8)]
+        for piece, square in zip(('K', 'k', white), squares):
+            board[square // 8][square % 8] = piece
+        rows = []
+        for row in board:
+            text = ''.join(piece or '1' for piece in row)
+            for run in range(8, 1, -1):
+                text = text.replace('1' * run, str(run))
+            rows.append(text)
+        fen = f"{'/'.join(rows)} {rng.choice('wb')} - - 0 1"
+        try:
+            return create_position(fen=fen)
+        except ValueError:
+            continue
+
+
+@pytest.mark.parametrize('white', ['Q', 'R'])
+def test_consistent_with_children(tablebases, white):
+    # 子局面是對手的觀點：勝局最快的一步剛好走到「對手負，少一個半步」；
+    # 負局每一步都走到對手的勝局，最慢的剛好少一個半步；和局沒有走到對手負的走法（逼和沒有走法）
+    rng = random.Random(white)
+    for _ in range(200):
+        position = _random_fen(rng, white)
+        result, plies = tablebases.probe(position)
+        children = []
+        for move in position.legal_moves():
+            position.make_move(move)
+            children.append(tablebases.probe(position))
+            position.unmake_move()
+        if result > 0:
+            assert min(child[1] for child in children if child[0] < 0) == plies - 1
+        elif result < 0 and children:
+            assert all(child[0] > 0 for child in children)
+            assert max(child[1] for child in children) == plies - 1
+        elif result == 0:
+            assert all(child[0] >= 0 for child in children)
+            assert not children or any(child[0] == 0 for child in children)
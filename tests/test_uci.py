@@ -0,0 +1,83 @@
+# UCI 前端：指令的回應，以及介面送來有誤的數值時只回報、不結束引擎。
+import io
+
+import pytest
+
+from uci import UciEngine, format_score, parse_go
+
+
+def run(lines):
+    """
+    依序處理 lines，每個 go 都等搜尋自己結束再處理下一行；回傳輸出的每一行。
+    """
+    out = io.StringIO()
+    engine = UciEngine(out=out)
+    try:
+        for line in lines:
+            assert engine.handle(line)
+            if engine._thread is not None:
+                engine._thread.join(timeout=60)
+    finally:
+        engine.handle('quit')
+        engine.stop()
+        if engine.smp is not None:
+            engine.smp.close()
+    return out.getvalue().splitlines()
+
+
+def test_handshake():
+    output = run(['uci', 'isready'])
+    assert output[0].startswith('id name')
+    assert output[-2:] == ['uciok', 'readyok']
+    assert any(line.startswith('option name Threads') for line in output)
+
+
+def test_go_depth():
+    output = run(['position startpos moves e2e4 e7e5', 'go depth 2'])
+    assert [line.split()[2] for line in output if line.startswith('info depth')] == ['1', '2']
+    assert output[-1].startswith('bestmove ')
+
+
+def test_mate_in_one():
+    output = run(['position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1', 'go depth 3'])
+    assert output[-1] == 'bestmove a1a8'
+    assert 'score mate 1' in output[-2]
+
+
+def test_bad_position():
+    output = run(['position startpos moves e2e4 e2e4', 'position fen bad', 'go depth 1'])
+    assert output[0] == 'info string illegal move: e2e4'
+    assert output[1].startswith('info string Invalid FEN')
+    assert output[-1].startswith('bestmove ')
+
+
+@pytest.mark.parametrize('line, message', [
+    ('go depth x', 'invalid value for depth: x'),
+    ('go wtime 1000 winc fast', 'invalid value for winc: fast'),
+    ('go movetime 1.5', 'invalid value for movetime: 1.5'),
+    ('setoption name Hash value big', 'invalid value for hash: big'),
+    ('setoption name Threads value two', 'invalid value for threads: two'),
+])
+def test_invalid_values_are_ignored(line, message):
+    # 有誤的指令被忽略，之後的指令照常處理
+    output = run([line, 'isready', 'go depth 1'])
+    assert output[0] == f'info string {message}'
+    assert output[1] == 'readyok'
+    assert output[-1].startswith('bestmove ')
+
+
+def test_unknown_input():
+    assert run(['xyzzy', 'setoption name Colour value red']) == [
+        'info string unknown command: xyzzy', 'info string unknown option: colour']
+
+
+def test_parse_go():
+    assert parse_go(['depth', '6', 'wtime', '60000', 'infinite']) == {'depth': 6, 'wtime': 60000, 'infinite': True}
+    with pytest.raises(ValueError):
+        parse_go(['nodes', '1e6'])
+
+
+@pytest.mark.parametrize('score, text', [(35, 'cp 35'), (-120, 'cp -120')])
+def test_format_score(score, text):
+    assert format_score(score) == text
+
@@ -0,0 +1,312 @@
+# 自我對弈賽：讓不同設定的引擎在多個行程裡互相對戰，用來確認改動是不是真的下得更好。
+# 每個開局各下兩盤（交換先後手），結束的棋局依完成順序寫進 PGN，
+# 並統計勝和負、Elo 差距；指定 --sprt 時以 SPRT 檢定，結論一出來就提早停止。
+# 用法：
+#   python tournament.py -e name=new,depth=3 -e name=old,depth=2 --openings suite.epd --rounds 50 --pgn out.pgn
+#   python tournament.py -e name=a,movetime=0.1 -e name=b,movetime=0.05 --sprt --elo0 0 --elo1 20 -j 4
+import argparse
+import datetime
+import math
+import sys
+import time
+
+from engine import Searcher, TranspositionTable
+from engine.worker import analyse
+from pgn import Game, read_pgn, write_game
+from position import BACKENDS, STARTING_FEN, create_position
+from workers import PositionPool, fen_of, read_fens
+
+# 引擎設定可用的欄位與型別；hash 是置換表的項目數
+ENGINE_OPTIONS = {'name': str, 'depth': int, 'movetime': float, 'nodes': int, 'hash': int}
+DEFAULT_MAX_PLIES = 600
+
+
+def parse_engine(spec):
+    """
+    'name=new,depth=3,movetime=0.1' 轉成設定 dict；沒有指定 depth、movetime、nodes 時預設每步 0.1 秒。
+    """
+    config = {}
+    for item in spec.split(','):
+        key, sep, value = item.partition('=')
+        key = key.strip()
+        if not sep or key not in ENGINE_OPTIONS:
+            raise ValueError(f"Invalid engine option: {item!r} (expected one of {', '.join(ENGINE_OPTIONS)})")
+        config[key] = ENGINE_OPTIONS[key](value.strip())
+    if not any(limit in config for limit in ('depth', 'movetime', 'nodes')):
+        config['movetime'] = 0.1
+    config.setdefault('name', spec)
+    return config
+
+
+def load_openings(path, plies=8):
+    """
+    讀取開局：PGN 檔取每盤的前 plies 半步，其他檔案視為一行一個 FEN / EPD。
+    回傳 [(起始 FEN, 走法列表), ...]；沒有給檔案時只有初始局面。
+    """
+    if path is None:
+        return [(STARTING_FEN, [])]
+    if path.lower().endswith('.pgn'):
+        return [(game.fen, game.moves[:plies]) for game in read_pgn(path) if not game.error]
+    return [(fen_of(line), []) for line in read_fens(path)]
+
+
+# 子行程裡的 Searcher，依 (設定, 顏色) 重複使用，省下每盤重新配置置換表
+_SEARCHERS = {}
+
+
+def _searcher(config, color):
+    key = (tuple(sorted(config.items())), color)
+    searcher = _SEARCHERS.get(key)
+    if searcher is None:
+        tt = TranspositionTable(config['hash']) if 'hash' in config else None
+        searcher = _SEARCHERS[key] = Searcher(tt)
+    return searcher
+
+
+def play_game(task):
+    """
+    子行程執行的工作：task = (棋局編號, 起始 FEN, 開局走法, 白方設定, 黑方設定, 後端, 最多半步數)。
+    套用將死、逼和、50 步與三次重複的規則下完一盤，回傳 dict（走法包含開局走法）。
+    """
+    number, fen, opening, white, black, backend, max_plies = task
+    position = create_position(backend, fen=fen)
+    moves = list(opening)
+    for move in moves:
+        position.make_move(move)
+    configs = {'white': white, 'black': black}
+    searchers = {}
+    for color, config in configs.items():
+        searchers[color] = _searcher(config, color)
+        searchers[color].tt.clear()
+
+    start = time.perf_counter()
+    while True:
+        status = analyse(position)
+        if status['checkmate']:
+            result = '0-1' if position.turn == 'white' else '1-0'
+            termination = 'checkmate'
+            break
+        if status['stalemate']:
+            result, termination = '1/2-1/2', 'stalemate'
+            break
+        if status['fifty_move']:
+            result, termination = '1/2-1/2', 'fifty-move rule'
+            break
+        if status['threefold']:
+            result, termination = '1/2-1/2', 'threefold repetition'
+            break
+        if max_plies and len(moves) >= max_plies:
+            result, termination = '1/2-1/2', 'adjudication'
+            break
+        config = configs[position.turn]
+        found = searchers[position.turn].search(position, depth=config.get('depth'),
+                                                movetime=config.get('movetime'), nodes=config.get('nodes'))
+        position.make_move(found.best_move)
+        moves.append(found.best_move)
+    return {
+        'number': number,
+        'fen': fen,
+        'moves': moves,
+        'white': white['name'],
+        'black': black['name'],
+        'result': result,
+        'termination': termination,
+        'time': time.perf_counter() - start,
+    }
+
+
+def expected_score(elo):
+    return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+
+def elo_difference(score):
+    """
+    得分率（0 到 1）轉成 Elo 差距；全勝或全敗時為正負無限大。
+    """
+    if score <= 0.0:
+        return -math.inf
+    if score >= 1.0:
+        return math.inf
+    return -400.0 * math.log10(1.0 / score - 1.0)
+
+
+class Score:
+    """
+    一對引擎的戰績（以第一個引擎的觀點）：勝、和、負，以及 Elo 與 SPRT 統計。
+    """
+
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+        self.wins = self.draws = self.losses = 0
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def add(self, game):
+        if game['result'] == '1/2-1/2':
+            self.draws += 1
+        elif (game['result'] == '1-0') == (game['white'] == self.first):
+            self.wins += 1
+        else:
+            self.losses += 1
+
+    def ratio(self):
+        return (self.wins + 0.5 * self.draws) / self.games if self.games else 0.5
+
+    def _variance(self):
+        # 單盤得分的變異數（勝 1、和 0.5、負 0 的三項分布）
+        s = self.ratio()
+        n = self.games
+        return (self.wins * (1 - s) ** 2 + self.draws * (0.5 - s) ** 2 + self.losses * s ** 2) / n
+
+    def elo(self):
+        """
+        回傳 (Elo 差距, 95% 信賴區間的半寬)。
+        """
+        s = self.ratio()
+        if not self.games:
+            return 0.0, math.inf
+        margin = 1.96 * math.sqrt(self._variance() / self.games)
+        low = elo_difference(s - margin)
+        high = elo_difference(s + margin)
+        margin = (high - low) / 2
+        # 全勝或全敗時兩端都是無限大
+        return elo_difference(s), margin if not math.isnan(margin) else math.inf
+
+    def llr(self, elo0, elo1):
+        """
+        SPRT 的對數概似比（常態近似）：H0 為 Elo 差距 elo0，H1 為 elo1。
+        """
+        if not self.games or not self.wins + self.losses:
+            return 0.0
+        variance = self._variance()
+        if variance <= 0:
+            return 0.0
+        s0 = expected_score(elo0)
+        s1 = expected_score(elo1)
+        return (s1 - s0) * (2 * self.ratio() - s0 - s1) * self.games / (2 * variance)
+
+    def __str__(self):
+        elo, margin = self.elo()
+        return (f"{self.first} vs {self.second}: +{self.wins} ={self.draws} -{self.losses} "
+                f"({100 * self.ratio():.1f}%), Elo {elo:+.1f} +/- {margin:.1f}")
+
+
+def sprt_bounds(alpha, beta):
+    """
+    SPRT 的上下界：LLR 低於下界接受 H0，高於上界接受 H1。
+    """
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def schedule(engines, openings, rounds, backend='list', max_plies=DEFAULT_MAX_PLIES):
+    """
+    循環賽的對局列表：每一對引擎、每個開局、每一輪各下兩盤，先後手交換。
+    """
+    tasks = []
+    for _ in range(rounds):
+        for fen, moves in openings:
+            for i in range(len(engines)):
+                for j in range(i + 1, len(engines)):
+                    for white, black in ((engines[i], engines[j]), (engines[j], engines[i])):
+                        tasks.append((len(tasks) + 1, fen, moves, white, black, backend, max_plies))
+    return tasks
+
+
+def run_tournament(engines, tasks, pool=None, pgn_out=None, sprt=None, out=sys.stdout):
+    """
+    執行對局並依完成順序輸出結果，回傳 {(引擎 1, 引擎 2): Score}。
+    sprt = (elo0, elo1, alpha, beta) 時只能有兩個引擎，LLR 超出邊界就停止（剩下的對局取消）。
+    """
+    names = [engine['name'] for engine in engines]
+    scores = {(names[i], names[j]): Score(names[i], names[j])
+              for i in range(len(names)) for j in range(i + 1, len(names))}
+    if sprt is not None:
+        if len(engines) != 2:
+            raise ValueError("SPRT needs exactly two engines")
+        lower, upper = sprt_bounds(sprt[2], sprt[3])
+    date = datetime.date.today().strftime('%Y.%m.%d')
+    start = time.perf_counter()
+    if pool is not None:
+        results = (result for _, result in pool.run_unordered(play_game, tasks))
+    else:
+        results = map(play_game, tasks)
+
+    for finished, game in enumerate(results, 1):
+        pair = (game['white'], game['black']) if (game['white'], game['black']) in scores else \
+            (game['black'], game['white'])
+        score = scores[pair]
+        score.add(game)
+        if pgn_out is not None:
+            headers = {'Event': 'Self-play tournament', 'Site': '?', 'Date': date,
+                       'Round': str(game['number']), 'White': game['white'], 'Black': game['black'],
+                       'Result': game['result'], 'Termination': game['termination']}
+            if game['fen'] != STARTING_FEN:
+                headers['SetUp'] = '1'
+                headers['FEN'] = game['fen']
+            write_game(pgn_out, Game(headers, game['moves']))
+            pgn_out.flush()
+        line = (f"game {finished}/{len(tasks)}: {game['white']} - {game['black']} {game['result']} "
+                f"({game['termination']}, {len(game['moves'])} plies)  {score}")
+        if sprt is not None:
+            llr = score.llr(sprt[0], sprt[1])
+            line += f", LLR {llr:.2f} [{lower:.2f}, {upper:.2f}]"
+            if llr <= lower or llr >= upper:
+                print(line, file=out)
+                print(f"SPRT: {'H1' if llr >= upper else 'H0'} accepted "
+                      f"(elo0 {sprt[0]}, elo1 {sprt[1]}) after {finished} games", file=out)
+                break
+        print(line, file=out)
+
+    elapsed = time.perf_counter() - start
+    for score in scores.values():
+        print(score, file=out)
+    played = sum(score.games for score in scores.values())
+    rate = played / elapsed * 60 if elapsed > 0 else 0
+    print(f"{played} games in {elapsed:.1f}s ({rate:.1f} games/min)", file=out)
+    return scores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play engine configurations against each other")
+    parser.add_argument('-e', '--engine', action='append', required=True, type=parse_engine,
+                        help="engine options, e.g. name=new,depth=3 or name=old,movetime=0.05,hash=65536")
+    parser.add_argument('--openings', help="opening suite: FEN/EPD file, or PGN (first --opening-plies plies)")
+    parser.add_argument('--opening-plies', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=1, help="times each opening is played (both colours)")
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES,
+                        help="adjudicate a draw after this many plies (0 = never)")
+    parser.add_argument('--pgn', help="append finished games to this PGN file")
+    parser.add_argument('-b', '--backend', choices=BACKENDS, default='list')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help="worker processes (0 = all cores)")
+    parser.add_argument('--sprt', action='store_true', help="stop early when the SPRT reaches a decision")
+    parser.add_argument('--elo0', type=float, default=0.0)
+    parser.add_argument('--elo1', type=float, default=10.0)
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    if len(args.engine) < 2:
+        parser.error("at least two engines are needed")
+    if len({engine['name'] for engine in args.engine}) != len(args.engine):
+        parser.error("engine names must be unique")
+    if args.sprt and len(args.engine) != 2:
+        parser.error("--sprt needs exactly two engines")
+
+    tasks = schedule(args.engine, load_openings(args.openings, args.opening_plies), args.rounds,
+                     args.backend, args.max_plies)
+    sprt = (args.elo0, args.elo1, args.alpha, args.beta) if args.sprt else None
+    pgn_out = open(args.pgn, 'a', encoding='utf-8') if args.pgn else None
+    try:
+        with PositionPool(args.jobs or None) as pool:
+            run_tournament(args.engine, tasks, pool, pgn_out, sprt)
+    finally:
+        if pgn_out is not None:
+            pgn_out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+# UCI（Universal Chess Interface）前端：從 stdin 讀指令、往 stdout 寫回應，
+# 讓一般的西洋棋介面與對戰工具可以直接使用本專案的規則與引擎。
+# 搜尋在背景執行緒進行，主執行緒持續讀指令，所以 stop 會立刻生效。
+# 這個檔案（以及它 import 的模組）不可以 import tkinter，啟動才會快。
+# 用法：
+#   python uci.py
+import sys
+import threading
+
+from engine import Searcher, TranspositionTable
+from engine.tt import MATE_SCORE, MATE_BOUND
+from position import STARTING_FEN, create_position, move_to_uci, uci_to_move
+
+ENGINE_NAME = "Chess_Final_Project"
+ENGINE_AUTHOR = "Shiro-coding"
+DEFAULT_HASH = 16  # MB
+MAX_HASH = 1024
+MAX_THREADS = 64
+# 置換表每一格大約佔用的記憶體（tuple 本身加上 list 的指標），用來把 MB 換算成格數
+ENTRY_BYTES = 128
+# 多行程共用的置換表每格固定 16 bytes（見 engine/smp.py）
+SHARED_ENTRY_BYTES = 16
+# 沒有 movestogo 時假設還要下幾步
+DEFAULT_MOVES_TO_GO = 30
+# 留給介面與通訊的時間（秒）
+MOVE_OVERHEAD = 0.05
+
+
+def hash_entries(megabytes, entry_bytes=ENTRY_BYTES):
+    return max(1, megabytes * 1024 * 1024 // entry_bytes)
+
+
+def allocate_time(remaining, increment=0.0, moves_to_go=None):
+    """
+    依剩餘時間（秒）分配這一步的思考時間，最多用掉剩餘時間的一半。
+    """
+    budget = remaining / (moves_to_go or DEFAULT_MOVES_TO_GO) + increment * 0.8
+    return max(0.01, min(budget, remaining / 2 - MOVE_OVERHEAD))
+
+
+def format_score(score):
+    """
+    搜尋分數轉成 UCI 的 'cp <分>' 或 'mate <步數>'（負數表示被將死）。
+    """
+    if score >= MATE_BOUND:
+        return f"mate {(MATE_SCORE - score + 1) // 2}"
+    if score <= -MATE_BOUND:
+        return f"mate -{(MATE_SCORE + score) // 2}"
+    return f"cp {score}"
+
+
+def _parse_int(name, text):
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f"invalid value for {name}: {text}") from None
+
+
+def parse_go(tokens):
+    """
+    'go' 後面的參數轉成 dict，例如 ['depth', '6', 'wtime', '60000'] -> {'depth': 6, 'wtime': 60000}。
+    數值不是整數時拋出 ValueError。
+    """
+    options = {}
+    numeric = ('depth', 'nodes', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo', 'mate')
+    i = 0
+    while i < len(tokens):
+        name = tokens[i]
+        if name in numeric and i + 1 < len(tokens):
+            options[name] = _parse_int(name, tokens[i + 1])
+            i += 2
+        else:
+            if name in ('infinite', 'ponder'):
+                options[name] = True
+            i += 1
+    return options
+
+
+class UciEngine:
+    """
+    UCI 指令的處理者。handle() 處理一行指令，輸出都經過 send()。
+    """
+
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.hash_mb = DEFAULT_HASH
+        self.threads = 1
+        self.searcher = Searcher(TranspositionTable(hash_entries(self.hash_mb)))
+        self.smp = None  # Threads > 1 時的 engine.smp.LazySMP
+        self.position = create_position()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._infinite = False
+        self._lock = threading.Lock()
+
+    def send(self, line):
+        # 搜尋執行緒與主執行緒都會輸出，一次只寫一行
+        with self._lock:
+            self.out.write(line + '\n')
+            self.out.flush()
+
+    def run(self, stream=sys.stdin):
+        for line in stream:
+            if not self.handle(line):
+                break
+        self.stop()
+        if self.smp is not None:
+            self.smp.close()
+
+    def handle(self, line):
+        """
+        處理一行指令；收到 quit 時回傳 False。
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH} min 1 max {MAX_HASH}")
+            self.send(f"option name Threads type spin default 1 min 1 max {MAX_THREADS}")
+            self.send("option name TablebasePath type string default <empty>")
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'ucinewgame':
+            self.stop()
+            self.searcher.tt.clear()
+            if self.smp is not None:
+                self.smp.tt.clear()
+        elif command == 'position':
+            self.stop()
+            self.set_position(args)
+        elif command == 'go':
+            # 介面送來的數值有誤時回報並忽略這個指令，不能讓整個引擎結束
+            try:
+                options = parse_go(args)
+            except ValueError as e:
+                self.send(f"info string {e}")
+                return True
+            self.go(options)
+        elif command == 'stop':
+            self.stop()
+        elif command == 'ponderhit':
+            pass
+        elif command == 'quit':
+            return False
+        else:
+            self.send(f"info string unknown command: {command}")
+        return True
+
+    def set_option(self, args):
+        # setoption name <名稱> [value <值>]，名稱與值都可能含有空白
+        text = ' '.join(args)
+        name, _, value = text.partition(' value ')
+        name = name.replace('name', '', 1).strip().lower()
+        value = value.strip()
+        if name in ('hash', 'threads'):
+            try:
+                number = _parse_int(name, value)
+            except ValueError as e:
+                self.send(f"info string {e}")
+                return
+        if name == 'hash':
+            self.stop()
+            self.hash_mb = max(1, min(MAX_HASH, number))
+            self.searcher.tt = TranspositionTable(hash_entries(self.hash_mb))
+            self._start_smp()
+        elif name == 'threads':
+            self.stop()
+            self.threads = max(1, min(MAX_THREADS, number))
+            self._start_smp()
+        elif name == 'tablebasepath':
+            self.stop()
+            if self.searcher.tablebases is not None:
+                self.searcher.tablebases.close()
+            if value and value != '<empty>':
+                # 殘局庫模組會載入位元棋盤與行程池，只在真的設定路徑時才 import，不拖慢啟動
+                from tablebase import Tablebases
+                self.searcher.tablebases = Tablebases(value)
+            else:
+                self.searcher.tablebases = None
+        else:
+            self.send(f"info string unknown option: {name}")
+
+    def _start_smp(self):
+        # 多行程搜尋（Lazy SMP）的行程池與共用置換表；Threads 為 1 時不需要
+        if self.smp is not None:
+            self.smp.close()
+            self.smp = None
+        if self.threads > 1:
+            # 只有真的使用多行程時才 import，不拖慢啟動
+            from engine.smp import LazySMP
+            self.smp = LazySMP(self.threads, hash_entries(self.hash_mb, SHARED_ENTRY_BYTES))
+
+    def set_position(self, args):
+        """
+        position startpos [moves ...] 或 position fen <FEN> [moves ...]。
+        """
+        moves = []
+        if 'moves' in args:
+            split = args.index('moves')
+            args, moves = args[:split], args[split + 1:]
+        if args and args[0] == 'fen':
+            fen = ' '.join(args[1:])
+        else:
+            fen = STARTING_FEN
+        try:
+            position = create_position(fen=fen)
+        except ValueError as e:
+            self.send(f"info string {e}")
+            return
+        for text in moves:
+            try:
+                move = uci_to_move(text)
+            except (ValueError, IndexError):
+                move = None
+            if move is None or move not in position.legal_moves():
+                self.send(f"info string illegal move: {text}")
+                break
+            position.make_move(move)
+        self.position = position
+
+    def go(self, options):
+        self.stop()
+        position = self.position
+        white = position.turn == 'white'
+        movetime = None
+        if 'movetime' in options:
+            movetime = options['movetime'] / 1000
+        elif ('wtime' if white else 'btime') in options:
+            remaining = options['wtime' if white else 'btime'] / 1000
+            increment = options.get('winc' if white else 'binc', 0) / 1000
+            movetime = allocate_time(remaining, increment, options.get('movestogo'))
+        depth = options.get('depth')
+        if 'mate' in options and depth is None:
+            depth = options['mate'] * 2
+        nodes = options.get('nodes')
+        # 沒有任何限制（或 go infinite）時一直搜尋到 stop
+        self._infinite = options.get('infinite', False) or not (movetime or depth or nodes)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._search, args=(position, depth, movetime, nodes),
+                                        name="uci-search", daemon=True)
+        self._thread.start()
+
+    def _search(self, position, depth, movetime, nodes):
+        engine = self.smp if self.smp is not None else self.searcher
+        result = engine.search(position, depth=depth, movetime=movetime, nodes=nodes,
+                               info=self._info, stop_event=self._stop_event)
+        if self._infinite:
+            # UCI 規定 infinite 模式要等到 stop 才能送出 bestmove
+            self._stop_event.wait()
+        move = result.best_move
+        self.send(f"bestmove {move_to_uci(move) if move is not None else '0000'}")
+
+    def _info(self, result):
+        elapsed = max(result.elapsed, 1e-6)
+        pv = ' '.join(move_to_uci(move) for move in result.pv)
+        self.send(f"info depth {result.depth} score {format_score(result.score)} nodes {result.nodes} "
+                  f"nps {int(result.nodes / elapsed)} time {int(result.elapsed * 1000)} "
+                  f"hashfull {(self.smp or self.searcher).tt.hashfull()} pv {pv}")
+
+    def stop(self):
+        """
+        停止正在進行的搜尋並等它送出 bestmove。
+        """
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+
+def main(argv=None):
+    UciEngine().run(sys.stdin)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# 共用的行程池：把局面以 FEN 字串（而不是 GUI 物件）送到子行程，
+# perft 的平行模式與「對整個 FEN 檔做分析」之類的批次工作都用這個池。
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def read_fens(path):
+    """
+    逐行讀出 FEN 檔中的局面，略過空行與 # 開頭的註解。
+    EPD 行也會原樣傳回，由呼叫者自行拆欄位。
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+def fen_of(line):
+    """
+    從 FEN 或 EPD 行取出局面部分（前四欄，加上有的話的半步數與回合數）。
+    """
+    fields = line.split()
+    fen = fields[:4]
+    for field in fields[4:6]:
+        if not field.isdigit():
+            break
+        fen.append(field)
+    return ' '.join(fen)
+
+
+class PositionPool:
+    """
+    包裝 ProcessPoolExecutor。同一個池可以重複用在多個批次工作，
+    省下每次重新啟動子行程（與重新 import 規則模組）的時間。
+    """
+
+    def __init__(self, jobs=None):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def submit(self, func, *args):
+        return self.executor.submit(func, *args)
+
+    def map(self, func, items, chunksize=1):
+        """
+        依照輸入順序回傳 func(item) 的結果。func 必須是模組層級的函式（可被 pickle）。
+        """
+        return self.executor.map(func, items, chunksize=chunksize)
+
+    def run_unordered(self, func, items):
+        """
+        依完成順序產生 (item, 結果)，適合工作量差異很大的任務。
+        """
+        futures = {self.executor.submit(func, item): item for item in items}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
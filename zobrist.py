@@ -0,0 +1,51 @@
+# Zobrist 雜湊：每個「棋子 x 格子」、執行權、castling 權與 en passant 檔各對應一個 64 位元亂數，
+# 局面的 key 就是所有成立項目的 XOR。走一步只需要 XOR 掉變動的幾項，不必重算整個棋盤。
+import random
+
+# 固定種子，讓每次執行（以及不同行程之間）得到相同的 key
+_rng = random.Random(0x5EED_C0DE)
+
+PIECE_KEYS = {piece: [_rng.getrandbits(64) for _ in range(64)] for piece in 'PNBRQKpnbrqk'}
+# 輪到黑方時 XOR 進去
+SIDE_KEY = _rng.getrandbits(64)
+# 以 castling 位元旗標（0~15）為索引，先把四個權利各自的亂數組合好
+_CASTLING_RIGHT_KEYS = [_rng.getrandbits(64) for _ in range(4)]
+CASTLING_KEYS = []
+for _rights in range(16):
+    _k = 0
+    for _bit in range(4):
+        if _rights & (1 << _bit):
+            _k ^= _CASTLING_RIGHT_KEYS[_bit]
+    CASTLING_KEYS.append(_k)
+EP_FILE_KEYS = [_rng.getrandbits(64) for _ in range(8)]
+
+
+def en_passant_key(board, en_passant_target, white_to_move):
+    """
+    只有在執行方真的有兵可以過路吃時，en passant 檔才算進 key，
+    否則「兵剛走兩格」與「兵一步一步走過來」的相同局面會被當成不同局面。
+    """
+    if en_passant_target is None:
+        return 0
+    row, col = en_passant_target
+    pawn, pawn_row = ('P', row + 1) if white_to_move else ('p', row - 1)
+    if (col > 0 and board[pawn_row][col - 1] == pawn) or (col < 7 and board[pawn_row][col + 1] == pawn):
+        return EP_FILE_KEYS[col]
+    return 0
+
+
+def compute_key(board, turn, castling, en_passant_target):
+    """
+    從頭計算一個局面的 key（建立局面時使用，之後由 make/unmake 增量更新）。
+    """
+    key = 0
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece:
+                key ^= PIECE_KEYS[piece][r * 8 + c]
+    if turn == 'black':
+        key ^= SIDE_KEY
+    key ^= CASTLING_KEYS[castling]
+    key ^= en_passant_key(board, en_passant_target, turn == 'white')
+    return key